@@ -0,0 +1,130 @@
+# answer_cache.py — Shared answer cache for answer_question
+# Most free-text questions are the same dozen, so identical questions from
+# visitors with the same profile reuse one completion instead of a 70B call.
+# The cache is process-wide (every Streamlit session), LRU-bounded, and each
+# entry expires after a TTL so knowledge-base edits roll out on their own.
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.environ.get("WIZ_ANSWER_CACHE_SIZE", "512"))
+TTL_SECONDS = float(os.environ.get("WIZ_ANSWER_CACHE_TTL", "3600"))
+
+IRRELEVANT = "IRRELEVANT"     # cached verdict; the caller renders the deflection
+NAME_SLOT  = "\x00name\x00"   # stands in for the visitor's name inside cached text
+
+# Words that don't change what's being asked ("hi wiz, what's the fee please?")
+_FILLER = {
+    "a", "an", "the", "please", "pls", "plz", "hi", "hey", "hello", "wiz",
+    "can", "could", "you", "tell", "me", "i", "want", "to", "know", "kindly",
+    "so", "ok", "okay", "um", "uh",
+}
+_CONTRACTIONS = {"what's": "what is", "whats": "what is", "how's": "how is",
+                 "it's": "it is", "its": "it is", "isn't": "is not", "don't": "do not"}
+
+
+# Unicode words, plus the Indic blocks whole: \w alone drops their vowel signs
+# and viramas (category M), splitting "फीस" into "फ" and "स"
+_WORD = re.compile(r"[\w₹'\u0300-\u036f\u0900-\u0dff]+")
+
+
+def normalize(question: str) -> str:
+    q = unicodedata.normalize("NFKC", question).lower().replace("’", "'")
+    words = []
+    for w in _WORD.findall(q):
+        w = _CONTRACTIONS.get(w, w.strip("'"))
+        for part in w.split():
+            if part and part not in _FILLER:
+                words.append(part)
+    return " ".join(words)
+
+
+def cache_key(question: str, lead: dict):
+    """Key shared by identical questions, or None if nothing is left to compare on.
+
+    Emoji-only or filler-only messages ("can you tell me") normalise to ""
+    and would all share one key, so they bypass the cache and single-flight.
+    """
+    # Lead type and age band change the answer; the name is re-applied on a hit
+    q = normalize(question)
+    return (q, lead.get("type") or "", lead.get("child_age") or "") if q else None
+
+
+def depersonalise(text: str, name: str):
+    """text with the visitor's name as NAME_SLOT, or None if the name is ambiguous in it.
+
+    Only whole-word, exact-case uses are swapped ("Ed" never touches
+    "Education"). A name that also shows up in another case, opens a
+    sentence, or is a single letter could be an ordinary word ("Will",
+    "May"), so that text is not shared at all.
+    """
+    name = (name or "").strip()
+    if not name:
+        return text
+    word = re.compile(rf"(?<!\w){re.escape(name)}(?!\w)", re.I)
+    for m in word.finditer(text):
+        before = text[:m.start()].rstrip()
+        if m.group(0) != name or len(name) < 2 or not before or before[-1] in ".!?\n":
+            return None
+    return word.sub(lambda m: NAME_SLOT, text)
+
+
+def personalise(text: str, name: str) -> str:
+    name = (name or "").strip()
+    if name:
+        return text.replace(NAME_SLOT, name)
+    # No name for this visitor — drop the slot along with its lead-in comma
+    return re.sub(r",?\s*" + re.escape(NAME_SLOT), "", text)
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, text)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, text: str):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, text)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+# Process-wide instance shared by all sessions
+answers = AnswerCache()
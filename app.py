@@ -1,9 +1,13 @@
 # app.py — WizKlub Chatbot (visitor-facing chat page)
 # Navigation to CRM dashboard is via the button in the top-right corner
 
-import re as _re
+import uuid
 import streamlit as st
-from flow import start_greeting, route
+import assets
+import breaker
+import chat_render
+from flow import (start_greeting, route, collect_pending, wait_pending, session_defaults,
+                  resume, new_session)
 from groq_client import has_key, get_key
 
 st.set_page_config(
@@ -13,112 +17,64 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
-# ── Hide sidebar nav (we use our own nav) ─────────────────────────────────────
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Outfit:wght@300;400;500;600;700&display=swap');
-html, body, [class*="css"] { font-family: 'Outfit', sans-serif !important; }
-#MainMenu, footer, header { visibility: hidden; }
-[data-testid="stSidebarNav"] { display: none; }
-section[data-testid="stSidebar"] { display: none; }
-
-.stApp { background: #f7f5f0; }
-.block-container { padding-top: 0.8rem !important; max-width: 700px; }
-
-/* Chat window */
-.chat-win {
-    background: #faf8f4; border: 1px solid #e5e0d8;
-    border-radius: 16px; padding: 20px 18px;
-    height: 460px; overflow-y: auto; margin-bottom: 12px;
-}
-.chat-win::-webkit-scrollbar { width: 3px; }
-.chat-win::-webkit-scrollbar-thumb { background: #d5cfc5; border-radius: 10px; }
-
-/* Message rows */
-.row      { display:flex; align-items:flex-end; gap:8px; margin:8px 0;
-            animation: fadeUp 0.25s ease; }
-.row.user { flex-direction: row-reverse; }
-@keyframes fadeUp {
-  from { opacity:0; transform:translateY(8px); }
-  to   { opacity:1; transform:translateY(0); }
-}
-.av { width:34px; height:34px; border-radius:50%;
-      display:flex; align-items:center; justify-content:center;
-      font-size:16px; flex-shrink:0; }
-.av.b { background:#2d6a4f; }
-.av.u { background:#e76f51; }
-.bbl { max-width:76%; padding:10px 15px; font-size:14px; line-height:1.65; }
-.bbl.b { background:#fff; border:1px solid #e5e0d8;
-          border-radius:16px 16px 16px 3px; color:#1a1a2e;
-          box-shadow:0 1px 6px rgba(0,0,0,0.05); }
-.bbl.u { background:#2d6a4f; color:#fff; border-radius:16px 16px 3px 16px; }
-
-/* Quick reply buttons */
-.stButton > button {
-    border: 1.5px solid #2d6a4f !important;
-    color: #2d6a4f !important; background: transparent !important;
-    border-radius: 50px !important; padding: 7px 18px !important;
-    font-size: 13px !important; font-weight: 500 !important;
-    font-family: 'Outfit', sans-serif !important;
-    transition: all 0.15s !important; margin: 2px 0 !important;
-}
-.stButton > button:hover { background: #2d6a4f !important; color: white !important; }
-
-/* Send button */
-div[data-testid="column"]:last-child .stButton > button {
-    background: #e76f51 !important; border-color: #e76f51 !important;
-    color: white !important; border-radius: 12px !important; font-weight: 600 !important;
-}
-div[data-testid="column"]:last-child .stButton > button:hover { background: #cf5f42 !important; }
-
-.stTextInput input {
-    border-radius: 12px !important; border: 1.5px solid #e5e0d8 !important;
-    font-size: 14px !important; font-family: 'Outfit', sans-serif !important;
-    background: #fff !important; padding: 10px 14px !important;
-}
-.stTextInput input:focus { border-color: #2d6a4f !important; }
-
-/* API key input area */
-.key-box {
-    background: #fff; border: 1px solid #e5e0d8; border-radius: 12px;
-    padding: 12px 16px; margin-bottom: 10px;
-}
-</style>
-""", unsafe_allow_html=True)
+# ── Styles (static/css, sent once per session and kept in <head> — see assets.py) ──
+assets.apply("chat")
 
 
 # ── Session state init ────────────────────────────────────────────────────────
 def init():
     for k, v in {
-        "messages":   [],
-        "step":       0,
-        "awaiting":   None,
-        "lead": {"name":"","email":"","phone":"","type":"","child_age":"",
-                 "goals":"","school_size":"","budget":"","wants_demo":False,"score":0},
-        "all_leads":  [],
-        "demo_count": 0,
-        "options":    [],
+        **session_defaults(),
         "greeted":    False,
         "fk":         0,
         "groq_key":   "",
         "show_key":   False,
+        "chat_window": chat_render.WINDOW,
     }.items():
         if k not in st.session_state:
             st.session_state[k] = v
 
 init()
 
+
+def start_over():
+    new_session(uuid.uuid4().hex)
+    st.query_params["sid"] = st.session_state.sid
+    st.session_state.greeted = False
+    st.session_state.chat_window = chat_render.WINDOW
+    st.session_state.fk += 1
+
+
+# The conversation is saved under ?sid= after every turn (flow.save_session),
+# so a reload or a request routed to another replica carries on where it was.
+# A finished one (lead captured) is not reopened — the link gets a new id.
+if "sid" not in st.session_state:
+    sid = st.query_params.get("sid")
+    if sid and resume(sid):
+        st.session_state.greeted = True
+    else:
+        st.session_state.sid = uuid.uuid4().hex
+        st.query_params["sid"] = st.session_state.sid
+
 if not st.session_state.greeted:
     start_greeting()
     st.session_state.greeted = True
 
+collect_pending()
+
 
 # ── Top nav bar ───────────────────────────────────────────────────────────────
-# Header + dashboard button side by side
+# Header + dashboard button side by side. The status follows the answer
+# breakers only (breaker.overall); optional calls failing doesn't change a reply.
+AI_STATUS = {
+    breaker.CLOSED:    "🟢 AI Active",
+    breaker.HALF_OPEN: "🟡 AI Recovering",
+    breaker.OPEN:      "🟠 AI Slow — short answers",     # tight deadline, no retries
+}
 h_col, nav_col = st.columns([3, 1])
 
 with h_col:
-    ai_status = "🟢 AI Active" if has_key() else "⚪ AI Offline"
+    ai_status = AI_STATUS[breaker.overall()] if has_key() else "⚪ AI Offline"
     st.markdown(f"""
     <div style="background:#2d6a4f;border-radius:14px;padding:14px 20px;
                 display:flex;align-items:center;gap:12px;">
@@ -140,6 +96,9 @@ with nav_col:
     st.markdown("<div style='height:6px'></div>", unsafe_allow_html=True)
     if st.button("📊 CRM Dashboard →", key="go_dash"):
         st.switch_page("pages/1_Dashboard.py")
+    if st.session_state.step != "start" and st.button("🔄 New chat", key="new_chat"):
+        start_over()
+        st.rerun()
     # Small toggle for API key input (only shown if no key found)
     if not has_key():
         if st.button("🔑 Add API Key", key="show_key_btn"):
@@ -168,20 +127,22 @@ if not has_key() and st.session_state.show_key:
 
 
 # ── Render chat messages ──────────────────────────────────────────────────────
-html = '<div class="chat-win">'
-for m in st.session_state.messages:
-    txt = m["text"].replace("\n", "<br>")
-    txt = _re.sub(
-        r"(https?://\S+)",
-        r'<a href="\1" target="_blank" style="color:#2d6a4f;text-decoration:underline">\1</a>',
-        txt,
-    )
-    if m["role"] == "bot":
-        html += f'<div class="row"><div class="av b">🌱</div><div class="bbl b">{txt}</div></div>'
-    else:
-        html += f'<div class="row user"><div class="av u">😊</div><div class="bbl u">{txt}</div></div>'
-html += "</div>"
-st.markdown(html, unsafe_allow_html=True)
+# Fragments are cached per message (chat_render); only the newest window is sent.
+hidden = len(st.session_state.messages) - st.session_state.chat_window
+if hidden > 0 and st.button(f"⬆ Show earlier messages ({hidden})", key="more_msgs"):
+    st.session_state.chat_window += chat_render.WINDOW
+    st.rerun()
+
+
+def chat_html() -> str:
+    return chat_render.transcript_html(st.session_state.messages, st.session_state.chat_window)
+
+
+chat_box = st.empty()
+chat_box.markdown(chat_html(), unsafe_allow_html=True)
+
+# flow.bot_stream calls this to repaint the window while a reply streams in
+st.session_state.paint = lambda: chat_box.markdown(chat_html(), unsafe_allow_html=True)
 
 
 # ── Quick reply buttons ───────────────────────────────────────────────────────
@@ -206,3 +167,22 @@ if send and txt.strip():
     st.session_state.fk += 1
     route(txt.strip())
     st.rerun()
+
+
+# ── Background insight ────────────────────────────────────────────────────────
+# The page is fully painted by now; if an insight is still being generated,
+# wait for it here and rerun so it appears without the visitor doing anything.
+# Streamlit only notices a click or message (and cuts this wait short) when
+# the script sends something, so wait in short slices and touch a small
+# "typing" line between them.
+INSIGHT_WAIT = 20      # seconds
+POLL_EVERY   = 0.25
+
+if st.session_state.pending_insight:
+    typing = st.empty()
+    for i in range(int(INSIGHT_WAIT / POLL_EVERY)):
+        if wait_pending(POLL_EVERY):
+            typing.empty()
+            st.rerun()
+        typing.caption("Wiz is typing" + "." * (i % 3 + 1))
+    typing.empty()
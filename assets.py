@@ -0,0 +1,114 @@
+# assets.py — Page stylesheets and the Outfit font for both pages
+# The CSS lives in static/css/ (base.css shared, plus one file per page).
+# It can't simply be <link>ed: the pinned Streamlit (1.32) serves static
+# files other than images as text/plain with nosniff, which browsers refuse
+# as a stylesheet. And a <style> block would be re-sent on every rerun,
+# because a rerun replaces every element. So apply(page):
+#   - on a session's first run of a page, inlines the CSS, so first paint
+#     is styled;
+#   - on every run, sends a tiny loader (a zero-height component) that
+#     keeps one <style> in the document head. If that <style> is missing or
+#     stale, the loader fetches the files by their ?v=<content hash> URLs.
+#     fetch() doesn't care about text/plain, and Tornado serves versioned
+#     static URLs with far-future cache headers.
+# A rerun then carries a few hundred bytes of styling instead of the CSS.
+#
+# Outfit is served from static/fonts/ (fonts.css). If the font file is
+# missing, pages fall back to the Google Fonts @import they used before.
+#
+#   assets.apply("chat")
+#   python assets.py --fetch-fonts      # download Outfit into static/fonts/
+
+import hashlib
+import json
+import os
+import re
+import sys
+
+import requests
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+URL_PREFIX = "app/static"          # where Streamlit serves STATIC_DIR
+FONT_CSS_URL = "https://fonts.googleapis.com/css2?family=Outfit:wght@300..700&display=swap"
+FONT_FILE = "outfit-latin.woff2"   # referenced by fonts.css
+
+PAGES = {"chat": ["base.css", "chat.css"], "dashboard": ["base.css", "dashboard.css"]}
+
+
+def _read(name: str) -> str:
+    with open(os.path.join(STATIC_DIR, "css", name), encoding="utf-8") as f:
+        return f.read()
+
+
+SELF_HOSTED = os.path.exists(os.path.join(STATIC_DIR, "fonts", FONT_FILE))
+if SELF_HOSTED:
+    PAGES = {page: ["fonts.css"] + files for page, files in PAGES.items()}
+    _PREFIX = ""
+else:
+    print("[Assets] static/fonts/ has no Outfit — using Google Fonts (python assets.py --fetch-fonts)")
+    _PREFIX = f"@import url('{FONT_CSS_URL}');\n"
+
+_CSS = {name: _read(name) for files in PAGES.values() for name in files}
+VERSIONS = {name: hashlib.sha1(css.encode("utf-8")).hexdigest()[:10] for name, css in _CSS.items()}
+# Inline, url('../fonts/…') would resolve against the page, not static/css/
+_INLINE = {name: css.replace("url('../", f"url('{URL_PREFIX}/") for name, css in _CSS.items()}
+_STYLES = {page: "<style>\n" + _PREFIX + "\n".join(f"/* {f} v={VERSIONS[f]} */\n{_INLINE[f]}" for f in files)
+           + "</style>" for page, files in PAGES.items()}
+STAMPS = {page: "+".join(f"{f}:{VERSIONS[f]}" for f in files) for page, files in PAGES.items()}
+
+# Runs in a same-origin component iframe; the <style> it owns outlives reruns
+_LOADER = """<script>
+const d = window.parent.document, stamp = %(stamp)s;
+let s = d.getElementById("wiz-css");
+if (!s || s.dataset.stamp !== stamp) {
+  Promise.all(%(hrefs)s.map(h => fetch(new URL(h, d.baseURI)).then(r => r.text())))
+    .then(parts => {
+      const css = %(prefix)s + parts.join("\\n").split("url('../").join(%(base)s);
+      s = d.getElementById("wiz-css") || d.head.appendChild(d.createElement("style"));
+      s.id = "wiz-css"; s.textContent = css; s.dataset.stamp = stamp;
+    });
+}
+</script>"""
+
+
+def stylesheet(page: str) -> str:
+    """Inline <style> markup that styles `page` (built once at import)."""
+    return _STYLES[page]
+
+
+def loader(page: str) -> str:
+    """The script that keeps `page`'s CSS in the document head."""
+    hrefs = [f"{URL_PREFIX}/css/{f}?v={VERSIONS[f]}" for f in PAGES[page]]
+    return _LOADER % {k: json.dumps(v) for k, v in {
+        "stamp": STAMPS[page], "hrefs": hrefs, "prefix": _PREFIX,
+        "base": f"url('{URL_PREFIX}/"}.items()}
+
+
+def apply(page: str):
+    """Style `page`: inline CSS on this session's first run of it, the loader on every run."""
+    import streamlit as st
+    import streamlit.components.v1 as components
+    if st.session_state.get("_styled") != STAMPS[page]:
+        st.session_state["_styled"] = STAMPS[page]
+        st.markdown(_STYLES[page], unsafe_allow_html=True)
+    components.html(loader(page), height=0)
+
+
+# ── Font download (run once when building an image / before going offline) ────
+def fetch_fonts() -> str:
+    # Google serves woff2 only to browsers that say they accept it
+    css = requests.get(FONT_CSS_URL, headers={"User-Agent": "Mozilla/5.0 Chrome/120"}, timeout=15).text
+    # The last @font-face block is the basic latin subset
+    url = re.findall(r"url\((https://[^)]+\.woff2)\)", css)[-1]
+    os.makedirs(os.path.join(STATIC_DIR, "fonts"), exist_ok=True)
+    path = os.path.join(STATIC_DIR, "fonts", FONT_FILE)
+    with open(path, "wb") as f:
+        f.write(requests.get(url, timeout=30).content)
+    return path
+
+
+if __name__ == "__main__":
+    if "--fetch-fonts" in sys.argv[1:]:
+        print(f"[Assets] Saved {fetch_fonts()}")
+    for name, v in VERSIONS.items():
+        print(f"{name:16} v={v}  {len(_CSS[name].encode('utf-8')):6} bytes")
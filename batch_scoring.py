@@ -0,0 +1,90 @@
+# batch_scoring.py — Vectorized scoring for many leads at once
+# Rescoring the lead base after a WEIGHTS change used to mean calling
+# calc_score once per lead. Here each categorical column is reduced to codes
+# in one pass, every distinct value is scored once with the same rules
+# calc_score uses, and the per-lead points are a single array lookup.
+# Results are identical to calc_score — bench/scoring.py checks that.
+#
+#   python batch_scoring.py --rescore     # rescore every lead in lead_store
+
+import numpy as np
+from scoring import WEIGHTS, DEMO_POINTS, CONTACT_POINTS, MAX_SCORE, BANDS, EMAIL_RE, PHONE_RE, field_points
+
+BAND_CLASSES = np.array([cls for _, _, cls in reversed(BANDS)])          # cool, warm, hot
+_BAND_FLOORS = np.array([floor for floor, _, _ in reversed(BANDS)][1:])  # [45, 70]
+
+
+def _column(values, n: int) -> list:
+    if values is None:
+        return [""] * n
+    if isinstance(values, np.ndarray):
+        values = values.tolist()
+    return ["" if v is None else v for v in values]
+
+
+def _codes(values: list) -> tuple:
+    """(distinct values, int code per lead) — first-seen order, one dict pass."""
+    index = {}
+    codes = np.fromiter((index.setdefault(v, len(index)) for v in values),
+                        dtype=np.int32, count=len(values))
+    return list(index), codes
+
+
+def _lookup_points(field: str, values: list) -> np.ndarray:
+    uniq, codes = _codes(values)
+    table = np.fromiter((field_points(field, u) for u in uniq), dtype=np.int16, count=len(uniq))
+    return table[codes]
+
+
+def _valid(rx, values: list) -> np.ndarray:
+    # Contact fields are near-unique, so there is nothing to code — match each once
+    return np.fromiter((rx.match(v) is not None for v in values), dtype=bool, count=len(values))
+
+
+def score_batch(batch: dict) -> np.ndarray:
+    """Scores for a columnar batch: {"type": [...], "child_age": [...], ...}.
+
+    Any column may be omitted (treated as empty). wants_demo is truthy/falsy.
+    Returns an int16 array, one score per lead, same as calc_score.
+    """
+    n = max(len(v) for v in batch.values())
+    s = np.zeros(n, dtype=np.int16)
+    for field in WEIGHTS:
+        s += _lookup_points(field, _column(batch.get(field), n))
+    demo = np.asarray(batch.get("wants_demo", np.zeros(n)), dtype=bool)
+    s += np.where(demo, DEMO_POINTS[True], DEMO_POINTS[False]).astype(np.int16)
+    s += _valid(EMAIL_RE, _column(batch.get("email"), n)) * np.int16(CONTACT_POINTS["email"])
+    s += _valid(PHONE_RE, _column(batch.get("phone"), n)) * np.int16(CONTACT_POINTS["phone"])
+    return np.minimum(s, MAX_SCORE)
+
+
+def bands(scores: np.ndarray) -> np.ndarray:
+    """Band class per score ("hot" / "warm" / "cool"), matching score_label."""
+    return BAND_CLASSES[np.searchsorted(_BAND_FLOORS, scores, side="right")]
+
+
+def rescore_store(path: str = None, chunk: int = 200_000) -> int:
+    """Rescore every stored lead with the current WEIGHTS; returns how many changed."""
+    import lead_store
+    changed, last_id = 0, 0
+    while True:
+        cols = lead_store.columns(after_id=last_id, limit=chunk, path=path)
+        if not len(cols["id"]):
+            return changed
+        new = score_batch(cols)
+        diff = np.nonzero(new != np.asarray(cols["score"]))[0]
+        lead_store.rescore([(int(cols["id"][i]), int(new[i])) for i in diff], path=path)
+        changed += len(diff)
+        last_id = int(cols["id"][-1])
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Batch lead scoring")
+    ap.add_argument("--rescore", action="store_true", help="rescore every lead in the lead store")
+    ap.add_argument("--db", default=None, help="lead store path (default: WIZ_LEADS_DB / leads.db)")
+    args = ap.parse_args()
+    if args.rescore:
+        print(f"{rescore_store(args.db)} leads rescored")
+    else:
+        ap.print_help()
@@ -0,0 +1,150 @@
+# bench/assets.py — Styling payload per rerun and per page load, before vs after
+#
+#   python bench/assets.py                      # working tree vs HEAD
+#   python bench/assets.py --ref v1.0           # … vs any git ref
+#   python bench/assets.py --url http://localhost:8501   # also probe a running server
+#
+# Runs the chat page and the dashboard headless (Streamlit AppTest) for both
+# trees and reports, per page:
+#   rerun_bytes    — serialized size of everything the script sends on a rerun
+#   style_bytes    — the part of that spent on styling (<style>/<link> markup,
+#                    or assets.py's loader component)
+#   first_paint    — what styled first paint waits on: third-party origins and
+#                    the CSS/font bytes fetched on a cold and a warm (cached) load
+# With --url, each stylesheet the page links and each self-hosted font it
+# uses is fetched from the running server, showing timings, Content-Type
+# and cache headers. Output is one JSON object.
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = {"chat": "app.py", "dashboard": "pages/1_Dashboard.py"}
+_EXTERNAL = re.compile(r"""(?:@import\s+url\(|url\(|href=)['"]?(https?://[^'")\s>]+)""")
+_LINK = re.compile(r'(?:<link rel="stylesheet" href=|)"(app/static/css/[^"]+)"')
+_FONT = re.compile(r"url\('(?:\.\./|app/static/)(fonts/[^'?]+)")
+
+
+def _walk(node, out: list):
+    proto = getattr(node, "proto", None)
+    if proto is not None and hasattr(proto, "ByteSize"):
+        out.append(proto)
+    children = getattr(node, "children", None)
+    for c in (children.values() if isinstance(children, dict) else children or []):
+        _walk(c, out)
+
+
+def _text(proto) -> str:
+    # Markdown body, or a component's srcdoc
+    return getattr(proto, "body", "") or getattr(proto, "srcdoc", "")
+
+
+def measure_tree(tree: str) -> dict:
+    """Run in a subprocess with cwd=tree, so that tree's modules and .streamlit/ are used."""
+    from streamlit.testing.v1 import AppTest
+
+    out = {}
+    for page, path in PAGES.items():
+        at = AppTest.from_file(os.path.join(tree, path), default_timeout=60).run()
+        at.run()                                   # measure a rerun, not the first run
+        protos = []
+        _walk(at._tree, protos)
+        styled = [p for p in protos if any(m in _text(p) for m in ("<style", 'rel="stylesheet"', "wiz-css"))]
+        out[page] = {
+            "rerun_bytes": sum(p.ByteSize() for p in protos),
+            "style_bytes": sum(p.ByteSize() for p in styled),
+            "style_markup": [_text(p) for p in styled],
+        }
+    return out
+
+
+def _static_path(tree: str, href: str) -> str:
+    return os.path.join(tree, "static", href.split("app/static/", 1)[-1].split("?")[0])
+
+
+def first_paint(tree: str, page: dict) -> dict:
+    markup = "".join(page["style_markup"])
+    links = _LINK.findall(markup)
+    css = markup
+    for href in links:
+        with open(_static_path(tree, href), encoding="utf-8") as f:
+            css += f.read()
+    fonts = [f for f in _FONT.findall(css) if os.path.exists(_static_path(tree, f))]
+    local = sum(os.path.getsize(_static_path(tree, p)) for p in links + fonts)
+    external = sorted(set(_EXTERNAL.findall(css)))
+    if any("fonts.googleapis.com" in u for u in external):
+        external.append("https://fonts.gstatic.com/…")    # the font files that CSS points to
+    return {
+        "third_party_requests": external,
+        "third_party_origins": len({u.split("/")[2] for u in external}),
+        # Inline CSS rides along with every page load; versioned links are cached after the first
+        "cold_bytes": page["style_bytes"] + local,
+        "warm_bytes": page["style_bytes"] if not links else 0,
+        "fonts_self_hosted": fonts,
+    }
+
+
+def probe(url: str, page: dict) -> list:
+    rows = []
+    markup = "".join(page["style_markup"])
+    for href in _LINK.findall(markup) + [f"app/static/{f}" for f in _FONT.findall(markup)]:
+        t0 = time.perf_counter()
+        r = requests.get(f"{url.rstrip('/')}/{href}", timeout=10)
+        cold_ms = (time.perf_counter() - t0) * 1000
+        rows.append({"href": href, "status": r.status_code, "bytes": len(r.content),
+                     "cold_ms": round(cold_ms, 1),
+                     "content_type": r.headers.get("Content-Type"), "cache_control": r.headers.get("Cache-Control"),
+                     "etag": r.headers.get("Etag")})
+    return rows
+
+
+def run_tree(tree: str) -> dict:
+    env = {**os.environ, "WIZ_LEADS_DB": os.path.join(tempfile.mkdtemp(prefix="wiz-assets-"), "leads.db")}
+    env.pop("GROQ_API_KEY", None)
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", tree],
+                          cwd=tree, env=env, capture_output=True, text=True, timeout=300)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr[-2000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(args) -> int:
+    before_dir = tempfile.mkdtemp(prefix="wiz-assets-ref-")
+    archive = subprocess.run(["git", "-C", ROOT, "archive", args.ref], capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", before_dir], input=archive, check=True)
+
+    report = {"ref": args.ref, "pages": {}}
+    results = {"before": run_tree(before_dir), "after": run_tree(ROOT)}
+    for page in PAGES:
+        row = {}
+        for label, tree in (("before", before_dir), ("after", ROOT)):
+            p = results[label][page]
+            row[label] = {"rerun_bytes": p["rerun_bytes"], "style_bytes": p["style_bytes"],
+                          "first_paint": first_paint(tree, p)}
+            if args.url and label == "after":
+                row[label]["server"] = probe(args.url, p)
+        row["rerun_saved"] = round(1 - row["after"]["rerun_bytes"] / row["before"]["rerun_bytes"], 3)
+        report["pages"][page] = row
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Styling payload benchmark")
+    ap.add_argument("--ref", default="HEAD", help="git ref to compare the working tree against")
+    ap.add_argument("--url", help="running app to probe for stylesheet/font timings and headers")
+    ap.add_argument("--measure", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.measure:
+        sys.path.insert(0, args.measure)
+        print(json.dumps(measure_tree(args.measure)))
+        sys.exit(0)
+    sys.exit(main(args))
@@ -0,0 +1,121 @@
+# bench/dedupe.py — Lead dedupe: insert-time lookup and the batch pass
+#
+#   python bench/dedupe.py                 # 200,000 historical leads
+#   python bench/dedupe.py --n 1000000 --dup-share 0.3
+#
+# Seeds a throwaway lead store with synthetic historical leads, a share of
+# them repeat visitors whose email or phone is written differently (case,
+# spaces, +91 / 0 / bare 10 digits) and a few sharing a family member's
+# phone under their own email. Times lead_store.dedupe() over the whole
+# table, then checks that no two leads share a normalized email, that a
+# shared phone is left only between leads with different emails, and that
+# the aggregates match a full recount. Finally times add()
+# for new and repeat visitors at that table size (a repeat visit sharing
+# no key with the earlier one rightly stays a separate lead). Output is one
+# JSON object; exit 1 if a check fails.
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lead_store
+
+
+def phone_variants(n: int) -> list:
+    d = f"98{n:08d}"
+    return [f"+91 {d[:5]} {d[5:]}", f"0{d}", d, f"0091-{d}", f"(+91) {d}"]
+
+
+def lead(rng: random.Random, person: int, repeat: bool, family: int = None) -> dict:
+    email = f"parent{person}@example.com"
+    if repeat:
+        email = rng.choice([email.upper(), f" {email} ", email.title(), ""])
+    phone = rng.choice(phone_variants(person)) if rng.random() < 0.8 or not email else ""
+    if family is not None:                   # their own email, a relative's number
+        phone = rng.choice(phone_variants(family))
+    return {"name": f"Visitor{person}", "email": email, "phone": phone,
+            "type": rng.choice(["Parent", "School"]), "child_age": "8–10 years", "goals": "Coding",
+            "wants_demo": rng.random() < 0.4, "score": rng.randrange(20, 100),
+            "created_at": time.time() - rng.randrange(86400 * 90)}
+
+
+def pct(xs: list, p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))]
+
+
+def main(args) -> int:
+    path = os.path.join(tempfile.mkdtemp(prefix="wiz-dedupe-"), "leads.db")
+    rng = random.Random(args.seed)
+    people = int(args.n * (1 - args.dup_share))
+    rows = [lead(rng, i, False, rng.randrange(i) if i and rng.random() < args.shared_phone else None)
+            for i in range(people)]
+    rows += [lead(rng, rng.randrange(people), True) for _ in range(args.n - people)]
+    rng.shuffle(rows)
+    for i in range(0, len(rows), 50_000):
+        lead_store.add_many(rows[i:i + 50_000], path=path)
+
+    t0 = time.perf_counter()
+    result = lead_store.dedupe(path)
+    dedupe_s = time.perf_counter() - t0
+
+    c = lead_store._conn(path)
+    shared = {}
+    for r in c.execute("SELECT id, email, phone FROM leads"):
+        for k in lead_store._keys(r):
+            shared.setdefault(k, []).append(lead_store.email_key(r["email"]))
+    # A phone may stay shared, but only by leads that each have their own email
+    collisions = sum(1 for k, es in shared.items()
+                     if len(es) > 1 and (k.startswith("e:") or not all(es) or len(set(es)) < len(es)))
+    shared_phones = sum(1 for k, es in shared.items() if len(es) > 1 and k.startswith("p:"))
+    stats = lead_store.summary(path)
+    lead_store.rebuild_stats(path)
+    stats_ok = stats == lead_store.summary(path)
+
+    new_ms, repeat_ms = [], []
+    expected = stats["total"] + args.adds
+    for i in range(args.adds):
+        fresh = lead(rng, args.n * 10 + i, False)
+        t0 = time.perf_counter()
+        lead_store.add(fresh, path=path)
+        new_ms.append((time.perf_counter() - t0) * 1000)
+        again = lead(rng, rng.randrange(people), True)
+        expected += lead_store.find(again, path=path) is None     # shares no key with the earlier visit
+        t0 = time.perf_counter()
+        lead_store.add(again, path=path)
+        repeat_ms.append((time.perf_counter() - t0) * 1000)
+
+    report = {
+        "leads": args.n,
+        "people": people,
+        "dedupe": {**result, "wall_s": round(dedupe_s, 2),
+                   "leads_per_s": round(result["scanned"] / dedupe_s)},
+        "leads_after": stats["total"],
+        "shared_keys_after": collisions,
+        "family_phones_kept": shared_phones,
+        "stats_consistent": stats_ok,
+        "add_new_p50_ms": round(pct(new_ms, 50), 3),
+        "add_new_p99_ms": round(pct(new_ms, 99), 3),
+        "add_repeat_p50_ms": round(pct(repeat_ms, 50), 3),
+        "add_repeat_p99_ms": round(pct(repeat_ms, 99), 3),
+        "leads_after_adds": lead_store.count(path),
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if not collisions and stats_ok and report["leads_after_adds"] == expected else 1
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Lead dedupe benchmark")
+    ap.add_argument("--n", type=int, default=200_000, help="historical leads to seed")
+    ap.add_argument("--dup-share", type=float, default=0.2, help="share of them that are repeat visits")
+    ap.add_argument("--shared-phone", type=float, default=0.01,
+                    help="share of people giving a relative's phone under their own email")
+    ap.add_argument("--adds", type=int, default=1000, help="new + repeat visitors timed after the pass")
+    ap.add_argument("--seed", type=int, default=7)
+    sys.exit(main(ap.parse_args()))
@@ -0,0 +1,138 @@
+# bench/export.py — Lead export pipeline under load, with a flaky webhook
+#
+#   python bench/export.py
+#   python bench/export.py --leads 20000 --threads 32 --webhook-errors 0.3
+#
+# Submits synthetic leads from many threads (as concurrent CTA clicks would),
+# through a small queue so backpressure kicks in, to JSONL + CSV + a local
+# webhook stub that fails a share of batches. Reports submit latency (what
+# the visitor waits for), time to full delivery, retries, overflow, and
+# checks at-least-once: every export_id must reach every sink. Exit 1 if any
+# lead is missing. Output is one JSON object.
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lead_export
+
+
+class FakeWebhook:
+    def __init__(self, error_rate: float = 0.2, latency: float = 0.02):
+        self.error_rate, self.latency = error_rate, latency
+        self.received = []
+        self.calls = self.errors = 0
+        self._lock = threading.Lock()
+        hook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(hook.latency)
+                with hook._lock:
+                    hook.calls += 1
+                    fail = random.random() < hook.error_rate
+                    if fail:
+                        hook.errors += 1
+                    else:
+                        hook.received.extend(l["export_id"] for l in body["leads"])
+                self.send_response(503 if fail else 204)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        self._srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._srv.daemon_threads = True
+        threading.Thread(target=self._srv.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._srv.server_address[1]}/hook"
+
+
+def pct(xs: list, p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))]
+
+
+def main(args) -> int:
+    tmp = tempfile.mkdtemp(prefix="wiz-export-")
+    lead_export.RETRY_BASE, lead_export.RETRY_MAX = 0.05, 1.0      # keep retries inside the run
+    hook = FakeWebhook(args.webhook_errors)
+    sinks = [lead_export.JsonlSink(tmp, rotate_bytes=args.rotate_kb * 1024),
+             lead_export.CsvSink(tmp, rotate_bytes=args.rotate_kb * 1024),
+             lead_export.WebhookSink(hook.url)]
+    ex = lead_export.Exporter(sinks, spool_path=os.path.join(tmp, "spool.db"),
+                              queue_size=args.queue, batch_size=args.batch, window=args.window)
+
+    ids, submit_s = [], []
+    lock = threading.Lock()
+
+    def cta(i: int):
+        lead = {"id": i, "name": f"Visitor{i}", "email": f"v{i}@example.com", "phone": "+91 9800000000",
+                "type": "Parent", "child_age": "8–10 years", "goals": "Coding", "wants_demo": i % 2,
+                "score": 70, "export_id": f"lead-{i}"}
+        t0 = time.perf_counter()
+        ex.submit(lead)
+        with lock:
+            submit_s.append(time.perf_counter() - t0)
+            ids.append(lead["export_id"])
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(cta, range(args.leads)))
+    submitted = time.perf_counter() - t0
+    done = ex.flush(timeout=args.timeout)
+    delivered = time.perf_counter() - t0
+
+    jsonl, csv_ids = [], []
+    for f in sorted(os.listdir(tmp)):
+        path = os.path.join(tmp, f)
+        if f.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as fh:
+                jsonl += [json.loads(line)["export_id"] for line in fh]
+        elif f.endswith(".csv"):
+            with open(path, encoding="utf-8", newline="") as fh:
+                csv_ids += [row["export_id"] for row in csv.DictReader(fh)]
+    want = set(ids)
+    missing = {name: len(want - set(got)) for name, got in
+               (("jsonl", jsonl), ("csv", csv_ids), ("webhook", hook.received))}
+    report = {
+        "leads": args.leads,
+        "flushed": done,
+        "submit_p50_us": round(pct(submit_s, 50) * 1e6, 1),
+        "submit_p99_us": round(pct(submit_s, 99) * 1e6, 1),
+        "submit_max_ms": round(max(submit_s) * 1000, 2),
+        "submit_wall_s": round(submitted, 3),
+        "delivered_wall_s": round(delivered, 3),
+        "files": len([f for f in os.listdir(tmp) if not f.startswith("spool")]),
+        "webhook": {"calls": hook.calls, "errors": hook.errors},
+        "missing": missing,
+        "duplicates": {"jsonl": len(jsonl) - len(set(jsonl)), "csv": len(csv_ids) - len(set(csv_ids)),
+                       "webhook": len(hook.received) - len(set(hook.received))},
+        "exporter": ex.stats(),
+    }
+    print(json.dumps(report, indent=2))
+    return 1 if any(missing.values()) or not done else 0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Lead export pipeline benchmark")
+    ap.add_argument("--leads", type=int, default=5000)
+    ap.add_argument("--threads", type=int, default=16, help="concurrent submitters")
+    ap.add_argument("--queue", type=int, default=200, help="in-process queue size")
+    ap.add_argument("--batch", type=int, default=50)
+    ap.add_argument("--window", type=float, default=0.2, help="batch window (s)")
+    ap.add_argument("--rotate-kb", type=int, default=256, help="file sink rotation size")
+    ap.add_argument("--webhook-errors", type=float, default=0.2, help="share of webhook batches that fail")
+    ap.add_argument("--timeout", type=float, default=120)
+    sys.exit(main(ap.parse_args()))
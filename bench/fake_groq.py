@@ -0,0 +1,157 @@
+# bench/fake_groq.py — Local stand-in for Groq's chat-completions endpoint
+# Speaks enough of the OpenAI-compatible API for groq_client: JSON replies
+# with a usage block, and SSE when the request has "stream": true. Latency
+# and failure rate are configurable so benchmarks can model a slow or flaky
+# provider without touching the network. With rpm/tpm set it also enforces a
+# sliding one-minute quota, sending x-ratelimit-* headers and 429s like Groq.
+#
+#   srv = FakeGroq(latency=0.4, jitter=0.2, error_rate=0.05).start()
+#   groq_client.GROQ_URL = srv.url
+
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER  = "Classes run live online in small batches of 3-6 kids, twice a week for 45-60 minutes."
+INSIGHT = "🧠 HOTS is a great fit — it builds reasoning step by step alongside coding basics."
+CLOSING = "🌟 {name}, what an exciting learning journey lies ahead!"
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Pooled keep-alive clients drop idle connections; that's not an error
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+
+class FakeGroq:
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, error_rate: float = 0.0,
+                 ttfb: float = 0.1, port: int = 0, rpm: int = 0, tpm: int = 0):
+        self.latency, self.jitter, self.error_rate, self.ttfb = latency, jitter, error_rate, ttfb
+        self.rpm, self.tpm = rpm, tpm
+        self.requests = 0
+        self.errors = 0
+        self.limited = 0
+        self._window = deque()       # (ts, tokens) admitted in the last minute
+        self._lock = threading.Lock()
+        self._srv = _Server(("127.0.0.1", port), self._handler())
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._srv.server_address[1]}/openai/v1/chat/completions"
+
+    def start(self):
+        threading.Thread(target=self._srv.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._srv.shutdown()
+        self._srv.server_close()
+
+    def _reply_for(self, body: dict) -> str:
+        if body.get("response_format", {}).get("type") == "json_object":
+            return json.dumps({"insight": INSIGHT, "closing": CLOSING}, ensure_ascii=False)
+        system = body["messages"][0]["content"]
+        if "IRRELEVANT" in system:
+            last = body["messages"][-1]["content"].lower()
+            return "IRRELEVANT" if "joke" in last or "weather" in last else ANSWER
+        return INSIGHT
+
+    def _quota(self, tokens: int) -> tuple:
+        """(admitted, headers) for a request of `tokens` against the minute window."""
+        now = time.monotonic()
+        while self._window and now - self._window[0][0] > 60:
+            self._window.popleft()
+        used_r, used_t = len(self._window), sum(t for _, t in self._window)
+        ok = (not self.rpm or used_r < self.rpm) and (not self.tpm or used_t + tokens <= self.tpm)
+        if ok:
+            self._window.append((now, tokens))
+            used_r, used_t = used_r + 1, used_t + tokens
+        headers = {}
+        if self.rpm:
+            headers["x-ratelimit-remaining-requests"] = str(max(0, self.rpm - used_r))
+        if self.tpm:
+            headers["x-ratelimit-remaining-tokens"] = str(max(0, self.tpm - used_t))
+        if not ok:
+            wait = 60 - (now - self._window[0][0]) if self._window else 1
+            headers["Retry-After"] = f"{max(0.05, wait):.2f}"
+        return ok, headers
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: bytes, ctype: str = "application/json", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                text = fake._reply_for(body)
+                usage = {"prompt_tokens": sum(len(m["content"]) // 4 for m in body["messages"]),
+                         "completion_tokens": len(text) // 4}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                with fake._lock:
+                    fake.requests += 1
+                    admitted, quota = fake._quota(usage["total_tokens"])
+                    fail = admitted and random.random() < fake.error_rate
+                    if fail:
+                        fake.errors += 1
+                    if not admitted:
+                        fake.limited += 1
+                if not admitted:
+                    err = json.dumps({"error": {"message": "rate limit reached", "code": 429}}).encode()
+                    return self._send(429, err, headers=quota)
+                delay = max(0.0, random.gauss(fake.latency, fake.jitter))
+                if fail:
+                    time.sleep(delay / 4)
+                    status = random.choice([429, 500, 503])
+                    err = json.dumps({"error": {"message": "fake failure", "code": status}}).encode()
+                    return self._send(status, err, headers={"Retry-After": "0.05"} if status == 429 else None)
+
+                if not body.get("stream"):
+                    time.sleep(delay)
+                    out = {"model": body.get("model"), "usage": usage,
+                           "choices": [{"message": {"role": "assistant", "content": text}}]}
+                    return self._send(200, json.dumps(out).encode(), headers=quota)
+
+                # SSE: first token after ttfb, the rest spread over the remaining latency
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                for k, v in quota.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                words = text.split(" ")
+                time.sleep(min(fake.ttfb, delay))
+                gap = max(0.0, delay - fake.ttfb) / max(1, len(words))
+                for i, w in enumerate(words):
+                    chunk = {"choices": [{"delta": {"content": (" " if i else "") + w}}]}
+                    if i == len(words) - 1:
+                        chunk["x_groq"] = {"usage": usage}
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                    time.sleep(gap)
+                self._chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
@@ -0,0 +1,190 @@
+# bench/loadtest.py — Headless concurrent-visitor load test for flow.route
+#
+#   python bench/loadtest.py --visitors 50 --journeys 500
+#   python bench/loadtest.py --latency 1.2 --error-rate 0.1 --out run.json
+#
+# Each simulated visitor walks a full parent or school journey through
+# flow.route — type, age/size, goals/budget, name, email, phone, CTA, then
+# a free-form question — with no browser. Streamlit's session state is
+# replaced by a per-thread dict, Groq by bench/fake_groq.py, and leads go
+# to a throwaway SQLite file (export is off). Prints (or writes) one JSON report with
+# throughput and p50/p95/p99 latency per step, so runs can be diffed
+# between commits.
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.append(HERE)     # after the repo root: bench/scoring.py etc. must not shadow it
+
+# Must be set before lead_store / lead_export / groq_client are imported.
+# Synthetic leads stay in a throwaway store and never reach the CRM export.
+tmp = tempfile.mkdtemp(prefix="wiz-load-")
+os.environ.setdefault("WIZ_LEADS_DB", os.path.join(tmp, "leads.db"))
+os.environ.setdefault("WIZ_SESSION_DB", os.path.join(tmp, "sessions.db"))
+os.environ["WIZ_EXPORT_SINKS"] = ""
+os.environ["GROQ_API_KEY"] = "gsk_loadtest"
+
+import answer_cache
+import flow
+import groq_client
+import ratelimit
+from fake_groq import FakeGroq
+
+QUESTIONS = ["What's the fee?", "How many kids per batch?", "Is it online?",
+             "Do you teach Python?", "tell me a joke", "What is the class schedule?",
+             "How is WizKlub different from BYJU's?", "Do kids get a certificate?",
+             "फीस कितनी है?", "क्लास ऑनलाइन है या ऑफलाइन?", "डेमो क्लास कब है"]
+
+
+# ── Headless Streamlit: just enough of `st` for flow.py and groq_client ──────
+class FakeSession(dict):
+    def __getattr__(self, k):
+        try:
+            return self[k]
+        except KeyError:
+            raise AttributeError(k)
+
+    def __setattr__(self, k, v):
+        self[k] = v
+
+
+class HeadlessStreamlit:
+    secrets = {}
+    _local = threading.local()
+
+    @property
+    def session_state(self) -> FakeSession:
+        return self._local.state
+
+    def use(self, state: FakeSession):
+        self._local.state = state
+
+
+st = HeadlessStreamlit()
+flow.st = st
+groq_client.st = st
+
+
+# ── Journeys ──────────────────────────────────────────────────────────────────
+def script(kind: str, rng: random.Random, n: int) -> list:
+    """(step name, text, from_button) for one visitor."""
+    name = f"Visitor{n}"
+    if kind == "parent":
+        head = [("type", flow.TYPE_OPTS[0], True),
+                ("age", rng.choice(flow.AGE_OPTS), True),
+                ("goals", rng.choice(flow.GOAL_OPTS), True)]
+    else:
+        head = [("type", flow.TYPE_OPTS[1], True),
+                ("size", rng.choice(flow.SIZE_OPTS), True),
+                ("budget", rng.choice(flow.BUDGET_OPTS), True)]
+    return head + [
+        ("name", name, False),
+        ("email", f"{name.lower()}@example.com", False),
+        ("phone", f"+91 98{rng.randrange(10**8):08d}", False),
+        ("cta", rng.choice(flow.CTA_OPTS), True),
+        ("freeform", rng.choice(QUESTIONS), False),
+    ]
+
+
+def pct(xs: list, p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, max(0, int(round(p / 100 * len(xs) + 0.5)) - 1))]
+
+
+def run(args) -> dict:
+    fake = FakeGroq(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                    ttfb=args.ttfb, rpm=args.rpm, tpm=args.tpm).start()
+    groq_client.GROQ_URL = fake.url
+    # Without a quota the scheduler is sized so it never gets in the way
+    ratelimit.groq = ratelimit.Scheduler(args.rpm or 10**6, args.tpm or 10**9)
+    if args.no_answer_cache:
+        answer_cache.answers = answer_cache.AnswerCache(max_entries=0)
+
+    timings = defaultdict(list)
+    failures = defaultdict(int)
+    lock = threading.Lock()
+
+    def visitor(n: int):
+        rng = random.Random(args.seed + n)
+        kind = "school" if rng.random() < args.school_share else "parent"
+        st.use(FakeSession(flow.session_defaults()))
+        flow.start_greeting()
+        local = []
+        for step, text, from_button in script(kind, rng, n):
+            t0 = time.perf_counter()
+            try:
+                flow.route(text, from_button=from_button)
+            except Exception as e:
+                with lock:
+                    failures[f"{step}: {type(e).__name__}"] += 1
+                return
+            local.append((step, time.perf_counter() - t0))
+        with lock:
+            for step, dt in local:
+                timings[step].append(dt)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.visitors) as pool:
+        list(pool.map(visitor, range(args.journeys)))
+    wall = time.perf_counter() - t0
+    fake.stop()
+
+    steps = {
+        step: {
+            "count": len(xs),
+            "p50_ms": round(pct(xs, 50) * 1000, 2),
+            "p95_ms": round(pct(xs, 95) * 1000, 2),
+            "p99_ms": round(pct(xs, 99) * 1000, 2),
+            "max_ms": round(max(xs) * 1000, 2),
+        }
+        for step, xs in timings.items()
+    }
+    completed = len(timings.get("freeform", []))
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "wall_s": round(wall, 3),
+        "journeys_completed": completed,
+        "journeys_per_s": round(completed / wall, 2),
+        "steps_per_s": round(sum(len(x) for x in timings.values()) / wall, 2),
+        "steps": steps,
+        "failures": dict(failures),
+        "fake_groq": {"requests": fake.requests, "errors": fake.errors, "rate_limited": fake.limited},
+        "rate_limiter": ratelimit.groq.stats(),
+        "answer_cache": {**answer_cache.answers.stats(),
+                         # every question must get its own key, whatever the script
+                         "distinct_keys": len({answer_cache.cache_key(q, {}) for q in QUESTIONS}) == len(QUESTIONS)},
+        "llm_calls": groq_client.call_stats(),
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Headless concurrent-visitor load test")
+    ap.add_argument("--visitors", type=int, default=20, help="concurrent visitors")
+    ap.add_argument("--journeys", type=int, default=200, help="total journeys to run")
+    ap.add_argument("--latency", type=float, default=0.3, help="fake Groq mean latency (s)")
+    ap.add_argument("--jitter", type=float, default=0.1, help="fake Groq latency std dev (s)")
+    ap.add_argument("--ttfb", type=float, default=0.1, help="fake Groq time to first streamed token (s)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of fake Groq calls that fail")
+    ap.add_argument("--rpm", type=int, default=0, help="fake Groq requests/minute quota (0 = none)")
+    ap.add_argument("--tpm", type=int, default=0, help="fake Groq tokens/minute quota (0 = none)")
+    ap.add_argument("--school-share", type=float, default=0.3)
+    ap.add_argument("--no-answer-cache", action="store_true")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = ap.parse_args()
+    report = json.dumps(run(args), indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
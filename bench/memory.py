@@ -0,0 +1,114 @@
+# bench/memory.py — Memory held per chat session, old list-of-dicts vs MessageLog
+#
+#   python bench/memory.py
+#   python bench/memory.py --sessions 200 --turns 10 100 1000
+#
+# Builds many session transcripts the way flow.py does (quick replies,
+# bot prompts, AI answers) and renders the visible window after every turn
+# as app.py does, so each message carries its cached HTML. Measures the
+# bytes still allocated per session with tracemalloc for the previous
+# layout (a list of {"role", "text", "html"} dicts kept forever) and for
+# message_store.MessageLog. Also checks that spilled turns read back
+# intact. Output is one JSON object; exit 1 on a read-back mismatch.
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_render
+import flow
+import message_store
+from message_store import Message, MessageLog
+
+QUICK = flow.TYPE_OPTS + flow.AGE_OPTS + flow.GOAL_OPTS + flow.CTA_OPTS
+ANSWERS = [
+    "🧠 Our HOTS program builds critical thinking through puzzles and real-world problems. "
+    "Classes are live, small-batch and online — see https://wizklub.com/programs for details.",
+    "Fees depend on the program and duration — our team will share the exact plan for your child. 😊",
+    "Each batch has at most 6 kids, so every child gets attention from the mentor.\nWant to know more?",
+]
+
+
+def turns(n: int, rng: random.Random):
+    for i in range(n):
+        if i % 2:
+            yield "user", rng.choice(QUICK) if rng.random() < 0.6 else f"question {i}: how long is a class?"
+        else:
+            # Answers are generated per visitor, so each is a distinct string
+            yield "bot", f"{rng.choice(ANSWERS)} ({i})"
+
+
+# ── Previous layout, as chat_render used to cache it ─────────────────────────
+def old_html(messages: list, window: int) -> str:
+    for m in messages[-window:]:
+        if m.get("html_src") != m["text"]:
+            m["html"] = chat_render._render(SimpleNamespace(role=m["role"], text=m["text"]))
+            m["html_src"] = m["text"]
+    return "".join(m["html"] for m in messages[-window:])
+
+
+def old_session(n: int, rng: random.Random) -> list:
+    messages = []
+    for role, text in turns(n, rng):
+        messages.append({"role": role, "text": text})
+        old_html(messages, chat_render.WINDOW)
+    return messages
+
+
+def new_session(n: int, rng: random.Random) -> MessageLog:
+    log = MessageLog()
+    for role, text in turns(n, rng):
+        log.append(Message(role, text))
+        chat_render.transcript_html(log, chat_render.WINDOW)
+    return log
+
+
+def measure(build, sessions: int, n: int) -> int:
+    rng = random.Random(n)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    held = [build(n, rng) for _ in range(sessions)]
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del held
+    return used // sessions
+
+
+def main(args) -> int:
+    message_store.ARCHIVE_DIR = tempfile.mkdtemp(prefix="wiz-chat-")
+    report = {"sessions": args.sessions, "memory_window": message_store.MEMORY_WINDOW, "turns": {}}
+    for n in args.turns:
+        old = measure(old_session, args.sessions, n)
+        new = measure(new_session, args.sessions, n)
+        report["turns"][n] = {"old_bytes": old, "new_bytes": new,
+                              "saved": round(1 - new / old, 3) if old else 0.0}
+
+    # Spilled turns must come back exactly, in order
+    n = max(args.turns)
+    want = list(turns(n, random.Random(0)))
+    log = MessageLog()
+    for role, text in want:
+        log.append(Message(role, text))
+    got = [(m.role, m.text) for m in log.tail()]
+    report["archived_turns"] = log.archived
+    report["archive_bytes"] = os.path.getsize(log.archive_path) if log.archived else 0
+    report["readback_ok"] = got == want
+    del log
+    shutil.rmtree(message_store.ARCHIVE_DIR, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+    return 0 if report["readback_ok"] else 1
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Per-session chat memory benchmark")
+    ap.add_argument("--sessions", type=int, default=100)
+    ap.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    sys.exit(main(ap.parse_args()))
@@ -0,0 +1,61 @@
+# bench/relevance.py — Precision/recall of the local off-topic pre-classifier
+#
+#   python bench/relevance.py                     # report at the configured threshold
+#   python bench/relevance.py --sweep             # report across thresholds
+#
+# "Positive" = short-circuited as off-topic. Precision is the share of
+# deflections that were right; recall is the share of off-topic samples
+# caught locally; llm_calls_saved is the share of all samples that no longer
+# reach Groq. Samples live in bench/relevance_samples.jsonl.
+
+import argparse
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import relevance
+
+
+def load(path: str = os.path.join(HERE, "relevance_samples.jsonl")) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def report(samples: list, threshold: float) -> dict:
+    tp = fp = fn = 0
+    wrong = []
+    for s in samples:
+        hit = relevance.is_off_topic(s["text"], threshold)
+        off = s["label"] == "irrelevant"
+        tp += hit and off
+        fp += hit and not off
+        fn += off and not hit
+        if hit != off:
+            wrong.append(s["text"])
+    return {
+        "threshold": threshold,
+        "samples": len(samples),
+        "precision": round(tp / (tp + fp), 3) if tp + fp else 1.0,
+        "recall": round(tp / (tp + fn), 3) if tp + fn else 0.0,
+        "llm_calls_saved": round((tp + fp) / len(samples), 3),
+        "false_deflections": fp,
+        "misclassified": wrong,
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threshold", type=float, default=relevance.THRESHOLD)
+    ap.add_argument("--sweep", action="store_true")
+    args = ap.parse_args()
+    samples = load()
+    if args.sweep:
+        out = [report(samples, t / 100) for t in range(50, 100, 5)]
+        for r in out:
+            r.pop("misclassified")
+    else:
+        out = report(samples, args.threshold)
+    print(json.dumps(out, indent=2, ensure_ascii=False))
@@ -0,0 +1,73 @@
+# bench/retrieval.py — Prompt size (and optionally latency) with vs without retrieval
+#
+#   python bench/retrieval.py            # offline: estimated prompt tokens only
+#   python bench/retrieval.py --live     # also times real Groq calls (needs GROQ_API_KEY)
+#
+# "full" pastes the whole WIZKLUB_KNOWLEDGE into the system prompt (the old
+# behaviour); "retrieved" uses kb_index.retrieve. Output is one JSON object.
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import groq_client
+import prompt_builder
+from wizklub_context import WIZKLUB_KNOWLEDGE
+
+QUESTIONS = [
+    "What's the fee?",
+    "How many kids per batch?",
+    "Is it online?",
+    "What age group do you teach?",
+    "Do you teach Python?",
+    "How is this different from BYJU's?",
+    "What is the class schedule?",
+    "Do kids get a certificate?",
+    "How much does it cost for a school?",
+    "Will I get progress updates?",
+    "Can my child join from Delhi?",
+    "Tell me a joke",
+]
+
+LEAD = {"type": "Parent", "child_age": "8–10 years", "goals": "💻 Coding & programming"}
+
+
+def run(live: bool) -> dict:
+    out = {"questions": len(QUESTIONS), "modes": {}}
+    for mode, knowledge in (("full", WIZKLUB_KNOWLEDGE), ("retrieved", None)):
+        toks, lat = [], []
+        for q in QUESTIONS:
+            t0 = time.perf_counter()
+            msgs = groq_client._qa_messages(q, LEAD, [], knowledge=knowledge)
+            build_ms = (time.perf_counter() - t0) * 1000
+            toks.append(prompt_builder.prompt_tokens(msgs))
+            if live:
+                t0 = time.perf_counter()
+                groq_client._call(msgs, max_tokens=250, temperature=0.7)
+                lat.append((time.perf_counter() - t0) * 1000)
+        row = {
+            "prompt_tokens_mean": round(statistics.mean(toks), 1),
+            "prompt_tokens_max": max(toks),
+            "last_build_ms": round(build_ms, 3),
+        }
+        if lat:
+            row["latency_ms_p50"] = round(statistics.median(lat), 1)
+            row["latency_ms_max"] = round(max(lat), 1)
+        out["modes"][mode] = row
+    full, ret = out["modes"]["full"], out["modes"]["retrieved"]
+    out["prompt_token_reduction"] = round(1 - ret["prompt_tokens_mean"] / full["prompt_tokens_mean"], 3)
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--live", action="store_true", help="time real Groq calls")
+    args = ap.parse_args()
+    if args.live and not os.environ.get("GROQ_API_KEY"):
+        sys.exit("--live needs GROQ_API_KEY in the environment")
+    print(json.dumps(run(args.live), indent=2))
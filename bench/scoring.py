@@ -0,0 +1,122 @@
+# bench/scoring.py — Batch vs per-lead scoring, with a parity check
+#
+#   python bench/scoring.py               # 1,000,000 synthetic leads
+#   python bench/scoring.py --n 100000
+#
+# Builds a columnar batch from the real quick-reply options plus some
+# free-typed and missing values, scores it with batch_scoring.score_batch
+# and with calc_score one lead at a time, and fails (exit 1) on any
+# difference in score or band. Both are also checked against GOLDEN —
+# hand-worked scores for known leads under the original rules — so a
+# mistake in scoring.WEIGHTS can't pass just because both paths share it.
+# Output is one JSON object.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import batch_scoring
+from scoring import calc_score, score_label
+
+AGES    = ["5–7 years", "8–10 years", "11–13 years", "14–16 years", "", "nine"]
+GOALS   = ["💻 Coding & programming", "🧠 Critical thinking & reasoning",
+           "🏆 Competitive exam prep", "🎮 Fun, creative STEM learning", "", "art"]
+SIZES   = ["Under 200", "200–500", "500–1000", "1000+", "", "about 300"]
+BUDGETS = ["Under ₹500", "₹500–₹1,500", "₹1,500–₹3,000", "₹3,000+", "Not finalised yet", "", "Under 10k"]
+EMAILS  = ["{i}@example.com", "parent{i}@mail.in", "bad-email-{i}", ""]
+PHONES  = ["+91 98{i:08d}", "98765{i:05d}", "12{i}", ""]
+
+
+# (lead, score, band) — worked out by hand from the pre-WEIGHTS calc_score
+GOLDEN = [
+    ({"type": "School", "school_size": "1000+", "budget": "₹3,000+", "wants_demo": True,
+      "email": "head@school.edu", "phone": "+91 98765 43210"}, 90, "hot"),
+    ({"type": "Parent", "child_age": "8–10 years", "goals": "💻 Coding & programming",
+      "email": "a@b.in", "phone": "9876543210"}, 50, "warm"),
+    ({"type": "Parent", "child_age": "5–7 years", "goals": "🎮 Fun, creative STEM learning",
+      "wants_demo": True}, 48, "warm"),
+    ({"type": "School", "school_size": "Under 200", "budget": "Under ₹500",
+      "email": "bad-email", "phone": "12"}, 38, "cool"),
+    ({"type": "School", "school_size": "500–1000", "budget": "₹500–₹1,500", "wants_demo": True}, 72, "hot"),
+    ({"type": "School", "school_size": "200–500", "budget": "Not finalised yet"}, 35, "cool"),
+    ({"type": "School", "school_size": "about 300", "budget": "Under 10k", "wants_demo": True,
+      "email": "x@y.com", "phone": "98765-43210"}, 58, "warm"),
+    ({"type": "Parent", "child_age": "nine", "goals": "art", "wants_demo": True,
+      "email": "p@q.org", "phone": "(+91) 9876543210"}, 53, "warm"),     # phone too long: 16 chars
+    ({"type": "School", "child_age": "11–13 years", "goals": "🏆 Competitive exam prep",
+      "school_size": "1000+", "budget": "₹3,000+", "wants_demo": True,
+      "email": "a@b.co", "phone": "9876543210"}, 100, "hot"),
+    ({}, 5, "cool"),
+]
+
+
+def golden() -> int:
+    """Leads whose calc_score or score_batch result differs from GOLDEN."""
+    keys = ["type", "child_age", "goals", "school_size", "budget", "wants_demo", "email", "phone"]
+    batch = {k: np.array([lead.get(k, False if k == "wants_demo" else "") for lead, _, _ in GOLDEN])
+             for k in keys}
+    fast = batch_scoring.score_batch(batch)
+    fast_bands = batch_scoring.bands(fast)
+    bad = 0
+    for i, (lead, score, band) in enumerate(GOLDEN):
+        bad += (calc_score(lead) != score or score_label(calc_score(lead))["cls"] != band
+                or int(fast[i]) != score or fast_bands[i] != band)
+    return bad
+
+
+def synth(n: int, seed: int = 7) -> dict:
+    rng = np.random.default_rng(seed)
+    pick = lambda opts: np.array(opts)[rng.integers(0, len(opts), n)]
+    is_school = rng.random(n) < 0.3
+    ids = np.arange(n)
+    return {
+        "type":        np.where(is_school, "School", "Parent"),
+        "child_age":   np.where(is_school, "", pick(AGES)),
+        "goals":       np.where(is_school, "", pick(GOALS)),
+        "school_size": np.where(is_school, pick(SIZES), ""),
+        "budget":      np.where(is_school, pick(BUDGETS), ""),
+        "wants_demo":  rng.random(n) < 0.35,
+        "email":       np.array([EMAILS[k].format(i=i) for k, i in zip(rng.integers(0, 4, n), ids)]),
+        "phone":       np.array([PHONES[k].format(i=i % 10**5) for k, i in zip(rng.integers(0, 4, n), ids)]),
+    }
+
+
+def run(n: int) -> dict:
+    batch = synth(n)
+
+    t0 = time.perf_counter()
+    fast = batch_scoring.score_batch(batch)
+    fast_bands = batch_scoring.bands(fast)
+    t_batch = time.perf_counter() - t0
+
+    keys = list(batch)
+    cols = [batch[k].tolist() for k in keys]
+    t0 = time.perf_counter()
+    slow = np.fromiter((calc_score(dict(zip(keys, row))) for row in zip(*cols)), dtype=np.int16, count=n)
+    t_scalar = time.perf_counter() - t0
+    slow_bands = np.array([score_label(int(s))["cls"] for s in slow])
+
+    mismatches = int(np.count_nonzero(fast != slow)) + int(np.count_nonzero(fast_bands != slow_bands))
+    return {
+        "leads": n,
+        "batch_s": round(t_batch, 3),
+        "scalar_s": round(t_scalar, 3),
+        "speedup": round(t_scalar / t_batch, 1),
+        "batch_leads_per_s": int(n / t_batch),
+        "parity_mismatches": mismatches,
+        "golden_mismatches": golden(),
+        "band_counts": {c: int(np.count_nonzero(fast_bands == c)) for c in ("hot", "warm", "cool")},
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    out = run(ap.parse_args().n)
+    print(json.dumps(out, indent=2))
+    sys.exit(1 if out["parity_mismatches"] or out["golden_mismatches"] else 0)
@@ -0,0 +1,113 @@
+# bench/sessions.py — Conversation snapshot size and save/restore cost
+#
+#   python bench/sessions.py
+#   python bench/sessions.py --turns 10 100 1000 --repeat 500
+#
+# Walks a visitor through flow.route headlessly (no Groq key, so answers are
+# the canned replies), then keeps chatting to the given number of turns. For
+# each length it reports the snapshot size and the time to snapshot, save to
+# session_store, load, and restore into a fresh session — the work another
+# replica does to pick the conversation up. Also checks the restored session
+# equals the original. Output is one JSON object; exit 1 on a mismatch.
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+tmp = tempfile.mkdtemp(prefix="wiz-sessions-")
+os.environ["WIZ_SESSION_DB"] = os.path.join(tmp, "sessions.db")
+os.environ["WIZ_LEADS_DB"] = os.path.join(tmp, "leads.db")
+os.environ["WIZ_CHAT_ARCHIVE"] = os.path.join(tmp, "chat")
+os.environ["WIZ_EXPORT_SINKS"] = ""
+os.environ.pop("GROQ_API_KEY", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import flow
+import session_store
+
+
+class FakeSession(dict):
+    def __getattr__(self, k):
+        try:
+            return self[k]
+        except KeyError:
+            raise AttributeError(k)
+
+    def __setattr__(self, k, v):
+        self[k] = v
+
+
+class HeadlessStreamlit:
+    secrets = {}
+    session_state = None
+
+
+st = HeadlessStreamlit()
+flow.st = st
+flow.has_key = lambda: False
+
+
+def conversation(turns: int, sid: str) -> FakeSession:
+    st.session_state = FakeSession(flow.session_defaults(), sid=sid)
+    flow.start_greeting()
+    steps = [(flow.TYPE_OPTS[0], True), (flow.AGE_OPTS[1], True), (flow.GOAL_OPTS[0], True),
+             ("Asha", False), ("asha@example.com", False), ("+91 98765 43210", False),
+             (flow.CTA_OPTS[0], True)]
+    for text, button in steps:
+        flow.route(text, from_button=button)
+    i = 0
+    while len(st.session_state.messages) < turns:
+        flow.route(f"Question {i}: how many kids per batch?")
+        i += 1
+    return st.session_state
+
+
+def state_of(ss) -> tuple:
+    return (ss.step, ss.lead, ss.options, len(ss.messages),
+            [(m.role, m.text) for m in ss.messages.recent()])
+
+
+def us(f, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        f()
+    return round((time.perf_counter() - t0) / repeat * 1e6, 1)
+
+
+def main(args) -> int:
+    report = {"turns": {}}
+    ok = True
+    for n in args.turns:
+        sid = f"bench-{n}"
+        original = conversation(n, sid)
+        snap = flow.snapshot()
+        data = json.dumps(snap, ensure_ascii=False, separators=(",", ":"))
+
+        def restore():
+            st.session_state = FakeSession(flow.session_defaults())
+            flow.restore(session_store.load(sid))
+
+        row = {
+            "messages": len(original.messages),
+            "in_snapshot": len(snap["messages"]["recent"]),
+            "snapshot_bytes": len(data.encode("utf-8")),
+            "snapshot_us": us(flow.snapshot, args.repeat),
+            "save_us": us(lambda: session_store.save(sid, snap), args.repeat),
+            "load_us": us(lambda: session_store.load(sid), args.repeat),
+            "load_and_restore_us": us(restore, args.repeat),
+        }
+        row["restored_ok"] = state_of(st.session_state) == state_of(original)
+        ok &= row["restored_ok"]
+        report["turns"][n] = row
+    print(json.dumps(report, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Conversation snapshot benchmark")
+    ap.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--repeat", type=int, default=200)
+    sys.exit(main(ap.parse_args()))
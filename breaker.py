@@ -0,0 +1,126 @@
+# breaker.py — Per-call-type circuit breakers for Groq
+# Each call type (answer, freeform, insight, closing) keeps a rolling window
+# of recent calls. A call fails if it errors or times out, or if it runs past
+# that type's latency budget. Once enough of the window has failed the
+# breaker opens:
+#   - optional calls (insight, closing) are skipped instantly — the flow
+#     already carries on without them;
+#   - essential calls (answers) still go out, with a tight deadline, no
+#     retries and a fallback reply instead of a long wait.
+# After COOLDOWN seconds the breaker goes half-open and lets one probe
+# through at normal settings; a good probe closes it, a bad one reopens it.
+
+import os
+import threading
+import time
+from collections import deque
+
+WINDOW      = int(os.environ.get("WIZ_BREAKER_WINDOW", "20"))     # calls per rolling window
+MIN_CALLS   = 5            # don't judge on fewer calls than this
+FAIL_RATE   = float(os.environ.get("WIZ_BREAKER_FAIL_RATE", "0.5"))
+COOLDOWN    = float(os.environ.get("WIZ_BREAKER_COOLDOWN", "30"))  # seconds open before probing
+TIGHT_TIMEOUT = float(os.environ.get("WIZ_BREAKER_TIGHT_TIMEOUT", "6"))   # answers while open
+
+# Seconds after which a successful call still counts as a failure
+LATENCY_BUDGET = {"answer": 8.0, "freeform": 8.0, "insight": 4.0, "closing": 4.0}
+ESSENTIAL = {"answer", "freeform"}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class Breaker:
+    def __init__(self, name: str, budget: float):
+        self.name = name
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=WINDOW)     # (failed, latency_s)
+        self._opened_at = None
+        self._probing = False
+        self.trips = 0
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        return OPEN if now - self._opened_at < COOLDOWN else HALF_OPEN
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def gate(self) -> str:
+        """How to run the next call: "normal", "probe", "tight" (essential while open) or "skip"."""
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == CLOSED:
+                return "normal"
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return "probe"
+            return "tight" if self.name in ESSENTIAL else "skip"
+
+    def release(self):
+        """The probe never reached Groq (e.g. shed by the rate limiter) — let another try."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, ok: bool, latency_s: float, probe: bool = False):
+        failed = not ok or latency_s > self.budget
+        with self._lock:
+            if probe and self._probing:
+                self._probing = False
+                if failed:
+                    self._opened_at = time.monotonic()
+                else:
+                    self._opened_at = None
+                    self._calls.clear()
+                return
+            if self._opened_at is not None:
+                return                         # only the probe decides while open
+            self._calls.append((failed, latency_s))
+            n = len(self._calls)
+            if n >= MIN_CALLS and sum(f for f, _ in self._calls) / n >= FAIL_RATE:
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                print(f"[Breaker] {self.name} opened")
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = list(self._calls)
+            state = self._state(time.monotonic())
+        lat = sorted(l for _, l in calls)
+        return {
+            "state": state,
+            "calls": len(calls),
+            "fail_rate": round(sum(f for f, _ in calls) / len(calls), 2) if calls else 0.0,
+            "p50_s": round(lat[len(lat) // 2], 2) if lat else 0.0,
+            "budget_s": self.budget,
+            "trips": self.trips,
+        }
+
+
+breakers = {name: Breaker(name, budget) for name, budget in LATENCY_BUDGET.items()}
+
+
+def for_caller(caller: str) -> Breaker:
+    b = breakers.get(caller)
+    if b is None:
+        b = breakers.setdefault(caller, Breaker(caller, LATENCY_BUDGET["answer"]))
+    return b
+
+
+def overall(names=ESSENTIAL) -> str:
+    """Worst state across the `names` call types.
+
+    The chat header shows the essential ones: an open insight or closing
+    breaker only drops optional extras, and the visitor can't tell.
+    """
+    states = {b.state for name, b in breakers.items() if name in names}
+    for s in (OPEN, HALF_OPEN):
+        if s in states:
+            return s
+    return CLOSED
+
+
+def stats() -> dict:
+    return {name: b.stats() for name, b in breakers.items()}
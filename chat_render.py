@@ -0,0 +1,38 @@
+# chat_render.py — Chat transcript → HTML, one message at a time
+# Each message is converted (escape-free newline/URL handling, bubble markup)
+# once and the fragment is cached on the message itself, so a rerun only
+# formats messages that are new or still streaming in. The window view
+# renders just the last N messages and only those keep their fragment;
+# older ones load on demand (from the session's archive, if message_store
+# has spilled them).
+
+import re
+
+WINDOW = 40          # messages shown before "Show earlier messages"
+
+_URL = re.compile(r"(https?://\S+)")
+_LINK = r'<a href="\1" target="_blank" style="color:#2d6a4f;text-decoration:underline">\1</a>'
+
+
+def _render(m) -> str:
+    txt = _URL.sub(_LINK, m.text.replace("\n", "<br>"))
+    if m.role == "bot":
+        return f'<div class="row"><div class="av b">🌱</div><div class="bbl b">{txt}</div></div>'
+    return f'<div class="row user"><div class="av u">😊</div><div class="bbl u">{txt}</div></div>'
+
+
+def fragment(m) -> str:
+    # Keyed on the text so a bubble that is still streaming gets refreshed
+    if m.html_src != m.text:
+        m.html = _render(m)
+        m.html_src = m.text
+    return m.html
+
+
+def transcript_html(messages, window: int = None) -> str:
+    """`messages` is a message_store.MessageLog."""
+    shown = messages.tail(window)
+    # Bubbles scrolled out of the window drop their cached HTML
+    for m in messages.recent()[:-len(shown) or None]:
+        m.html = m.html_src = None
+    return '<div class="chat-win">' + "".join(fragment(m) for m in shown) + "</div>"
@@ -1,18 +1,134 @@
 # flow.py — Conversation flow (rule-based + AI hybrid)
 
 import re
+import time
 import streamlit as st
 from scoring import calc_score
-from groq_client import answer_question, qualification_insight, ai_closing, has_key
+from groq_client import answer_question_stream, profile_texts, ai_closing, has_key
+import insight_table
+import lead_export
+import lead_store
+import llm_metrics
+import message_store
+import prefetch
+import session_store
+from message_store import Message, MessageLog
+
+# Quick-reply option values — also the key space of insight_table
+TYPE_OPTS   = ["👨‍👩‍👧 My child — I'm a parent", "🏫 My school / institution"]
+AGE_OPTS    = ["5–7 years", "8–10 years", "11–13 years", "14–16 years"]
+GOAL_OPTS   = ["💻 Coding & programming", "🧠 Critical thinking & reasoning",
+               "🏆 Competitive exam prep", "🎮 Fun, creative STEM learning"]
+SIZE_OPTS   = ["Under 200", "200–500", "500–1000", "1000+"]
+BUDGET_OPTS = ["Under ₹500", "₹500–₹1,500", "₹1,500–₹3,000", "₹3,000+", "Not finalised yet"]
+CTA_OPTS    = ["📅 Book a free demo session", "📩 Send me details by email first",
+               "🗣️ I'd like to speak to someone now"]
+# Quick replies recur in every transcript — keep one copy of each for all sessions
+message_store.register(TYPE_OPTS, AGE_OPTS, GOAL_OPTS, SIZE_OPTS, BUDGET_OPTS, CTA_OPTS)
+
+def session_defaults() -> dict:
+    """Fresh conversation state for one visitor (app.py adds its UI-only keys)."""
+    return {
+        "messages":   MessageLog(),
+        "step":       "start",
+        "lead": {"name":"","email":"","phone":"","type":"","child_age":"",
+                 "goals":"","school_size":"","budget":"","wants_demo":False,"score":0},
+        "options":    [],
+        "pending_insight": None,
+        "closing_draft": None,
+    }
 
-def bot(t): st.session_state.messages.append({"role": "bot",  "text": t})
-def user(t): st.session_state.messages.append({"role": "user", "text": t})
-def opts(o): st.session_state.options = o
-def step(s): st.session_state.step = s
+def bot(t): st.session_state.messages.append(Message("bot", t))
+def user(t): st.session_state.messages.append(Message("user", t))
+def opts(o): st.session_state.options = list(o)
 def L(): return st.session_state.lead
 def H(): return st.session_state.messages
 
 
+def bot_stream(chunks, every: float = 0.05):
+    """Append a bot message and grow it chunk by chunk.
+
+    app.py registers st.session_state.paint, which repaints the chat window
+    in place; we call it at most every `every` seconds while tokens arrive.
+    """
+    m = Message("bot", "")
+    st.session_state.messages.append(m)
+    paint = st.session_state.get("paint")
+    last = 0.0
+    for c in chunks:
+        m.text += c
+        if paint and time.monotonic() - last >= every:
+            paint()
+            last = time.monotonic()
+    m.text = m.text.strip()
+    if paint:
+        paint()
+
+
+# ── Background insight — computed off the click path, attached when ready ────
+# The insight acknowledges the visitor's situation, so it only makes sense
+# while we're still collecting their contact details and the answers it was
+# based on haven't changed. Anything that lands later is dropped. The same
+# call drafts the closing line (see groq_client.profile_texts), which is
+# kept for the CTA step as long as the answers still match.
+INSIGHT_STEPS = ("name", "email", "phone")
+
+
+def _insight_inputs(lead: dict) -> tuple:
+    return tuple(lead.get(k, "") for k in ("type", "child_age", "goals", "school_size", "budget"))
+
+
+def prefetch_insight():
+    lead = dict(L())
+    st.session_state.pending_insight = {
+        "future": prefetch.submit(profile_texts, lead),
+        "inputs": _insight_inputs(lead),
+    }
+
+
+def _insight():
+    # Pregenerated text is instant; anything else is generated in the background
+    text = insight_table.lookup("insight", L())
+    if text:
+        bot(text)
+    elif has_key():
+        prefetch_insight()
+
+
+def collect_pending() -> bool:
+    """Attach a finished background insight. Returns True if a message was added."""
+    p = st.session_state.get("pending_insight")
+    if not p or not p["future"].done():
+        return False
+    st.session_state.pending_insight = None
+    if _insight_inputs(L()) != p["inputs"]:
+        return False
+    try:
+        texts = p["future"].result()
+    except Exception as e:
+        print(f"[Prefetch] insight failed: {e}")
+        return False
+    if texts["closing"]:
+        st.session_state.closing_draft = {"text": texts["closing"], "inputs": p["inputs"]}
+    added = bool(texts["insight"]) and st.session_state.step in INSIGHT_STEPS
+    if added:
+        bot(texts["insight"])
+    save_session()
+    return added
+
+
+def wait_pending(timeout: float = 20) -> bool:
+    """Block until the pending insight finishes (or timeout). True if it finished."""
+    p = st.session_state.get("pending_insight")
+    if not p:
+        return False
+    try:
+        p["future"].result(timeout=timeout)
+    except Exception:
+        pass
+    return p["future"].done()
+
+
 def start_greeting():
     bot("👋 Hi! I'm Wiz, WizKlub's learning guide.")
     bot(
@@ -20,8 +136,8 @@ def start_greeting():
         "through research-backed programs trusted by 50,000+ families and 200+ schools. 🌱\n\n"
         "Who are you exploring this for?"
     )
-    opts(["👨‍👩‍👧 My child — I'm a parent", "🏫 My school / institution"])
-    step(1)
+    enter("type")
+    save_session()
 
 
 def route(text: str, from_button: bool = False):
@@ -29,44 +145,30 @@ def route(text: str, from_button: bool = False):
     Main router called on every user input.
 
     from_button=True  → user clicked a quick-reply button.
-                        Always goes straight to the step handler.
+                        Always goes straight to the state's handler.
                         Never intercepted by the AI mid-flow check.
 
     from_button=False → user typed something freely.
-                        If we're mid-flow and it looks like a question,
-                        the AI handles it and we re-show the current options.
+                        In a state that takes questions, the AI answers
+                        and the state's options are shown again.
     """
-    s  = st.session_state.step
-    aw = st.session_state.awaiting
-
-    # Typed field collection — always rule-based regardless of source
-    if aw == "name":  handle_name(text);  return
-    if aw == "email": handle_email(text); return
-    if aw == "phone": handle_phone(text); return
-
-    # Mid-flow free-text interception — only for typed input, never button clicks
-    # s can be int or string ("ss"/"sb") so guard the numeric compare
-    mid_flow = (isinstance(s, int) and 1 < s < 7) or s in ("ss", "sb")
-    if mid_flow and not from_button:
+    collect_pending()   # land any finished insight before this turn's messages
+
+    state = STATES[st.session_state.step]
+    if state.questions and not from_button:
         user(text)
         opts([])
         if has_key():
-            reply = answer_question(text, L(), H())
-            bot(reply)
+            # Snapshot history — the stream is lazy and bot_stream appends first
+            bot_stream(answer_question_stream(text, L(), H().recent()))
         else:
             bot("Let me finish getting your details first — then I can answer anything! 😊")
-        _reshow(s)
-        return
-
-    # Normal step routing
-    handlers = {
-        1: handle_type, 2: handle_child_age, 3: handle_goals,
-        "ss": handle_school_size, "sb": handle_school_budget,
-        4: handle_name, 5: handle_email, 6: handle_phone,
-        7: handle_cta, 8: handle_freeform,
-    }
-    if s in handlers:
-        handlers[s](text)
+        opts(state.options)
+    elif state.on_input:
+        nxt = state.on_input(text)
+        if nxt:
+            enter(nxt)
+    save_session()
 
 
 def handle_type(v):
@@ -74,113 +176,86 @@ def handle_type(v):
     L()["type"] = "Parent" if "parent" in v.lower() or "child" in v.lower() else "School"
     if L()["type"] == "Parent":
         bot("Great! Let's find the right program for your child. How old are they?")
-        opts(["5–7 years", "8–10 years", "11–13 years", "14–16 years"])
-        step(2)
+        return "child_age"
     else:
         bot(
             "Wonderful! WizKlub's school program integrates into your curriculum, "
             "includes teacher training, and runs for Grades 1–9. 🏫\n\n"
             "How many students are enrolled?"
         )
-        opts(["Under 200", "200–500", "500–1000", "1000+"])
-        step("ss")
+        return "school_size"
 
 
 def handle_child_age(v):
     user(v)
     L()["child_age"] = v
     bot("What's the most important outcome you're looking for?")
-    opts([
-        "💻 Coding & programming",
-        "🧠 Critical thinking & reasoning",
-        "🏆 Competitive exam prep",
-        "🎮 Fun, creative STEM learning",
-    ])
-    step(3)
+    return "goals"
 
 
 def handle_goals(v):
     user(v)
     L()["goals"] = v
-    if has_key():
-        insight = qualification_insight(L())
-        if insight:
-            bot(insight)
+    _insight()
     bot(
         f"We have structured programs for the {L()['child_age']} range with measurable "
         "progress tracked every 4 weeks. To send you the right curriculum — what's your name?"
     )
-    opts([])
-    st.session_state.awaiting = "name"
-    step(4)
+    return "name"
 
 
 def handle_school_size(v):
     user(v)
     L()["school_size"] = v
     bot("What's your approximate per-student STEM budget annually?")
-    opts(["Under ₹500", "₹500–₹1,500", "₹1,500–₹3,000", "₹3,000+", "Not finalised yet"])
-    step("sb")
+    return "school_budget"
 
 
 def handle_school_budget(v):
     user(v)
     L()["budget"] = v
-    if has_key():
-        insight = qualification_insight(L())
-        if insight:
-            bot(insight)
+    _insight()
     bot(
         f"Our partnerships team works with schools of {L()['school_size']} students regularly "
         "and can build a fully costed proposal. Who should we address it to?"
     )
-    opts([])
-    st.session_state.awaiting = "name"
-    step(4)
+    return "name"
 
 
 def handle_name(v):
     user(v)
     L()["name"] = v.strip()
     bot(f"Nice to meet you, {L()['name']}! 😊 What's your email address?")
-    st.session_state.awaiting = "email"
-    step(5)
+    return "email"
 
 
 def handle_email(v):
     if not re.match(r"^[^\s@]+@[^\s@]+\.[^\s@]+$", v.strip()):
         bot("That email doesn't look right — could you double check? (e.g. you@example.com)")
-        return
+        return None
     user(v)
     L()["email"] = v.strip()
     bot("And your phone number? Our team usually follows up within 2 hours.")
-    st.session_state.awaiting = "phone"
-    step(6)
+    return "phone"
 
 
 def handle_phone(v):
     if not re.match(r"^[\d\s\+\-\(\)]{8,15}$", v.strip()):
         bot("Please enter a valid phone number (at least 8 digits).")
-        return
+        return None
     user(v)
     L()["phone"] = v.strip()
-    st.session_state.awaiting = None
     bot(f"Almost done, {L()['name']}! How would you like to move forward?")
-    opts([
-        "📅 Book a free demo session",
-        "📩 Send me details by email first",
-        "🗣️ I'd like to speak to someone now",
-    ])
-    step(7)
+    return "cta"
 
 
 def handle_cta(v):
     user(v)
     L()["wants_demo"] = "demo" in v.lower()
-    if L()["wants_demo"]:
-        st.session_state.demo_count += 1
     L()["score"] = calc_score(L())
-    st.session_state.all_leads.append(dict(L()))
+    lead_id = lead_store.add(L())                  # a repeat visitor merges into their earlier lead
+    lead_export.submit(lead_store.get(lead_id))    # queued only; delivery runs in the background
+    llm_metrics.lead_captured()
 
     # Confirmation — demo is mentioned here because the person explicitly chose it
     if "demo" in v.lower():
@@ -194,39 +269,149 @@ def handle_cta(v):
         bot(f"📞 Someone from our team will call {L()['phone']} within 30 minutes during business hours.")
 
     # AI-generated warm closing — no demo mention (enforced in groq_client)
-    if has_key():
-        closing = ai_closing(L())
+    # Served from insight_table when the profile is in it, so no key needed then
+    if has_key() or insight_table.covers("closing", L()):
+        # Use the draft the insight call wrote if it has finished; never wait on it
+        # here — it is slowest exactly when Groq is degraded, and the closing is
+        # optional (ai_closing's own call goes through the breaker)
+        if wait_pending(timeout=0):
+            collect_pending()
+        draft = st.session_state.get("closing_draft")
+        closing = ai_closing(L(), draft["text"] if draft and draft["inputs"] == _insight_inputs(L()) else None)
         if closing:
             bot(closing)
 
     # Open the floor for questions — no demo push
     bot("Feel free to ask me anything about WizKlub — programs, how classes work, fees, anything! 😊")
-    step(8)
+    return "freeform"
 
 
 def handle_freeform(text):
-    # Step 8: all messages go to AI.
+    # Last state: all messages go to AI.
     # The AI handles WizKlub questions AND irrelevant ones (deflects politely).
     # No fallback demo mention here.
     user(text)
     if has_key():
-        bot(answer_question(text, L(), H()))
+        bot_stream(answer_question_stream(text, L(), H().recent(), caller="freeform"))
     else:
         bot(
             "Happy to help — reach us at hello@wizklub.com and the team will answer anything! 😊"
         )
 
 
-def _reshow(s):
-    m = {
-        1:    ["👨‍👩‍👧 My child — I'm a parent", "🏫 My school / institution"],
-        2:    ["5–7 years", "8–10 years", "11–13 years", "14–16 years"],
-        3:    ["💻 Coding & programming", "🧠 Critical thinking & reasoning",
-               "🏆 Competitive exam prep", "🎮 Fun, creative STEM learning"],
-        "ss": ["Under 200", "200–500", "500–1000", "1000+"],
-        "sb": ["Under ₹500", "₹500–₹1,500", "₹1,500–₹3,000", "₹3,000+", "Not finalised yet"],
-        7:    ["📅 Book a free demo session", "📩 Send me details by email first",
-               "🗣️ I'd like to speak to someone now"],
-    }
-    if s in m:
-        opts(m[s])
+# ── Conversation states ───────────────────────────────────────────────────────
+# The whole journey in one table. Each state names the handler that takes the
+# visitor's input and returns the next state (None stays put), the quick
+# replies shown while in it, the states it may move to, and whether typed
+# text there is a question for the AI (quick replies still answer the step).
+# compile_flow() checks the table once at import; route() is then a lookup.
+FLOW = {
+    "start":         {"to": ["type"]},                       # before the greeting
+    "type":          {"on": handle_type,          "options": TYPE_OPTS,   "to": ["child_age", "school_size"]},
+    "child_age":     {"on": handle_child_age,     "options": AGE_OPTS,    "to": ["goals"],         "questions": True},
+    "goals":         {"on": handle_goals,         "options": GOAL_OPTS,   "to": ["name"],          "questions": True},
+    "school_size":   {"on": handle_school_size,   "options": SIZE_OPTS,   "to": ["school_budget"], "questions": True},
+    "school_budget": {"on": handle_school_budget, "options": BUDGET_OPTS, "to": ["name"],          "questions": True},
+    "name":          {"on": handle_name,          "to": ["email"]},
+    "email":         {"on": handle_email,         "to": ["phone"]},
+    "phone":         {"on": handle_phone,         "to": ["cta"]},
+    "cta":           {"on": handle_cta,           "options": CTA_OPTS,    "to": ["freeform"]},
+    "freeform":      {"on": handle_freeform},
+}
+
+
+class State:
+    __slots__ = ("name", "on_input", "options", "to", "questions")
+
+    def __init__(self, name: str, on=None, options=(), to=(), questions=False):
+        self.name = name
+        self.on_input = on
+        self.options = tuple(options)
+        self.to = frozenset(to)
+        self.questions = questions
+
+
+def compile_flow(flow: dict) -> dict:
+    states = {name: State(name, **spec) for name, spec in flow.items()}
+    for s in states.values():
+        missing = s.to - states.keys()
+        if missing:
+            raise ValueError(f"flow state {s.name!r} leads to unknown {sorted(missing)}")
+    return states
+
+
+STATES = compile_flow(FLOW)
+
+
+def enter(name: str):
+    here = STATES[st.session_state.step]
+    if name not in here.to:
+        raise ValueError(f"no transition {here.name!r} → {name!r}")
+    st.session_state.step = name
+    opts(STATES[name].options)
+
+
+# ── Snapshot / restore ────────────────────────────────────────────────────────
+# Everything needed to carry on a conversation, as plain JSON: the state
+# name, the lead, the closing draft and the recent transcript. Rendered HTML,
+# the paint callback and in-flight futures stay behind — they're rebuilt or
+# simply redone on the replica that restores it. Restoring sets fields; no
+# handler runs.
+SNAPSHOT_VERSION = 1
+
+
+def snapshot() -> dict:
+    ss = st.session_state
+    return {"v": SNAPSHOT_VERSION, "step": ss.step, "lead": dict(ss.lead),
+            "closing_draft": ss.closing_draft, "messages": ss.messages.snapshot()}
+
+
+def restore(snap: dict) -> bool:
+    """Load a snapshot into this session. False (and nothing changed) if it doesn't fit this flow."""
+    if not snap or snap.get("v") != SNAPSHOT_VERSION or snap.get("step") not in STATES:
+        return False
+    ss = st.session_state
+    ss.step = snap["step"]
+    ss.lead = {**session_defaults()["lead"], **snap["lead"]}
+    ss.closing_draft = snap.get("closing_draft")
+    ss.messages = MessageLog.restore(snap["messages"])
+    ss.pending_insight = None
+    opts(STATES[ss.step].options)
+    return True
+
+
+# A finished conversation (lead captured) is never reopened from its ?sid=:
+# a reload, bookmark or shared link on a kiosk would show the last visitor's
+# name, email and phone to the next one.
+DONE_STEPS = {"freeform"}
+
+
+def resume(sid: str) -> bool:
+    """Pick up conversation `sid` from session_store (saved by any replica).
+
+    False, with the session untouched, if there is nothing to resume or the
+    conversation is already past the CTA — the caller starts a new one.
+    """
+    snap = session_store.load(sid)
+    if not snap or snap.get("step") in DONE_STEPS or not restore(snap):
+        return False
+    st.session_state.sid = sid
+    return True
+
+
+def new_session(sid: str):
+    """Start over under a fresh id; the old conversation is deleted, not just left behind."""
+    ss = st.session_state
+    old = ss.get("sid")
+    if old:
+        session_store.delete(old)
+        ss.messages.discard()
+    for k, v in session_defaults().items():
+        ss[k] = v
+    ss.sid = sid
+
+
+def save_session():
+    sid = st.session_state.get("sid")
+    if sid:
+        session_store.save(sid, snapshot())
@@ -1,16 +1,74 @@
 # groq_client.py
 # Model: llama-3.3-70b-versatile (Groq, free tier)
 
+import json
 import os
+import random
+import re
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 import streamlit as st
-from wizklub_context import WIZKLUB_KNOWLEDGE
+import answer_cache
+import breaker
+import insight_table
+import llm_metrics
+import llm_tape
+import prompt_builder
+import ratelimit
+import relevance
+import singleflight
 
 GROQ_URL   = "https://api.groq.com/openai/v1/chat/completions"
 GROQ_MODEL = "llama-3.3-70b-versatile"
 
+# ── HTTP transport — one pooled keep-alive session shared by every visitor ───
+# Streamlit runs each browser session on its own thread inside one process, so
+# a module-level session lets all of them reuse warm TLS connections to Groq
+# instead of paying a fresh handshake on every chat turn.
+POOL_SIZE       = int(os.environ.get("GROQ_POOL_SIZE", "32"))
+CONNECT_TIMEOUT = 3.05     # seconds to establish TCP + TLS
+READ_TIMEOUT    = 20       # seconds to wait for the completion body
+MAX_RETRIES     = 3        # extra attempts after the first on 429 / 5xx
+BACKOFF_BASE    = 0.5      # seconds; doubled per attempt, full jitter
+BACKOFF_MAX     = 8.0      # cap for both computed and Retry-After waits
+RETRY_STATUS    = {429, 500, 502, 503, 504}
+COALESCE_WAIT   = float(os.environ.get("GROQ_COALESCE_WAIT", "30"))   # max wait on another session's call
+
+_session = None
+_session_lock = threading.Lock()
+_local = threading.local()     # per-thread key override for background workers
+
+
+def _http() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE,
+                                      pool_block=True, max_retries=0)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return _session
+
+
+def _backoff(attempt: int, retry_after: str = None) -> float:
+    # Honour the server's Retry-After (seconds form) when it sends one
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
 
 def get_key() -> str:
+    key = getattr(_local, "key", "")
+    if key:
+        return key
     try:
         key = st.secrets.get("GROQ_API_KEY", "")
         if key:
@@ -24,32 +82,203 @@ def get_key() -> str:
 
 
 def has_key() -> bool:
-    return bool(get_key())
+    # A replay tape stands in for the API, so the AI paths stay enabled offline
+    return bool(get_key()) or llm_tape.replaying()
+
 
+def run_with_key(key: str, fn, *args):
+    """Run fn(*args) with `key` as this thread's Groq key.
+
+    Worker threads have no Streamlit session, so a key the visitor pasted into
+    the chat page is invisible to get_key() there unless it is handed over.
+    """
+    prev = getattr(_local, "key", "")
+    _local.key = key
+    try:
+        return fn(*args)
+    finally:
+        _local.key = prev
 
-def _call(messages: list, max_tokens: int = 300, temperature: float = 0.7) -> str:
+
+def _post(key: str, payload: dict, stream: bool = False, read_timeout: float = None,
+          retries: int = None) -> requests.Response:
+    """POST to Groq on the pooled session, retrying 429/5xx and connect failures."""
+    read_timeout = READ_TIMEOUT if read_timeout is None else read_timeout
+    retries = MAX_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        last = attempt == retries
+        try:
+            r = _http().post(
+                GROQ_URL,
+                headers={"Authorization": f"Bearer {key}", "Content-Type": "application/json"},
+                json=payload,
+                timeout=(CONNECT_TIMEOUT, read_timeout),
+                stream=stream,
+            )
+        except requests.exceptions.ConnectionError:
+            # ConnectTimeout is a ConnectionError; ReadTimeout is not and propagates
+            if last:
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+        ratelimit.groq.observe(r.headers)
+        if r.status_code in RETRY_STATUS and not last:
+            wait = _backoff(attempt, r.headers.get("Retry-After"))
+            r.close()
+            time.sleep(wait)
+            continue
+        return r
+
+
+def _call(messages: list, max_tokens: int = 300, temperature: float = 0.7,
+          caller: str = "answer", json_mode: bool = False) -> str:
+    req = {"model": GROQ_MODEL, "messages": messages,
+           "max_tokens": max_tokens, "temperature": temperature}
+    if json_mode:
+        req["response_format"] = {"type": "json_object"}
+    if llm_tape.replaying():
+        t0 = time.perf_counter()
+        text = llm_tape.replay(req)
+        llm_metrics.record(caller, llm_metrics.outcome_for(text), time.perf_counter() - t0, model=GROQ_MODEL)
+        return text
     key = get_key()
     if not key:
         return ""
+    # An identical request already in flight from another session is shared, not repeated.
+    # Only the leader passes the breaker gate, so a probe is always settled by the call it admits.
     try:
-        r = requests.post(
-            GROQ_URL,
-            headers={"Authorization": f"Bearer {key}", "Content-Type": "application/json"},
-            json={"model": GROQ_MODEL, "messages": messages,
-                  "max_tokens": max_tokens, "temperature": temperature},
-            timeout=20,
-        )
+        return singleflight.calls.do(llm_tape.fingerprint(req), _complete, key, req, caller,
+                                     timeout=COALESCE_WAIT)
+    except TimeoutError as e:
+        print(f"[Groq] {e}")
+        return ""
+
+
+def _admit(req: dict, caller: str) -> int:
+    """Wait for rate-limit quota; the token estimate charged, or 0 if the call was shed."""
+    est = prompt_builder.prompt_tokens(req["messages"]) + req["max_tokens"]
+    if ratelimit.groq.acquire(caller, est):
+        return est
+    print(f"[Groq] Near the rate limit — skipped {caller} call")
+    return 0
+
+
+def _deadline(mode: str) -> dict:
+    # An essential call while its breaker is open: one short attempt, then the fallback
+    if mode == "tight":
+        return {"read_timeout": breaker.TIGHT_TIMEOUT, "retries": 0}
+    return {}
+
+
+def _settle_breaker(caller: str, mode: str, outcome: str, wall: float):
+    br = breaker.for_caller(caller)
+    if outcome == "shed":
+        if mode == "probe":
+            br.release()
+        return
+    br.record(outcome in ("ok", "irrelevant", "empty"), wall, probe=mode == "probe")
+
+
+def _complete(key: str, req: dict, caller: str) -> str:
+    mode = breaker.for_caller(caller).gate()
+    if mode == "skip":
+        llm_metrics.record(caller, "skipped", 0.0, model=GROQ_MODEL)
+        return ""
+    est = _admit(req, caller)
+    if not est:
+        llm_metrics.record(caller, "shed", 0.0, model=GROQ_MODEL)
+        _settle_breaker(caller, mode, "shed", 0.0)
+        return ""
+    t0 = time.perf_counter()
+    text, outcome, ttfb, usage = "", None, 0.0, None
+    try:
+        r = _post(key, req, **_deadline(mode))
+        ttfb = r.elapsed.total_seconds()
         data = r.json()
         if "error" in data:
             print(f"[Groq Error] {data['error']}")
-            return ""
-        return data["choices"][0]["message"]["content"].strip()
+            outcome = "api_error"
+        else:
+            usage = data.get("usage") or {}
+            ratelimit.groq.settle(est, usage.get("total_tokens", 0))
+            text = data["choices"][0]["message"]["content"].strip()
+            if llm_tape.recording():
+                llm_tape.record(req, text, time.perf_counter() - t0, ttfb, usage)
     except requests.exceptions.Timeout:
         print("[Groq] Request timed out")
-        return ""
+        outcome = "timeout"
     except Exception as e:
         print(f"[Groq] Exception: {e}")
-        return ""
+        outcome = "api_error"
+    outcome, wall = outcome or llm_metrics.outcome_for(text), time.perf_counter() - t0
+    llm_metrics.record(caller, outcome, wall, ttfb, usage, GROQ_MODEL)
+    _settle_breaker(caller, mode, outcome, wall)
+    return text
+
+
+def _stream(messages: list, max_tokens: int = 300, temperature: float = 0.7,
+            caller: str = "answer"):
+    """Yield completion tokens as Groq emits them (OpenAI-style SSE, stream=True).
+
+    Errors end the stream early; callers treat an empty stream like _call's "".
+    """
+    req = {"model": GROQ_MODEL, "messages": messages,
+           "max_tokens": max_tokens, "temperature": temperature}
+    t0 = time.perf_counter()
+    if not llm_tape.replaying() and not get_key():
+        return
+    mode = "normal" if llm_tape.replaying() else breaker.for_caller(caller).gate()
+    if mode == "skip":
+        llm_metrics.record(caller, "skipped", 0.0, model=GROQ_MODEL)
+        return
+    parts, outcome, ttfb, usage = [], None, 0.0, None
+    try:
+        if llm_tape.replaying():
+            for tok in llm_tape.replay_stream(req):
+                if not parts:
+                    ttfb = time.perf_counter() - t0
+                parts.append(tok)
+                yield tok
+            return
+        est = _admit(req, caller)
+        if not est:
+            outcome = "shed"
+            return
+        r = _post(get_key(), {**req, "stream": True}, stream=True, **_deadline(mode))
+        with r:
+            if r.status_code != 200:
+                print(f"[Groq Error] HTTP {r.status_code}: {r.text[:200]}")
+                outcome = "api_error"
+                return
+            for line in r.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                chunk = json.loads(payload)
+                usage = (chunk.get("x_groq") or {}).get("usage", usage)
+                delta = chunk["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    if not parts:
+                        ttfb = time.perf_counter() - t0
+                    parts.append(delta)
+                    yield delta
+        ratelimit.groq.settle(est, (usage or {}).get("total_tokens", 0))
+        if llm_tape.recording():
+            llm_tape.record(req, "".join(parts).strip(), time.perf_counter() - t0, ttfb, usage)
+    except requests.exceptions.Timeout:
+        print("[Groq] Stream timed out")
+        outcome = "timeout"
+    except Exception as e:
+        print(f"[Groq] Stream exception: {e}")
+        outcome = "api_error"
+    finally:
+        # Also runs if the consumer stops early; whatever arrived is what we got
+        outcome, wall = outcome or llm_metrics.outcome_for("".join(parts)), time.perf_counter() - t0
+        llm_metrics.record(caller, outcome, wall, ttfb, usage, GROQ_MODEL)
+        if not llm_tape.replaying():
+            _settle_breaker(caller, mode, outcome, wall)
 
 
 # ── 1. Main Q&A — handles BOTH WizKlub questions AND irrelevant messages ──────
@@ -62,69 +291,161 @@ def _call(messages: list, max_tokens: int = 300, temperature: float = 0.7) -> st
 # DEMO RULE: Only mention a demo if the person explicitly asked about
 # next steps or signing up. Never volunteer it unprompted.
 
-def answer_question(user_msg: str, lead: dict, history: list) -> str:
+def _qa_messages(user_msg: str, lead: dict, history: list, knowledge: str = None) -> list:
+    # Static cacheable prefix + retrieved knowledge + budgeted history (see prompt_builder)
+    return prompt_builder.qa_messages(user_msg, lead, history, knowledge=knowledge)
+
+
+def _deflection(lead: dict) -> str:
     name = lead.get("name", "")
     name_str = f", {name}" if name else ""
+    return (
+        f"Ha, that's a bit outside my expertise{name_str}! 😄 "
+        "I'm here to help with anything about WizKlub — "
+        "programs, how classes work, pricing, schedules, school partnerships. "
+        "What would you like to know?"
+    )
 
-    system = f"""You are Wiz, a friendly assistant for WizKlub — a children's EdTech company in India.
-
-First, decide if this message is RELEVANT or IRRELEVANT to WizKlub or education.
 
-RELEVANT = anything about WizKlub, children's learning, programs, pricing, schedules,
-how classes work, school partnerships, subjects taught, STEM, coding, critical thinking, etc.
+def _fallback(lead: dict) -> str:
+    name = lead.get("name", "")
+    name_str = f", {name}" if name else ""
+    return (
+        f"Sorry{name_str}, I'm slow to answer right now! 🙏 "
+        "Try asking again in a minute, or reach the team directly at hello@wizklub.com."
+    )
 
-IRRELEVANT = anything completely unrelated. Examples: "I'm hungry", "tell me a joke",
-"what's the weather", "who won the match", random greetings with no question, gibberish.
 
-If IRRELEVANT — respond with exactly this word and nothing else: IRRELEVANT
+def _no_answer(lead: dict, caller: str) -> str:
+    # An empty reply while Groq is degraded is an outage, not an off-topic question
+    if breaker.for_caller(caller).state != breaker.CLOSED:
+        return _fallback(lead)
+    return _deflection(lead)
 
-If RELEVANT — answer using ONLY the verified information below. Never invent facts.
-If the question isn't covered below, say "our team can clarify that for you."
 
-=== VERIFIED WIZKLUB INFORMATION ===
-{WIZKLUB_KNOWLEDGE}
-=== END ===
+def _cached_reply(key, lead: dict):
+    text = answer_cache.answers.get(key)
+    if text is None:
+        return None
+    if text == answer_cache.IRRELEVANT:
+        return _deflection(lead)
+    return answer_cache.personalise(text, lead.get("name", ""))
 
-What you know about this visitor so far:
-- Type: {lead.get('type') or 'not yet identified'}
-- Child age: {lead.get('child_age') or 'not yet asked'}
-- Goals: {lead.get('goals') or 'not yet asked'}
-- School size: {lead.get('school_size') or 'not yet asked'}
-- Name: {name or 'not yet given'}
 
-STRICT RULES when answering:
-1. Answer the question directly — 2 to 3 sentences max
-2. Be warm and personalise using what you know about this visitor
-3. ONLY mention booking a demo or next steps if the person explicitly asked about it
-4. Do NOT add "book a demo" or "shall I set one up?" at the end of every reply
-5. If they didn't ask about next steps, just answer the question and stop"""
+def _remember(key, lead: dict, result: str):
+    # Only real verdicts are cached — an empty result is an API failure,
+    # and a reply where the visitor's name is ambiguous can't be shared
+    if result.strip().upper() == "IRRELEVANT":
+        answer_cache.answers.put(key, answer_cache.IRRELEVANT)
+    elif result:
+        text = answer_cache.depersonalise(result, lead.get("name", ""))
+        if text is not None:
+            answer_cache.answers.put(key, text)
 
-    msgs = [{"role": "system", "content": system}]
-    for h in history[-6:]:
-        msgs.append({
-            "role": "assistant" if h["role"] == "bot" else "user",
-            "content": h["text"],
-        })
-    msgs.append({"role": "user", "content": user_msg})
 
-    result = _call(msgs, max_tokens=250, temperature=0.7)
+def _follow(flight, lead: dict):
+    """Reply shared from the session already asking this question.
 
-    # Empty result OR model returned IRRELEVANT → show polite deflection
+    None if that session gave up mid-stream — the caller then asks for itself.
+    """
+    try:
+        result = singleflight.answers.wait(flight, COALESCE_WAIT)
+    except TimeoutError as e:
+        print(f"[Groq] {e}")
+        result = ""
+    if result is None:
+        return None
     if not result or result.strip().upper() == "IRRELEVANT":
-        return (
-            f"Ha, that's a bit outside my expertise{name_str}! 😄 "
-            "I'm here to help with anything about WizKlub — "
-            "programs, how classes work, pricing, schedules, school partnerships. "
-            "What would you like to know?"
-        )
+        return _deflection(lead)
+    return answer_cache.personalise(result, lead.get("name", ""))
+
+
+def _land(key, flight, lead: dict, result):
+    # None means the leader gave up (or its reply can't be depersonalised),
+    # and tells waiters to ask for themselves
+    if result is not None:
+        result = answer_cache.depersonalise(result, lead.get("name", ""))
+    singleflight.answers.land(key, flight, result)
+
+
+def answer_question_stream(user_msg: str, lead: dict, history: list, caller: str = "answer"):
+    """Answer a free-text question, yielding the reply in chunks.
+
+    A cache hit, or a message relevance.py already knows is off-topic, is
+    yielded whole, as is a reply shared from another session asking the same
+    question right now. Otherwise the opening tokens are held back only while
+    they could still spell IRRELEVANT; as soon as they can't, the buffer is
+    flushed and the rest streams straight through. An IRRELEVANT or empty
+    reply yields the deflection (or, while Groq is degraded, a fallback) as a
+    single chunk.
+    """
+    key = answer_cache.cache_key(user_msg, lead)
+    cached = _cached_reply(key, lead) if key else None
+    if cached is not None:
+        yield cached
+        return
+    if relevance.is_off_topic(user_msg):
+        yield _deflection(lead)
+        return
+
+    flight, leader = singleflight.answers.begin(key) if key else (None, False)
+    if key and not leader:
+        shared = _follow(flight, lead)
+        if shared is not None:
+            yield shared
+            return
+    buf, held, full, result = "", True, [], None
+    try:
+        for tok in _stream(_qa_messages(user_msg, lead, history), max_tokens=250, temperature=0.7,
+                           caller=caller):
+            full.append(tok)
+            if not held:
+                yield tok
+                continue
+            buf += tok
+            head = buf.lstrip().upper()
+            if len(head) > len("IRRELEVANT") or not "IRRELEVANT".startswith(head):
+                held = False
+                yield buf.lstrip()
+        result = "".join(full).strip()
+        if key:
+            _remember(key, lead, result)
+    finally:
+        if leader:       # result is still None if the page stopped reading mid-stream
+            _land(key, flight, lead, result)
+
+    if held:
+        verdict = buf.strip().upper()
+        if not verdict:
+            yield _no_answer(lead, caller)
+        elif verdict == "IRRELEVANT":
+            yield _deflection(lead)
+        else:
+            yield buf.strip()
+
+
+def answer_question(user_msg: str, lead: dict, history: list, caller: str = "answer") -> str:
+    """The whole reply at once — answer_question_stream, joined."""
+    return "".join(answer_question_stream(user_msg, lead, history, caller)).strip()
+
 
-    return result
+def cache_stats() -> dict:
+    return answer_cache.answers.stats()
+
+
+def call_stats() -> dict:
+    return {**llm_metrics.summary(),
+            "breakers": breaker.stats(),
+            "coalescing": {"completions": singleflight.calls.stats(),
+                           "answers": singleflight.answers.stats()}}
 
 
 # ── 2. Qualification insight — one personalised sentence after goals/budget ───
 # No demo mention here — this is just a warm acknowledgement of their situation.
+# Button-only profiles are served from the pregenerated table (insight_table);
+# the live call is for anything outside it, e.g. free-typed values.
 
-def qualification_insight(lead: dict) -> str:
+def _insight_messages(lead: dict) -> list:
     if lead.get("type") == "Parent":
         prompt = (
             f"A parent has a child aged {lead.get('child_age')} wanting: {lead.get('goals')}. "
@@ -140,22 +461,28 @@ def qualification_insight(lead: dict) -> str:
             f"Write ONE warm specific sentence (under 25 words) about what WizKlub can offer them. "
             f"Start with an emoji. No quotes. Do NOT mention demos or booking."
         )
-    msgs = [
+    return [
         {"role": "system", "content": "You are a helpful assistant for WizKlub EdTech. Be specific, warm, and brief."},
         {"role": "user", "content": prompt},
     ]
-    return _call(msgs, max_tokens=70, temperature=0.8)
+
+
+def qualification_insight(lead: dict) -> str:
+    text = insight_table.lookup("insight", lead)
+    if text is not None:
+        return text
+    return _call(_insight_messages(lead), max_tokens=70, temperature=0.8, caller="insight")
 
 
 # ── 3. Closing message after CTA — warm, personal, no demo mention ────────────
 
-def ai_closing(lead: dict) -> str:
+def _closing_messages(lead: dict) -> list:
     who = (
         f"parent of a {lead.get('child_age')} child interested in {lead.get('goals')}"
         if lead.get("type") == "Parent"
         else f"school representative for a {lead.get('school_size')} student school"
     )
-    msgs = [
+    return [
         {"role": "system", "content": "Write short warm personalised messages for WizKlub EdTech. Never mention demos."},
         {"role": "user", "content": (
             f"Write one warm enthusiastic sentence for {lead.get('name', 'them')}, "
@@ -163,4 +490,82 @@ def ai_closing(lead: dict) -> str:
             f"Under 20 words. Start with an emoji. No quotes. No mention of demos."
         )},
     ]
-    return _call(msgs, max_tokens=60, temperature=0.9)
+
+
+def ai_closing(lead: dict, draft: str = None) -> str:
+    """Closing line: pregenerated table, then a draft from profile_texts, then a live call."""
+    text = insight_table.lookup("closing", lead)
+    if text is not None:
+        return text
+    if draft:
+        return answer_cache.personalise(draft, lead.get("name", ""))
+    return _call(_closing_messages(lead), max_tokens=60, temperature=0.9, caller="closing")
+
+
+# ── 4. Insight + closing in one call ──────────────────────────────────────────
+# Both are conditioned on the same profile, so once goals/budget are known one
+# JSON completion writes the insight now and drafts the closing for the CTA
+# step, before we know the visitor's name — the model writes {name} and
+# personalise() fills it in later. Each field is validated on its own: a bad
+# insight falls back to its own call, a bad closing to ai_closing's.
+
+COMBINED = os.environ.get("WIZ_COMBINED_GEN", "1") == "1"
+FIELD_CAP = {"insight": 240, "closing": 200}       # chars; both are meant to be one sentence
+_JSON_OBJ = re.compile(r"\{.*\}", re.S)
+
+
+def _profile_messages(lead: dict) -> list:
+    insight = _insight_messages(lead)[1]["content"]
+    who = _closing_messages({**lead, "name": "{name}"})[1]["content"]
+    return [
+        {"role": "system", "content": (
+            "You write short warm personalised messages for WizKlub EdTech. Never mention demos or booking. "
+            'Reply with a JSON object only: {"insight": "...", "closing": "..."}'
+        )},
+        {"role": "user", "content": (
+            f"insight: {insight}\n\n"
+            f"closing: {who} Write the placeholder {{name}} exactly where their name goes."
+        )},
+    ]
+
+
+def _valid_field(data: dict, field: str):
+    text = data.get(field)
+    if not isinstance(text, str):
+        return None
+    text = " ".join(text.split()).strip(' "\'')
+    if not text or len(text) > FIELD_CAP[field] or "demo" in text.lower():
+        return None
+    return text
+
+
+def parse_profile_texts(raw: str) -> dict:
+    """{"insight": str|None, "closing": str|None} from a model reply, per field."""
+    m = _JSON_OBJ.search(raw or "")           # tolerate code fences / chatter around the object
+    try:
+        data = json.loads(m.group(0)) if m else {}
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    out = {f: _valid_field(data, f) for f in FIELD_CAP}
+    if out["closing"]:
+        out["closing"] = out["closing"].replace("{name}", answer_cache.NAME_SLOT)
+    return out
+
+
+def profile_texts(lead: dict) -> dict:
+    """Insight (ready to show) and a depersonalised closing draft (or None).
+
+    Runs on a prefetch worker. With COMBINED off this is just the insight call.
+    """
+    if not COMBINED:
+        return {"insight": qualification_insight(lead), "closing": None}
+    text = insight_table.lookup("insight", lead)
+    if text is not None:
+        return {"insight": text, "closing": None}
+    out = parse_profile_texts(_call(_profile_messages(lead), max_tokens=160, temperature=0.85,
+                                    caller="insight", json_mode=True))
+    if out["insight"] is None:
+        out["insight"] = _call(_insight_messages(lead), max_tokens=70, temperature=0.8, caller="insight")
+    return out
@@ -0,0 +1,127 @@
+# insight_table.py — Pregenerated qualification insights and closings
+#
+# qualification_insight and ai_closing are driven by quick-reply values, so
+# their whole input space is small (parents: age × goal, schools: size ×
+# budget). This module serves them from a table generated offline, with a
+# few variants per combination rotated across visitors. Values outside the
+# table (free-typed text, a stale table) fall through to the live LLM.
+#
+# Regenerate after changing the prompts in groq_client (and bump VERSION):
+#   GROQ_API_KEY=gsk_… python insight_table.py --variants 4
+
+import itertools
+import json
+import os
+import threading
+import answer_cache
+
+VERSION    = 1    # bump whenever the insight/closing prompts change
+TABLE_PATH = os.environ.get(
+    "WIZ_INSIGHT_TABLE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "insight_table.json"))
+SAMPLE_NAME = "Asha"   # name used while generating closings; stored as a slot
+
+_table = None
+_table_lock = threading.Lock()
+_turns = {}            # (kind, key) -> itertools.count, for rotation
+
+
+def key_for(kind: str, lead: dict) -> str:
+    """Table key for the lead fields each prompt actually reads."""
+    if lead.get("type") == "Parent":
+        return "|".join(["Parent", lead.get("child_age", ""), lead.get("goals", "")])
+    if kind == "insight":
+        return "|".join(["School", lead.get("school_size", ""), lead.get("budget", "")])
+    return "|".join(["School", lead.get("school_size", "")])
+
+
+def load(path: str = TABLE_PATH) -> dict:
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    data = {}
+                # A table built from older prompts is ignored, not half-trusted
+                if data.get("version") != VERSION:
+                    data = {"version": VERSION, "insight": {}, "closing": {}}
+                _table = data
+    return _table
+
+
+def covers(kind: str, lead: dict) -> bool:
+    return bool(load().get(kind, {}).get(key_for(kind, lead)))
+
+
+def lookup(kind: str, lead: dict):
+    """A pregenerated variant for this lead, or None when it isn't in the table."""
+    k = key_for(kind, lead)
+    variants = load().get(kind, {}).get(k)
+    if not variants:
+        return None
+    turn = _turns.setdefault((kind, k), itertools.count())
+    text = variants[next(turn) % len(variants)]
+    return answer_cache.personalise(text, lead.get("name", ""))
+
+
+# ── Offline generation ────────────────────────────────────────────────────────
+
+def _profiles(kind: str):
+    from flow import AGE_OPTS, GOAL_OPTS, SIZE_OPTS, BUDGET_OPTS
+    for age in AGE_OPTS:
+        for goals in GOAL_OPTS:
+            yield {"type": "Parent", "child_age": age, "goals": goals}
+    for size in SIZE_OPTS:
+        if kind == "closing":
+            yield {"type": "School", "school_size": size}
+            continue
+        for budget in BUDGET_OPTS:
+            yield {"type": "School", "school_size": size, "budget": budget}
+
+
+def generate(variants: int = 4, path: str = TABLE_PATH) -> dict:
+    import groq_client
+    builders = {
+        "insight": (groq_client._insight_messages, 70, 0.8),
+        "closing": (groq_client._closing_messages, 60, 0.9),
+    }
+    table = {"version": VERSION, "model": groq_client.GROQ_MODEL, "insight": {}, "closing": {}}
+    for kind, (build, max_tokens, temperature) in builders.items():
+        for lead in _profiles(kind):
+            lead["name"] = SAMPLE_NAME
+            out = []
+            for _ in range(variants * 2):     # a few spare tries for empties/duplicates
+                # Not the live caller: its shedding policy would drop most of these
+                text = groq_client._call(build(lead), max_tokens=max_tokens, temperature=temperature,
+                                         caller="offline")
+                text = answer_cache.depersonalise(text, SAMPLE_NAME)
+                if text and text not in out:
+                    out.append(text)
+                if len(out) == variants:
+                    break
+            if out:
+                table[kind][key_for(kind, lead)] = out
+            print(f"{kind:8} {key_for(kind, lead):55} {len(out)} variants")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+    return table
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Pregenerate insight/closing variants")
+    ap.add_argument("--variants", type=int, default=4)
+    ap.add_argument("--out", default=TABLE_PATH)
+    args = ap.parse_args()
+    if not os.environ.get("GROQ_API_KEY"):
+        raise SystemExit("GROQ_API_KEY must be set to generate the table")
+    table = generate(args.variants, args.out)
+    missing = [f"{kind} {key_for(kind, lead)}" for kind in ("insight", "closing")
+               for lead in _profiles(kind) if key_for(kind, lead) not in table[kind]]
+    if missing:
+        raise SystemExit(f"[Insights] no variants for {len(missing)} profiles "
+                         f"(they fall back to live calls): {', '.join(missing)}")
@@ -0,0 +1,137 @@
+# kb_index.py — Lexical retrieval over WIZKLUB_KNOWLEDGE
+# The knowledge base is split once at import into sections, one chunk per
+# program, and one chunk per FAQ pair, then indexed with BM25. answer_question
+# injects only the chunks that match the question, within a token budget,
+# instead of pasting the whole ~1,200-token knowledge base into every prompt.
+# Pure Python — no network, no GPU, no extra dependencies.
+
+import math
+import re
+from collections import Counter
+from wizklub_context import WIZKLUB_KNOWLEDGE
+
+TOP_K        = 4
+TOKEN_BUDGET = 450     # estimated tokens of knowledge per prompt
+BM25_K1      = 1.4
+BM25_B       = 0.75
+CONTEXT_WEIGHT = 0.5   # earlier visitor turns count half as much as the question
+
+_STOP = {
+    "a", "an", "the", "is", "are", "am", "do", "does", "did", "i", "my", "me",
+    "you", "your", "we", "our", "it", "its", "of", "to", "in", "on", "for",
+    "and", "or", "what", "how", "can", "could", "will", "would", "there",
+    "this", "that", "with", "be", "any", "about", "if", "they", "their", "wizklub",
+}
+
+# Visitors say "fee", the knowledge base says "pricing"
+_SYNONYMS = {
+    "fee": ["pricing", "price"], "cost": ["pricing", "price"], "price": ["pricing"],
+    "charge": ["pricing"], "expensive": ["pricing"], "batch": ["class", "kid"],
+    "student": ["kid", "child"], "kid": ["child"], "child": ["kid"],
+    "timing": ["schedule"], "time": ["schedule"], "online": ["live", "pan-india"],
+    "age": ["aged", "year"], "old": ["age", "year"], "trial": ["demo"],
+    "certificate": ["certification"], "robot": ["robotics"], "python": ["coding"],
+}
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English with Llama's tokenizer
+    return max(1, (len(text) + 3) // 4)
+
+
+def _stem(w: str) -> str:
+    for suf in ("ing", "es", "s"):
+        if len(w) > len(suf) + 3 and w.endswith(suf):
+            return w[: -len(suf)]
+    return w
+
+
+def tokenize(text: str) -> list:
+    words = re.findall(r"[a-z0-9₹][a-z0-9₹\-]*", text.lower())
+    return [_stem(w) for w in words if w not in _STOP]
+
+
+def _split(kb: str) -> list:
+    """Sections → chunks. Programs and FAQ pairs each become their own chunk."""
+    chunks, title, buf = [], "", []
+
+    def flush():
+        body = "\n".join(buf).strip()
+        if body:
+            chunks.append(f"{title}\n{body}" if title else body)
+
+    for line in kb.strip().splitlines():
+        if re.match(r"^[A-Z][A-Z '\-]+:$", line):            # "PRICING:"
+            flush()
+            title, buf = line, []
+        elif re.match(r"^\d+\. ", line) or line.startswith("Q: "):
+            flush()                                           # program / FAQ pair
+            buf = [line]
+        else:
+            buf.append(line)
+    flush()
+    return chunks
+
+
+class BM25Index:
+    def __init__(self, chunks: list):
+        self.chunks = chunks
+        self.tokens = [estimate_tokens(c) for c in chunks]
+        self.tf = [Counter(tokenize(c)) for c in chunks]
+        self.len = [sum(tf.values()) for tf in self.tf]
+        self.avg = sum(self.len) / len(self.len)
+        df = Counter(t for tf in self.tf for t in tf)
+        n = len(chunks)
+        self.idf = {t: math.log(1 + (n - d + 0.5) / (d + 0.5)) for t, d in df.items()}
+
+    def _query_terms(self, query: str) -> list:
+        terms = tokenize(query)
+        for t in list(terms):
+            terms += [_stem(s) for s in _SYNONYMS.get(t, [])]
+        return terms
+
+    def scores(self, query: str) -> list:
+        terms = self._query_terms(query)
+        out = []
+        for tf, dl in zip(self.tf, self.len):
+            s = 0.0
+            for t in terms:
+                f = tf.get(t)
+                if f:
+                    s += self.idf[t] * f * (BM25_K1 + 1) / (f + BM25_K1 * (1 - BM25_B + BM25_B * dl / self.avg))
+            out.append(s)
+        return out
+
+    def search(self, query: str, k: int = TOP_K, budget: int = TOKEN_BUDGET, context: str = "") -> list:
+        """Indices of the best-matching chunks, best first, within `budget` tokens."""
+        sc = self.scores(query)
+        if context:
+            sc = [a + CONTEXT_WEIGHT * b for a, b in zip(sc, self.scores(context))]
+        picked, used = [], 0
+        for i in sorted(range(len(sc)), key=lambda i: -sc[i]):
+            if sc[i] <= 0 or len(picked) >= k:
+                break
+            if used + self.tokens[i] > budget:
+                continue
+            picked.append(i)
+            used += self.tokens[i]
+        return picked
+
+
+CHUNKS = _split(WIZKLUB_KNOWLEDGE)
+INDEX  = BM25Index(CHUNKS)
+
+
+def retrieve(query: str, k: int = TOP_K, budget: int = TOKEN_BUDGET, context: str = "") -> str:
+    """Knowledge text to inject for `query`.
+
+    `context` is the visitor's previous turn or two, so a follow-up like
+    "and for schools?" still finds the pricing chunks. Chunks keep their
+    knowledge-base order so related facts read naturally. With no lexical
+    match at all (greetings, a question in Hindi, an odd phrasing) the whole
+    knowledge base is sent: the model reads those fine, the index doesn't.
+    """
+    picked = INDEX.search(query, k, budget, context)
+    if not picked:
+        return WIZKLUB_KNOWLEDGE
+    return "\n\n".join(CHUNKS[i] for i in sorted(picked))
@@ -0,0 +1,322 @@
+# lead_export.py — Background export of finished leads to outside systems
+# handle_cta hands each lead to submit(), which only puts it on a bounded
+# in-process queue. One worker thread drains the queue in batches (up to
+# BATCH_SIZE leads or BATCH_WINDOW seconds, whichever comes first), writes
+# every batch to an on-disk spool first, then delivers it to each sink. A
+# spooled lead is removed only after its sink accepted it; failed sends are
+# retried with jittered exponential backoff, and anything left in the spool
+# by a previous run is sent once the exporter starts again. Delivery is
+# at-least-once, so every record carries an export_id sinks can de-duplicate on.
+#
+# Sinks are pluggable — anything with a `name` and `send(leads)` that raises
+# on failure. Built in: rotating JSONL / CSV files and an HTTP webhook.
+#
+#   WIZ_EXPORT_SINKS=jsonl,csv  WIZ_EXPORT_WEBHOOK=https://crm.example/hook  streamlit run app.py
+
+import atexit
+import csv
+import json
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SINKS        = os.environ.get("WIZ_EXPORT_SINKS", "jsonl")        # comma list; "" turns export off
+EXPORT_DIR   = os.environ.get("WIZ_EXPORT_DIR", os.path.join(HERE, "exports"))
+WEBHOOK_URL  = os.environ.get("WIZ_EXPORT_WEBHOOK", "")           # adds the webhook sink when set
+SPOOL_PATH   = os.environ.get("WIZ_EXPORT_SPOOL", os.path.join(EXPORT_DIR, "spool.db"))
+QUEUE_SIZE   = int(os.environ.get("WIZ_EXPORT_QUEUE", "1000"))
+BATCH_SIZE   = int(os.environ.get("WIZ_EXPORT_BATCH", "50"))
+BATCH_WINDOW = float(os.environ.get("WIZ_EXPORT_WINDOW", "2.0"))   # seconds
+ROTATE_BYTES = int(float(os.environ.get("WIZ_EXPORT_ROTATE_MB", "10")) * 1024 * 1024)
+RETRY_BASE   = 1.0          # seconds; doubled per failed attempt, full jitter
+RETRY_MAX    = 300.0
+MAX_SENDS    = 20           # batches per sink per worker pass
+FLUSH_ON_EXIT = 5.0         # seconds
+
+COLUMNS = ["export_id", "lead_id", "created_at", "name", "email", "phone", "type",
+           "child_age", "goals", "school_size", "budget", "wants_demo", "score"]
+
+
+# ── Sinks ─────────────────────────────────────────────────────────────────────
+class _RotatingFile:
+    """Appends to <dir>/<stem>.<ext>; past ROTATE_BYTES it is renamed with a timestamp."""
+    ext = ""
+
+    def __init__(self, directory: str = EXPORT_DIR, stem: str = "leads", rotate_bytes: int = ROTATE_BYTES):
+        self.path = os.path.join(directory, f"{stem}.{self.ext}")
+        self.rotate_bytes = rotate_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _rotate(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.rotate_bytes:
+            stem, ext = os.path.splitext(self.path)
+            os.replace(self.path, f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}{ext}")
+
+    def send(self, leads: list):
+        self._rotate()
+        fresh = not os.path.exists(self.path)
+        with open(self.path, "a", encoding="utf-8", newline="") as f:
+            self._write(f, leads, fresh)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class JsonlSink(_RotatingFile):
+    name, ext = "jsonl", "jsonl"
+
+    def _write(self, f, leads: list, fresh: bool):
+        f.write("".join(json.dumps(l, ensure_ascii=False) + "\n" for l in leads))
+
+
+class CsvSink(_RotatingFile):
+    name, ext = "csv", "csv"
+
+    def _write(self, f, leads: list, fresh: bool):
+        w = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        if fresh:
+            w.writeheader()
+        w.writerows(leads)
+
+
+class WebhookSink:
+    name = "webhook"
+
+    def __init__(self, url: str = WEBHOOK_URL, timeout: float = 10.0):
+        self.url, self.timeout = url, timeout
+
+    def send(self, leads: list):
+        r = requests.post(self.url, json={"leads": leads}, timeout=self.timeout)
+        r.raise_for_status()
+
+
+SINK_TYPES = {"jsonl": JsonlSink, "csv": CsvSink, "webhook": WebhookSink}
+
+
+def build_sinks(spec: str = SINKS, webhook: str = WEBHOOK_URL) -> list:
+    names = [n.strip() for n in spec.split(",") if n.strip()]
+    if webhook and "webhook" not in names:
+        names.append("webhook")
+    return [SINK_TYPES[n]() for n in names]
+
+
+# ── Spool — one row per (lead, sink) until that sink has it ─────────────────
+_SPOOL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    id        INTEGER PRIMARY KEY,
+    sink      TEXT    NOT NULL,
+    record    TEXT    NOT NULL,
+    attempts  INTEGER NOT NULL DEFAULT 0,
+    next_at   REAL    NOT NULL,
+    queued_at REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_spool_due ON spool (sink, next_at);
+"""
+
+_local = threading.local()
+
+
+def _spool(path: str) -> sqlite3.Connection:
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    c = conns.get(path)
+    if c is None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        c = sqlite3.connect(path, timeout=30)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.executescript(_SPOOL_SCHEMA)
+        conns[path] = c
+    return c
+
+
+def _record(lead: dict) -> dict:
+    rec = {k: lead.get(k, "") for k in COLUMNS}
+    rec["export_id"] = lead.get("export_id") or uuid.uuid4().hex
+    rec["lead_id"] = lead.get("lead_id") or lead.get("id") or ""
+    rec["created_at"] = lead.get("created_at") or time.time()
+    rec["wants_demo"] = bool(lead.get("wants_demo"))
+    return rec
+
+
+class Exporter:
+    def __init__(self, sinks: list, spool_path: str = SPOOL_PATH, queue_size: int = QUEUE_SIZE,
+                 batch_size: int = BATCH_SIZE, window: float = BATCH_WINDOW):
+        self.sinks = {s.name: s for s in sinks}
+        self.spool_path = spool_path
+        self.batch_size, self.window = batch_size, window
+        self._q = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {"submitted": 0, "overflow": 0, "batches": 0, "queue_high": 0,
+                       "delivered": {n: 0 for n in self.sinks}, "failed": {n: 0 for n in self.sinks},
+                       "last_error": ""}
+
+    # Session threads ──────────────────────────────────────────────────────────
+    def submit(self, lead: dict):
+        """Hand a finished lead over. Never waits on disk or network unless the queue is full."""
+        rec = _record(lead)
+        self._start()
+        try:
+            self._q.put_nowait(rec)
+        except queue.Full:
+            # Backpressure: spool it straight away rather than drop it or block on the worker
+            self._spool_batch([rec])
+            with self._lock:
+                self._stats["overflow"] += 1
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["queue_high"] = max(self._stats["queue_high"], self._q.qsize())
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="wiz-export", daemon=True)
+                    self._thread.start()
+
+    # Worker ───────────────────────────────────────────────────────────────────
+    def _run(self):
+        while True:
+            try:
+                batch = self._next_batch()
+                if batch:
+                    self._spool_batch(batch)
+                    for _ in batch:
+                        self._q.task_done()
+                    with self._lock:
+                        self._stats["batches"] += 1
+                # Drain what is due, but get back to the queue before it fills up
+                for name in self.sinks:
+                    for _ in range(MAX_SENDS):
+                        if not self._deliver(name) or self._q.qsize() > self._q.maxsize // 2:
+                            break
+            except Exception as e:      # e.g. spool disk full — keep the worker alive
+                print(f"[Export] worker error: {e}")
+                time.sleep(1.0)
+
+    def _next_batch(self) -> list:
+        # Block for the first lead only as long as the next retry is due
+        try:
+            first = self._q.get(timeout=self._idle_wait())
+        except queue.Empty:
+            return []
+        batch, deadline = [first], time.monotonic() + self.window
+        while len(batch) < self.batch_size:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            try:
+                batch.append(self._q.get(timeout=left))
+            except queue.Empty:
+                break
+        # A backlog goes to the spool in one transaction, not one batch per loop
+        while True:
+            try:
+                batch.append(self._q.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _idle_wait(self) -> float:
+        row = _spool(self.spool_path).execute("SELECT MIN(next_at) FROM spool").fetchone()
+        if row[0] is None:
+            return 5.0
+        return min(5.0, max(0.05, row[0] - time.time()))
+
+    def _spool_batch(self, batch: list):
+        now = time.time()
+        c = _spool(self.spool_path)
+        with c:
+            c.executemany("INSERT INTO spool (sink, record, next_at, queued_at) VALUES (?, ?, ?, ?)",
+                          [(name, json.dumps(rec, ensure_ascii=False), now, now)
+                           for rec in batch for name in self.sinks])
+
+    def _deliver(self, name: str) -> bool:
+        """Send one due batch to a sink; True if it was accepted."""
+        c = _spool(self.spool_path)
+        rows = c.execute("SELECT id, record, attempts FROM spool WHERE sink = ? AND next_at <= ? "
+                         "ORDER BY id LIMIT ?", (name, time.time(), self.batch_size)).fetchall()
+        if not rows:
+            return False
+        ids = [r[0] for r in rows]
+        marks = ",".join("?" * len(ids))
+        try:
+            self.sinks[name].send([json.loads(r[1]) for r in rows])
+        except Exception as e:
+            attempts = max(r[2] for r in rows) + 1
+            # Capped exponent: a float overflows past 2 ** 1023, and RETRY_MAX caps the wait anyway
+            wait = random.uniform(0, min(RETRY_MAX, RETRY_BASE * 2 ** min(attempts, 16)))
+            with c:
+                c.execute(f"UPDATE spool SET attempts = attempts + 1, next_at = ? WHERE id IN ({marks})",
+                          [time.time() + wait] + ids)
+            with self._lock:
+                self._stats["failed"][name] += len(ids)
+                self._stats["last_error"] = f"{name}: {e}"
+            print(f"[Export] {name} failed ({len(ids)} leads), retry in {wait:.1f}s: {e}")
+            return False
+        with c:
+            c.execute(f"DELETE FROM spool WHERE id IN ({marks})", ids)
+        with self._lock:
+            self._stats["delivered"][name] += len(ids)
+        return True
+
+    # Monitoring ───────────────────────────────────────────────────────────────
+    def pending(self) -> int:
+        """Leads not yet accepted by every sink (queued, being batched, or spooled)."""
+        spooled = _spool(self.spool_path).execute("SELECT COUNT(DISTINCT record) FROM spool").fetchone()[0]
+        return self._q.unfinished_tasks + spooled
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Wait until everything submitted so far is delivered; False on timeout."""
+        self._start()
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            if not self.pending():
+                return True
+            time.sleep(0.05)
+        return False
+
+    def stats(self) -> dict:
+        c = _spool(self.spool_path)
+        depth = dict(c.execute("SELECT sink, COUNT(*) FROM spool GROUP BY sink").fetchall())
+        oldest = c.execute("SELECT MIN(queued_at) FROM spool").fetchone()[0]
+        with self._lock:
+            s = json.loads(json.dumps(self._stats))
+        s.update({
+            "queued": self._q.qsize(),
+            "queue_size": self._q.maxsize,
+            "spooled": {n: depth.get(n, 0) for n in self.sinks},
+            "oldest_spooled_s": round(time.time() - oldest, 1) if oldest else 0.0,
+        })
+        return s
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def exporter():
+    """The process-wide exporter, or None when no sink is configured."""
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                sinks = build_sinks()
+                _exporter = Exporter(sinks) if sinks else False
+                if _exporter:
+                    _exporter._start()      # picks up whatever a previous run left spooled
+                    # On shutdown, give the queue a moment to reach the spool (and the sinks)
+                    atexit.register(_exporter.flush, FLUSH_ON_EXIT)
+    return _exporter or None
+
+
+def submit(lead: dict):
+    ex = exporter()
+    if ex is not None:
+        ex.submit(lead)
@@ -0,0 +1,511 @@
+# lead_store.py — Persistent lead repository (SQLite, WAL mode)
+# Every Streamlit session writes here and the CRM dashboard reads from here,
+# so leads survive restarts and the dashboard sees all visitors, not just the
+# browser session that opened it. WAL lets readers run alongside writers; each
+# thread gets its own connection and waits (busy_timeout) rather than failing
+# when another session holds the write lock.
+#
+# A repeat visitor doesn't become a second lead: lead_keys maps each
+# normalized email and phone to its lead (a primary-key lookup at insert
+# time) and add() merges into that lead instead. `python lead_store.py
+# --dedupe` does the same for leads stored before this existed.
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DB_PATH = os.environ.get(
+    "WIZ_LEADS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "leads.db"))
+
+FIELDS = ["name", "email", "phone", "type", "child_age", "goals",
+          "school_size", "budget", "wants_demo", "score"]
+CONTACT = ["name", "email", "phone"]
+INTENT  = ["type", "child_age", "goals", "school_size", "budget", "wants_demo"]
+
+DEFAULT_CC   = os.environ.get("WIZ_DEFAULT_CC", "91")   # country code for numbers typed without one
+LOCAL_DIGITS = 10                                       # national number length for DEFAULT_CC
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    id          INTEGER PRIMARY KEY,
+    created_at  REAL    NOT NULL,
+    name        TEXT    NOT NULL DEFAULT '',
+    email       TEXT    NOT NULL DEFAULT '',
+    phone       TEXT    NOT NULL DEFAULT '',
+    type        TEXT    NOT NULL DEFAULT '',
+    child_age   TEXT    NOT NULL DEFAULT '',
+    goals       TEXT    NOT NULL DEFAULT '',
+    school_size TEXT    NOT NULL DEFAULT '',
+    budget      TEXT    NOT NULL DEFAULT '',
+    wants_demo  INTEGER NOT NULL DEFAULT 0,
+    score       INTEGER NOT NULL DEFAULT 0,
+    version     INTEGER NOT NULL DEFAULT 1,     -- bumped on every change; keys render caches
+    email_key   TEXT    NOT NULL DEFAULT '',    -- email_key(email)
+    phone_key   TEXT    NOT NULL DEFAULT '',    -- phone_key(phone)
+    updated_at  REAL                            -- last merge; NULL if never merged
+);
+CREATE INDEX IF NOT EXISTS ix_leads_score      ON leads(score);
+CREATE INDEX IF NOT EXISTS ix_leads_type       ON leads(type);
+CREATE INDEX IF NOT EXISTS ix_leads_created_at ON leads(created_at);
+CREATE INDEX IF NOT EXISTS ix_leads_email      ON leads(email);
+CREATE TABLE IF NOT EXISTS lead_stats (
+    kind      TEXT    NOT NULL,          -- 'all' | 'hour' | 'day'
+    bucket    INTEGER NOT NULL,          -- bucket start, unix seconds UTC (0 for 'all')
+    total     INTEGER NOT NULL DEFAULT 0,
+    hot       INTEGER NOT NULL DEFAULT 0,
+    warm      INTEGER NOT NULL DEFAULT 0,
+    cool      INTEGER NOT NULL DEFAULT 0,
+    demos     INTEGER NOT NULL DEFAULT 0,
+    parents   INTEGER NOT NULL DEFAULT 0,
+    schools   INTEGER NOT NULL DEFAULT 0,
+    score_sum INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lead_keys (
+    key      TEXT    PRIMARY KEY,       -- 'e:' + email_key | 'p:' + phone_key
+    lead_id  INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_lead_keys_lead ON lead_keys(lead_id);
+CREATE TABLE IF NOT EXISTS lead_merges (
+    id            INTEGER PRIMARY KEY,
+    lead_id       INTEGER NOT NULL,     -- the lead that absorbed it
+    merged_at     REAL    NOT NULL,
+    source        TEXT    NOT NULL,     -- 'visit' (repeat visitor) | 'batch' (dedupe)
+    duplicate_id  INTEGER,              -- the removed row, for batch merges
+    record        TEXT    NOT NULL      -- the merged-in lead as it was, JSON
+);
+CREATE INDEX IF NOT EXISTS ix_lead_merges_lead ON lead_merges(lead_id);
+"""
+
+# ── Aggregates — kept current by triggers, read in O(1) ──────────────────────
+# Each insert, rescore or delete adjusts the running counters for the
+# all-time row and for its hour and day buckets, inside the same transaction
+# as the write. The dashboard then reads one row instead of scanning leads.
+BUCKETS  = {"all": None, "hour": 3600, "day": 86400}
+COUNTERS = ["total", "hot", "warm", "cool", "demos", "parents", "schools", "score_sum"]
+
+
+def _counter_exprs(r: str) -> list:
+    return ["1", f"{r}.score >= 70", f"{r}.score >= 45 AND {r}.score < 70", f"{r}.score < 45",
+            f"{r}.wants_demo != 0", f"{r}.type = 'Parent'", f"{r}.type = 'School'", f"{r}.score"]
+
+
+def _bump(r: str, sign: str) -> str:
+    """UPSERTs adding (sign=+) or removing (sign=-) row `r` from every bucket."""
+    vals = ", ".join(f"{sign}({e})" for e in _counter_exprs(r))
+    sets = ", ".join(f"{c} = {c} + excluded.{c}" for c in COUNTERS)
+    out = []
+    for kind, width in BUCKETS.items():
+        bucket = "0" if width is None else f"CAST({r}.created_at / {width} AS INTEGER) * {width}"
+        out.append(f"INSERT INTO lead_stats (kind, bucket, {', '.join(COUNTERS)}) "
+                   f"VALUES ('{kind}', {bucket}, {vals}) "
+                   f"ON CONFLICT(kind, bucket) DO UPDATE SET {sets};")
+    return "\n".join(out)
+
+
+# ── Dedupe index — lead_keys follows every insert, contact change and delete ──
+# A key already owned by another lead is left alone (INSERT OR IGNORE);
+# dedupe() settles such overlaps.
+_ADD_KEYS = """
+  INSERT OR IGNORE INTO lead_keys SELECT 'e:' || NEW.email_key, NEW.id WHERE NEW.email_key != '';
+  INSERT OR IGNORE INTO lead_keys SELECT 'p:' || NEW.phone_key, NEW.id WHERE NEW.phone_key != '';"""
+_KEY_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS tr_leads_keys_ins AFTER INSERT ON leads BEGIN{_ADD_KEYS}
+END;
+CREATE TRIGGER IF NOT EXISTS tr_leads_keys_upd AFTER UPDATE OF email_key, phone_key ON leads BEGIN{_ADD_KEYS}
+END;
+CREATE TRIGGER IF NOT EXISTS tr_leads_keys_del AFTER DELETE ON leads BEGIN
+  DELETE FROM lead_keys WHERE lead_id = OLD.id;
+END;"""
+
+_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS tr_leads_stats_ins AFTER INSERT ON leads BEGIN
+{_bump("NEW", "+")}
+END;
+CREATE TRIGGER IF NOT EXISTS tr_leads_stats_upd
+AFTER UPDATE OF score, wants_demo, type, created_at ON leads BEGIN
+{_bump("OLD", "-")}
+{_bump("NEW", "+")}
+END;
+CREATE TRIGGER IF NOT EXISTS tr_leads_stats_del AFTER DELETE ON leads BEGIN
+{_bump("OLD", "-")}
+END;
+{_KEY_TRIGGERS}
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_ready = set()     # db paths whose schema has been created this process
+
+
+def _conn(path: str = None) -> sqlite3.Connection:
+    path = path or DB_PATH
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    c = conns.get(path)
+    if c is None:
+        c = sqlite3.connect(path, timeout=30, isolation_level=None)   # autocommit; we BEGIN explicitly
+        c.row_factory = sqlite3.Row
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute("PRAGMA busy_timeout=30000")
+        with _init_lock:
+            if path not in _ready:
+                c.executescript(_SCHEMA)
+                _migrate(c)          # before the triggers, which use the newer columns
+                c.executescript(_TRIGGERS)
+                # Databases created before lead_stats existed get one backfill
+                if not c.execute("SELECT 1 FROM lead_stats LIMIT 1").fetchone() \
+                        and c.execute("SELECT 1 FROM leads LIMIT 1").fetchone():
+                    _rebuild_stats(c)
+                _ready.add(path)
+        conns[path] = c
+    return c
+
+
+def _migrate(c: sqlite3.Connection):
+    cols = {r["name"] for r in c.execute("PRAGMA table_info(leads)")}
+    if "version" not in cols:
+        c.execute("ALTER TABLE leads ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    if "email_key" not in cols:
+        c.execute("ALTER TABLE leads ADD COLUMN email_key TEXT NOT NULL DEFAULT ''")
+        c.execute("ALTER TABLE leads ADD COLUMN phone_key TEXT NOT NULL DEFAULT ''")
+        c.execute("ALTER TABLE leads ADD COLUMN updated_at REAL")
+        # Index the existing leads (oldest owns a shared key); merging them is dedupe()'s job
+        rows = c.execute("SELECT id, email, phone FROM leads ORDER BY id").fetchall()
+        c.execute("BEGIN IMMEDIATE")
+        c.executemany("UPDATE leads SET email_key = ?, phone_key = ? WHERE id = ?",
+                      [(email_key(r["email"]), phone_key(r["phone"]), r["id"]) for r in rows])
+        c.executemany("INSERT OR IGNORE INTO lead_keys VALUES (?, ?)",
+                      [(k, r["id"]) for r in rows for k in _keys(r)])
+        c.execute("COMMIT")
+
+
+# ── Normalized contact keys ───────────────────────────────────────────────────
+def email_key(email) -> str:
+    e = str(email or "").strip().lower()
+    return e if "@" in e else ""
+
+
+def phone_key(phone) -> str:
+    """Digits with country code: '+91 98765-43210', '098765 43210', '9876543210' → '919876543210'."""
+    raw = str(phone or "").strip()
+    d = re.sub(r"\D", "", raw)
+    if not raw.startswith("+"):
+        if d.startswith("00"):                                    # international prefix
+            d = d[2:]
+        elif len(d) == LOCAL_DIGITS + 1 and d.startswith("0"):    # trunk prefix
+            d = DEFAULT_CC + d[1:]
+        elif len(d) == LOCAL_DIGITS:
+            d = DEFAULT_CC + d
+    return d if len(d) >= 8 else ""
+
+
+def _keys(lead) -> list:
+    """lead_keys entries for a lead, email first."""
+    e, p = email_key(lead["email"]), phone_key(lead["phone"])
+    return ([f"e:{e}"] if e else []) + ([f"p:{p}"] if p else [])
+
+
+def _value(lead: dict, f: str):
+    if f == "wants_demo":
+        return int(bool(lead.get(f)))
+    if f == "score":
+        return int(lead.get(f) or 0)
+    return str(lead.get(f) or "")
+
+
+def _row(lead: dict, now: float) -> tuple:
+    return ((lead.get("created_at") or now,) + tuple(_value(lead, f) for f in FIELDS)
+            + (email_key(lead.get("email")), phone_key(lead.get("phone"))))
+
+
+_INSERT = (f"INSERT INTO leads (created_at, {', '.join(FIELDS)}, email_key, phone_key) "
+           f"VALUES ({', '.join('?' * (len(FIELDS) + 3))})")
+_MERGE = (f"UPDATE leads SET {', '.join(f'{f} = ?' for f in FIELDS)}, email_key = ?, phone_key = ?, "
+          "updated_at = ?, version = version + 1 WHERE id = ?")
+
+
+# ── Merging ───────────────────────────────────────────────────────────────────
+def merge_fields(older: dict, newer: dict) -> dict:
+    """One lead from two: the higher score, the newer visit's intent, the newest non-empty contact."""
+    out = {f: _value(newer, f) or _value(older, f) for f in CONTACT}
+    # A finished journey states its whole intent, so the newer one replaces the older wholesale
+    src = newer if newer.get("type") else older
+    out.update({f: _value(src, f) for f in INTENT})
+    out["score"] = max(_value(older, "score"), _value(newer, "score"))
+    return out
+
+
+def _merge_args(fields: dict, now: float, lead_id: int) -> tuple:
+    return (tuple(fields[f] for f in FIELDS)
+            + (email_key(fields["email"]), phone_key(fields["phone"]), now, lead_id))
+
+
+def _record_json(lead) -> str:
+    return json.dumps({k: lead[k] for k in ["created_at"] + FIELDS if k in lead.keys()},
+                      ensure_ascii=False)
+
+
+def find(lead: dict, path: str = None):
+    """Id of the stored lead this one belongs to (see _find), or None."""
+    return _find(_conn(path), lead)
+
+
+def _find(c: sqlite3.Connection, lead: dict):
+    # Same email; or same phone, unless both leads have an email and they differ
+    # (a shared family or school number is not the same person)
+    e, p = email_key(lead.get("email")), phone_key(lead.get("phone"))
+    if e:
+        r = c.execute("SELECT lead_id FROM lead_keys WHERE key = ?", (f"e:{e}",)).fetchone()
+        if r:
+            return r[0]
+    if p:
+        r = c.execute("SELECT k.lead_id, l.email_key FROM lead_keys k JOIN leads l ON l.id = k.lead_id "
+                      "WHERE k.key = ?", (f"p:{p}",)).fetchone()
+        if r and (not e or not r[1] or r[1] == e):
+            return r[0]
+    return None
+
+
+def add(lead: dict, path: str = None) -> int:
+    """Store a finished lead; returns its id.
+
+    If a stored lead has the same normalized email, or the same phone and
+    no conflicting email, this one is merged into it (merge_fields, version bumped, recorded in lead_merges)
+    and that lead's id is returned.
+    """
+    c, now = _conn(path), time.time()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        lead_id = _find(c, lead)
+        if lead_id is None:
+            lead_id = c.execute(_INSERT, _row(lead, now)).lastrowid
+        else:
+            old = c.execute("SELECT * FROM leads WHERE id = ?", (lead_id,)).fetchone()
+            c.execute(_MERGE, _merge_args(merge_fields(dict(old), lead), now, lead_id))
+            c.execute("INSERT INTO lead_merges (lead_id, merged_at, source, record) VALUES (?, ?, 'visit', ?)",
+                      (lead_id, now, _record_json({"created_at": now, **lead})))
+        c.execute("COMMIT")
+    except Exception:
+        c.execute("ROLLBACK")
+        raise
+    return lead_id
+
+
+def get(lead_id: int, path: str = None):
+    r = _conn(path).execute("SELECT * FROM leads WHERE id = ?", (lead_id,)).fetchone()
+    return dict(r) if r else None
+
+
+def history(lead_id: int, path: str = None) -> list:
+    """Everything merged into a lead, oldest first."""
+    rows = _conn(path).execute(
+        "SELECT merged_at, source, duplicate_id, record FROM lead_merges WHERE lead_id = ? ORDER BY id",
+        (lead_id,)).fetchall()
+    return [{**dict(r), "record": json.loads(r["record"])} for r in rows]
+
+
+def add_many(leads: list, path: str = None) -> int:
+    """Insert a batch of leads in one transaction, as given (no merging); returns how many."""
+    c, now = _conn(path), time.time()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.executemany(_INSERT, [_row(l, now) for l in leads])
+        c.execute("COMMIT")
+    except Exception:
+        c.execute("ROLLBACK")
+        raise
+    return len(leads)
+
+
+def _rebuild_stats(c: sqlite3.Connection):
+    cols = ", ".join(f"SUM({e})" for e in _counter_exprs("leads"))
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.execute("DELETE FROM lead_stats")
+        for kind, width in BUCKETS.items():
+            bucket = "0" if width is None else f"CAST(created_at / {width} AS INTEGER) * {width}"
+            c.execute(f"INSERT INTO lead_stats (kind, bucket, {', '.join(COUNTERS)}) "
+                      f"SELECT '{kind}', {bucket} AS b, {cols} FROM leads GROUP BY b")
+        c.execute("COMMIT")
+    except Exception:
+        c.execute("ROLLBACK")
+        raise
+
+
+def rebuild_stats(path: str = None):
+    """Recompute every aggregate from scratch (repair tool; normally never needed)."""
+    _rebuild_stats(_conn(path))
+
+
+def summary(path: str = None) -> dict:
+    """All-time dashboard counters — a single-row read."""
+    r = _conn(path).execute(
+        f"SELECT {', '.join(COUNTERS)} FROM lead_stats WHERE kind = 'all' AND bucket = 0").fetchone()
+    return dict(r) if r else dict.fromkeys(COUNTERS, 0)
+
+
+def trend(kind: str = "day", since: float = None, path: str = None) -> list:
+    """Per-bucket counters ('hour' or 'day', UTC), oldest first, from `since` on."""
+    if kind not in ("hour", "day"):
+        raise ValueError(f"unknown bucket kind: {kind!r}")
+    rows = _conn(path).execute(
+        f"SELECT bucket, {', '.join(COUNTERS)} FROM lead_stats "
+        "WHERE kind = ? AND bucket >= ? ORDER BY bucket", (kind, since or 0)).fetchall()
+    return [dict(r) for r in rows]
+
+
+def rescore(scores: list, path: str = None) -> int:
+    """Apply [(lead_id, new_score), …] in one transaction; aggregates follow via trigger."""
+    c = _conn(path)
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.executemany("UPDATE leads SET score = ?, version = version + 1 WHERE id = ? AND score != ?",
+                      [(sc, i, sc) for i, sc in scores])
+        c.execute("COMMIT")
+    except Exception:
+        c.execute("ROLLBACK")
+        raise
+    return len(scores)
+
+
+# ── Batch dedupe — historical leads, one pass ───────────────────────────────
+def _seen(lead) -> float:
+    return lead["updated_at"] or lead["created_at"]
+
+
+def _combine(a: dict, b: dict) -> dict:
+    older, newer = (a, b) if _seen(a) <= _seen(b) else (b, a)
+    return {**merge_fields(older, newer), "created_at": min(a["created_at"], b["created_at"]),
+            "updated_at": _seen(newer)}
+
+
+def dedupe(path: str = None, chunk: int = 10_000) -> dict:
+    """Merge every group of stored leads sharing a normalized email or phone.
+
+    Reads the table once in id order, grouping leads through their keys
+    (a lead sharing keys with two groups joins them). As in add(), a shared
+    phone only groups leads whose emails agree or are missing. Each group keeps its
+    oldest row, with merge_fields applied in time order; the rest are
+    deleted and kept as JSON in lead_merges. Aggregates follow via the
+    triggers. Returns {"scanned", "groups", "removed"}.
+    """
+    c = _conn(path)
+    owner = {}     # key -> a lead id in its group
+    parent = {}    # group id -> the group it was joined into
+    merged = {}    # group id -> combined record, for groups with 2+ rows
+    emails = {}    # group id -> its email key ('' if none yet)
+    dups = {}      # group id -> the rows it absorbed, as they were
+
+    def root(i: int) -> int:
+        while i in parent:
+            i = parent[i]
+        return i
+
+    def row(i: int) -> dict:
+        return dict(c.execute("SELECT * FROM leads WHERE id = ?", (i,)).fetchone())
+
+    scanned, last_id = 0, 0
+    while True:
+        rows = c.execute("SELECT * FROM leads WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk)).fetchall()
+        if not rows:
+            break
+        for r in rows:
+            scanned += 1
+            keys, e = _keys(r), email_key(r["email"])
+            groups = []
+            for k in keys:                             # email first
+                g = root(owner[k]) if k in owner else None
+                if g is None or g in groups or (e and emails[g] and emails[g] != e):
+                    continue
+                groups.append(g)
+                e = e or emails[g]
+            groups.sort()
+            if groups:
+                g = groups[0]
+                rec = merged.get(g) or row(g)
+                for other in groups[1:]:               # this lead links two groups
+                    first = row(other)
+                    rec = _combine(rec, merged.pop(other, first))
+                    dups.setdefault(g, []).extend([first] + dups.pop(other, []))
+                    parent[other] = g
+                merged[g] = _combine(rec, dict(r))
+                dups.setdefault(g, []).append(dict(r))
+            else:
+                g = r["id"]
+            emails[g] = e
+            for k in keys:
+                owner.setdefault(k, g)
+        last_id = rows[-1]["id"]
+
+    now = time.time()
+    gone = [(g, d) for g, ds in dups.items() for d in ds]
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.executemany("INSERT INTO lead_merges (lead_id, merged_at, source, duplicate_id, record) "
+                      "VALUES (?, ?, 'batch', ?, ?)", [(g, now, d["id"], _record_json(d)) for g, d in gone])
+        c.executemany("UPDATE lead_merges SET lead_id = ? WHERE lead_id = ?", [(g, d["id"]) for g, d in gone])
+        c.executemany("DELETE FROM leads WHERE id = ?", [(d["id"],) for _, d in gone])
+        c.executemany(_MERGE, [_merge_args(rec, rec["updated_at"], g) for g, rec in merged.items()])
+        # Every key now points at its group's surviving row
+        c.execute("DELETE FROM lead_keys")
+        c.executemany("INSERT INTO lead_keys VALUES (?, ?)", [(k, root(i)) for k, i in owner.items()])
+        c.execute("COMMIT")
+    except Exception:
+        c.execute("ROLLBACK")
+        raise
+    return {"scanned": scanned, "groups": len(dups), "removed": len(gone)}
+
+
+# Sort keys offered by the dashboard — each one rides an index
+SORTS = {
+    "newest":      "created_at DESC, id DESC",
+    "oldest":      "created_at ASC, id ASC",
+    "score_high":  "score DESC, id DESC",
+    "score_low":   "score ASC, id ASC",
+}
+
+
+def page(sort: str = "newest", limit: int = 50, offset: int = 0, path: str = None) -> list:
+    """One page of leads in the given SORTS order."""
+    if sort not in SORTS:
+        raise ValueError(f"unknown sort: {sort!r}")
+    rows = _conn(path).execute(
+        f"SELECT * FROM leads ORDER BY {SORTS[sort]} LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+    return [dict(r) for r in rows]
+
+
+def recent(limit: int = 50, offset: int = 0, path: str = None) -> list:
+    """Newest leads first, one page at a time."""
+    return page("newest", limit, offset, path)
+
+
+def columns(after_id: int = 0, limit: int = 100_000, path: str = None) -> dict:
+    """Leads with id > after_id as columns ({"id": [...], "score": [...], …}), id order."""
+    rows = _conn(path).execute(
+        f"SELECT id, {', '.join(FIELDS)} FROM leads WHERE id > ? ORDER BY id LIMIT ?",
+        (after_id, limit)).fetchall()
+    names = ["id"] + FIELDS
+    return {k: [r[i] for r in rows] for i, k in enumerate(names)}
+
+
+def count(path: str = None) -> int:
+    return summary(path)["total"]
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Lead store maintenance")
+    ap.add_argument("--dedupe", action="store_true", help="merge stored leads sharing an email or phone")
+    ap.add_argument("--db", default=None, help="lead store path (default: WIZ_LEADS_DB / leads.db)")
+    args = ap.parse_args()
+    if args.dedupe:
+        r = dedupe(args.db)
+        print(f"{r['scanned']} leads scanned, {r['removed']} duplicates merged into {r['groups']} leads")
+    else:
+        ap.print_help()
@@ -0,0 +1,70 @@
+# lead_table.py — Row rendering for the CRM dashboard's lead table
+# Each row's HTML is built once per (lead id, version) and kept in a bounded
+# process-wide cache, so paging back and forth or rerunning the dashboard
+# never re-renders a lead that hasn't changed. lead_store bumps `version`
+# whenever a lead is rescored or merged.
+
+import html
+import threading
+from collections import OrderedDict
+from scoring import score_label
+
+MAX_ROWS_CACHED = 20000
+
+_rows = OrderedDict()     # (id, version) -> row html
+_lock = threading.Lock()
+
+
+def program(lead: dict) -> str:
+    if lead.get("type") == "School":
+        return "SmartTech for Schools"
+    goals = lead.get("goals", "")
+    age   = lead.get("child_age", "")
+    if "Coding" in goals:           return "SmartTech / YPDP"
+    if "Competitive" in goals:      return "HOTS Program"
+    if "thinking" in goals.lower(): return "HOTS Program"
+    if age == "5–7 years":          return "WizBlock Basics"
+    return "HOTS / SmartTech"
+
+
+def _render(l: dict) -> str:
+    e      = html.escape
+    sl     = score_label(l["score"])
+    t_cls  = "school" if l["type"] == "School" else "parent"
+    i_cls  = "demo-y" if l["wants_demo"] else "demo-n"
+    intent = "📅 Demo" if l["wants_demo"] else "📩 Info"
+    detail = l.get("child_age") or l.get("school_size") or "—"
+    return f"""
+            <tr>
+              <td>
+                <strong>{e(l['name'])}</strong><br>
+                <span style="font-size:11px;color:#9a9189">{e(l['email'])}</span><br>
+                <span style="font-size:11px;color:#b0a89e">{e(l['phone'])}</span>
+              </td>
+              <td><span class="badge {t_cls}">{e(l['type'])}</span></td>
+              <td style="color:#6b6560;font-size:12px">{e(detail)}</td>
+              <td style="font-size:12px;color:#6b6560">{program(l)}</td>
+              <td><span class="badge {sl['cls']}">{sl['text']} {l['score']}</span></td>
+              <td><span class="badge {i_cls}">{intent}</span></td>
+            </tr>"""
+
+
+def row_html(lead: dict) -> str:
+    key = (lead.get("id"), lead.get("version", 1))
+    if key[0] is None:
+        return _render(lead)
+    with _lock:
+        hit = _rows.get(key)
+        if hit is not None:
+            _rows.move_to_end(key)
+            return hit
+    out = _render(lead)
+    with _lock:
+        _rows[key] = out
+        while len(_rows) > MAX_ROWS_CACHED:
+            _rows.popitem(last=False)
+    return out
+
+
+def rows_html(leads: list) -> str:
+    return "".join(row_html(l) for l in leads)
@@ -0,0 +1,151 @@
+# llm_metrics.py — In-process metrics for every Groq call
+# groq_client records one sample per completion: caller (answer / insight /
+# closing), outcome, wall time, time to first byte/token, token usage and
+# model. Recent samples sit in a fixed-size ring buffer for exact p50/p95;
+# cumulative per-caller histograms and token totals cover the whole process
+# lifetime. Recording is a lock, a deque append and a few integer adds.
+#
+# Streamlit serves every page from one process, so the CRM dashboard reads
+# the same numbers the chat sessions write.
+
+import bisect
+import os
+import threading
+import time
+from collections import deque
+
+RING_SIZE = int(os.environ.get("WIZ_METRICS_RING", "2048"))
+# Histogram bucket upper bounds in ms; the last bucket is open-ended
+BUCKETS_MS = [50, 100, 200, 400, 700, 1000, 1500, 2500, 4000, 7000, 12000, 20000]
+OUTCOMES = ("ok", "timeout", "api_error", "irrelevant", "empty", "shed", "skipped")
+NOT_SENT = ("shed", "skipped")       # rate limiter / circuit breaker kept it off the wire
+
+_lock = threading.Lock()
+_ring = deque(maxlen=RING_SIZE)      # (ts, caller, outcome, wall_ms, ttfb_ms, total_tokens, model)
+_callers = {}
+_leads = 0
+started = time.time()
+
+
+def _new_caller() -> dict:
+    return {
+        "calls": 0,
+        "outcomes": dict.fromkeys(OUTCOMES, 0),
+        "hist": [0] * (len(BUCKETS_MS) + 1),
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+    }
+
+
+def outcome_for(text: str) -> str:
+    """Outcome of a call that returned normally."""
+    t = text.strip()
+    if not t:
+        return "empty"
+    return "irrelevant" if t.upper() == "IRRELEVANT" else "ok"
+
+
+def record(caller: str, outcome: str, wall_s: float, ttfb_s: float = 0.0,
+           usage: dict = None, model: str = ""):
+    usage = usage or {}
+    wall_ms, ttfb_ms = wall_s * 1000, ttfb_s * 1000
+    pt, ct = usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+    tt = usage.get("total_tokens", 0) or pt + ct
+    with _lock:
+        c = _callers.get(caller)
+        if c is None:
+            c = _callers[caller] = _new_caller()
+        c["calls"] += 1
+        c["outcomes"][outcome] = c["outcomes"].get(outcome, 0) + 1
+        if outcome not in NOT_SENT:   # no latency to speak of
+            c["hist"][bisect.bisect_left(BUCKETS_MS, wall_ms)] += 1
+        c["prompt_tokens"] += pt
+        c["completion_tokens"] += ct
+        c["total_tokens"] += tt
+        _ring.append((time.time(), caller, outcome, wall_ms, ttfb_ms, tt, model))
+
+
+def lead_captured():
+    """Count a finished journey, the denominator for tokens per lead."""
+    global _leads
+    with _lock:
+        _leads += 1
+
+
+def _pct(xs: list, p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))]
+
+
+def _hist_pct(hist: list, p: float) -> float:
+    # Upper bound of the bucket holding the p-th percentile (inf past the last bound)
+    n = sum(hist)
+    if not n:
+        return 0.0
+    seen, want = 0, p / 100 * n
+    for i, k in enumerate(hist):
+        seen += k
+        if seen >= want:
+            return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else float("inf")
+    return float("inf")
+
+
+def summary() -> dict:
+    """Per-caller and overall numbers for the dashboard.
+
+    p50/p95 come from the ring buffer (recent calls, exact); the *_hist
+    variants are bucket bounds over the whole process lifetime.
+    """
+    with _lock:
+        ring = [r for r in _ring if r[2] not in NOT_SENT]
+        callers = {k: {**v, "outcomes": dict(v["outcomes"]), "hist": list(v["hist"])}
+                   for k, v in _callers.items()}
+        leads = _leads
+    out = {}
+    for name, c in callers.items():
+        walls = [r[3] for r in ring if r[1] == name]
+        ttfbs = [r[4] for r in ring if r[1] == name and r[4]]
+        out[name] = {
+            "calls": c["calls"],
+            "outcomes": c["outcomes"],
+            "p50_ms": round(_pct(walls, 50)),
+            "p95_ms": round(_pct(walls, 95)),
+            "ttfb_p50_ms": round(_pct(ttfbs, 50)),
+            "p50_hist_ms": _hist_pct(c["hist"], 50),
+            "p95_hist_ms": _hist_pct(c["hist"], 95),
+            "hist": c["hist"],
+            "prompt_tokens": c["prompt_tokens"],
+            "completion_tokens": c["completion_tokens"],
+            "total_tokens": c["total_tokens"],
+        }
+    walls = [r[3] for r in ring]
+    tokens = sum(c["total_tokens"] for c in callers.values())
+    return {
+        "since": started,
+        "calls": sum(c["calls"] for c in callers.values()),
+        "p50_ms": round(_pct(walls, 50)),
+        "p95_ms": round(_pct(walls, 95)),
+        "total_tokens": tokens,
+        "leads": leads,
+        "tokens_per_lead": round(tokens / leads) if leads else 0,
+        "callers": out,
+    }
+
+
+def recent(limit: int = 50) -> list:
+    with _lock:
+        rows = list(_ring)[-limit:]
+    keys = ("ts", "caller", "outcome", "wall_ms", "ttfb_ms", "total_tokens", "model")
+    return [dict(zip(keys, r)) for r in reversed(rows)]
+
+
+def reset():
+    global _leads, started
+    with _lock:
+        _ring.clear()
+        _callers.clear()
+        _leads = 0
+        started = time.time()
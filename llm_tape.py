@@ -0,0 +1,135 @@
+# llm_tape.py — Record/replay of Groq completions under groq_client._call
+#
+#   WIZ_LLM_MODE=record  streamlit run app.py        # live calls, each one taped
+#   WIZ_LLM_MODE=replay  python bench/loadtest.py    # served from the tape, no network
+#
+# The tape is a small SQLite file keyed by a fingerprint of the request
+# (model, messages, max_tokens, temperature — not the stream flag, so a taped
+# reply can serve either _call or _stream). Each entry keeps the reply text,
+# wall time, time to first byte/token, and Groq's token usage. Replay can
+# re-create the recorded latency (WIZ_LLM_REPLAY_LATENCY=1.0), scale it, or
+# skip it (0, the default). A replay miss behaves like a failed API call.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+MODE = os.environ.get("WIZ_LLM_MODE", "live")          # live | record | replay
+TAPE_PATH = os.environ.get(
+    "WIZ_LLM_TAPE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_tape.db"))
+REPLAY_LATENCY = float(os.environ.get("WIZ_LLM_REPLAY_LATENCY", "0"))   # 1.0 = as recorded
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tape (
+    fp                TEXT PRIMARY KEY,
+    model             TEXT    NOT NULL,
+    request           BLOB    NOT NULL,    -- zlib-compressed canonical JSON, for inspection
+    response          TEXT    NOT NULL,
+    wall_ms           REAL    NOT NULL,
+    ttfb_ms           REAL    NOT NULL,
+    prompt_tokens     INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    total_tokens      INTEGER NOT NULL DEFAULT 0,
+    recorded_at       REAL    NOT NULL
+) WITHOUT ROWID;
+"""
+
+_local = threading.local()
+_lock = threading.Lock()
+stats = {"recorded": 0, "replayed": 0, "misses": 0}
+
+
+def recording() -> bool:
+    return MODE == "record"
+
+
+def replaying() -> bool:
+    return MODE == "replay"
+
+
+def _conn() -> sqlite3.Connection:
+    c = getattr(_local, "conn", None)
+    if c is None or getattr(_local, "path", None) != TAPE_PATH:
+        c = sqlite3.connect(TAPE_PATH, timeout=30)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.executescript(_SCHEMA)
+        _local.conn, _local.path = c, TAPE_PATH
+    return c
+
+
+def _canonical(req: dict) -> str:
+    body = {k: req[k] for k in ("model", "messages", "max_tokens", "temperature") if k in req}
+    return json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def fingerprint(req: dict) -> str:
+    return hashlib.sha256(_canonical(req).encode()).hexdigest()[:32]
+
+
+def record(req: dict, text: str, wall_s: float, ttfb_s: float, usage: dict = None):
+    if not text:
+        return            # failures aren't worth replaying
+    usage = usage or {}
+    with _conn() as c:
+        c.execute(
+            "INSERT OR REPLACE INTO tape VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (fingerprint(req), req.get("model", ""), zlib.compress(_canonical(req).encode(), 9), text,
+             wall_s * 1000, ttfb_s * 1000, usage.get("prompt_tokens", 0),
+             usage.get("completion_tokens", 0), usage.get("total_tokens", 0), time.time()))
+    with _lock:
+        stats["recorded"] += 1
+
+
+def lookup(req: dict):
+    """The taped entry for this request as a dict, or None."""
+    row = _conn().execute(
+        "SELECT response, wall_ms, ttfb_ms, prompt_tokens, completion_tokens, total_tokens "
+        "FROM tape WHERE fp = ?", (fingerprint(req),)).fetchone()
+    with _lock:
+        stats["replayed" if row else "misses"] += 1
+    if row is None:
+        return None
+    keys = ("text", "wall_ms", "ttfb_ms", "prompt_tokens", "completion_tokens", "total_tokens")
+    return dict(zip(keys, row))
+
+
+def replay(req: dict) -> str:
+    e = lookup(req)
+    if e is None:
+        print("[Replay] miss")
+        return ""
+    if REPLAY_LATENCY:
+        time.sleep(e["wall_ms"] / 1000 * REPLAY_LATENCY)
+    return e["text"]
+
+
+def replay_stream(req: dict):
+    """Yield a taped reply word by word, paced like the original stream."""
+    e = lookup(req)
+    if e is None:
+        print("[Replay] miss")
+        return
+    words = e["text"].split(" ")
+    if REPLAY_LATENCY:
+        time.sleep(e["ttfb_ms"] / 1000 * REPLAY_LATENCY)
+    gap = max(0.0, e["wall_ms"] - e["ttfb_ms"]) / 1000 * REPLAY_LATENCY / max(1, len(words))
+    for i, w in enumerate(words):
+        yield (" " if i else "") + w
+        if gap:
+            time.sleep(gap)
+
+
+def summary() -> dict:
+    r = _conn().execute(
+        "SELECT COUNT(*), AVG(wall_ms), AVG(ttfb_ms), SUM(prompt_tokens), SUM(completion_tokens), "
+        "SUM(LENGTH(request) + LENGTH(response)) FROM tape").fetchone()
+    keys = ("entries", "avg_wall_ms", "avg_ttfb_ms", "prompt_tokens", "completion_tokens", "bytes")
+    return {k: (round(v, 1) if isinstance(v, float) else v or 0) for k, v in zip(keys, r)}
+
+
+if __name__ == "__main__":
+    print(json.dumps({"tape": TAPE_PATH, **summary()}, indent=2))
@@ -0,0 +1,180 @@
+# message_store.py — Compact, bounded chat transcript for one session
+# Every Streamlit session used to hold its whole conversation as a list of
+# dicts, each also carrying its rendered HTML, for as long as the session
+# lived. Here a turn is a slotted Message whose role and quick-reply text
+# are interned (one shared string per option across all sessions), and a
+# MessageLog keeps only the newest MEMORY_WINDOW turns in memory. Older
+# turns are spilled, SPILL_CHUNK at a time, to a gzip archive on disk for
+# that session and read back only when someone scrolls that far up.
+# snapshot()/restore() turn a log into plain JSON and back, so session_store
+# can hand a conversation to another replica.
+#
+#   log = MessageLog()
+#   log.append(Message("bot", "Hi!"))
+#   log.tail(40)      # newest 40, from memory or archive as needed
+
+import gzip
+import json
+import os
+import tempfile
+import time
+import uuid
+import weakref
+
+MEMORY_WINDOW = int(os.environ.get("WIZ_CHAT_MEMORY", "200"))     # turns kept in memory
+SPILL_CHUNK   = int(os.environ.get("WIZ_CHAT_SPILL", "50"))       # turns archived at a time
+ARCHIVE_DIR   = os.environ.get("WIZ_CHAT_ARCHIVE", os.path.join(tempfile.gettempdir(), "wiz-chat"))
+
+_KNOWN = {}      # canonical copies of strings many sessions repeat (roles, quick replies)
+
+
+def register(*groups):
+    """Make these strings (e.g. quick-reply option lists) shared across all messages."""
+    for group in groups:
+        for s in ([group] if isinstance(group, str) else group):
+            _KNOWN.setdefault(s, s)
+
+
+def intern(s: str) -> str:
+    return _KNOWN.get(s, s)
+
+
+register("bot", "user")
+
+
+class Message:
+    __slots__ = ("role", "text", "html", "html_src")
+
+    def __init__(self, role: str, text: str):
+        self.role = intern(role)
+        self.text = intern(text)
+        self.html = None          # chat_render's cached fragment …
+        self.html_src = None      # … and the text it was rendered from
+
+    def __repr__(self):
+        return f"Message({self.role!r}, {self.text[:40]!r})"
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class MessageLog:
+    """Append-only transcript: newest turns in memory, the rest archived."""
+
+    def __init__(self, window: int = None, session_id: str = None, archive_dir: str = None):
+        self.window = MEMORY_WINDOW if window is None else window
+        self.session_id = session_id or uuid.uuid4().hex
+        self._dir = archive_dir or ARCHIVE_DIR
+        self._recent = []
+        self._archived = 0
+        self._finalizer = None
+        self._keep = False        # snapshotted: the archive belongs to the session, not this object
+
+    @property
+    def archive_path(self) -> str:
+        return os.path.join(self._dir, f"{self.session_id}.jsonl.gz")
+
+    def __len__(self) -> int:
+        return self._archived + len(self._recent)
+
+    def __bool__(self) -> bool:
+        return bool(len(self))
+
+    @property
+    def archived(self) -> int:
+        return self._archived
+
+    @property
+    def last(self):
+        return self._recent[-1] if self._recent else None
+
+    def append(self, m: Message):
+        self._recent.append(m)
+        if len(self._recent) > self.window + SPILL_CHUNK:
+            self._spill(len(self._recent) - self.window)
+
+    def recent(self) -> list:
+        """The in-memory turns, oldest first (a copy — safe to hand to another thread)."""
+        return list(self._recent)
+
+    def tail(self, n: int = None) -> list:
+        """The newest n turns (all if None), reading the archive only if n reaches into it."""
+        if n is None:
+            n = len(self)
+        if n <= len(self._recent):
+            return self._recent[len(self._recent) - n:] if n else []
+        older = self._load()
+        return older[max(0, len(older) - (n - len(self._recent))):] + self._recent
+
+    def snapshot(self) -> dict:
+        """Plain-JSON form for session_store: the in-memory turns plus where the archive is.
+
+        The archive now outlives this log — another replica may restore it
+        (WIZ_CHAT_ARCHIVE should then be shared storage); prune_archives()
+        removes it once the session has gone quiet.
+        """
+        if self._finalizer is not None:
+            self._finalizer.detach()
+        self._keep = True
+        return {"id": self.session_id, "archived": self._archived,
+                "recent": [[m.role, m.text] for m in self._recent]}
+
+    def discard(self):
+        """Delete the archive now (the visitor started over)."""
+        if self._finalizer is not None:
+            self._finalizer.detach()
+        _remove(self.archive_path)
+
+    @classmethod
+    def restore(cls, snap: dict, window: int = None, archive_dir: str = None) -> "MessageLog":
+        log = cls(window, snap["id"], archive_dir)
+        log._recent = [Message(role, text) for role, text in snap["recent"]]
+        log._archived = snap["archived"]
+        log._keep = True
+        return log
+
+    def _spill(self, k: int):
+        out, self._recent = self._recent[:k], self._recent[k:]
+        os.makedirs(self._dir, exist_ok=True)
+        # Each spill is its own gzip member; gzip.open reads concatenated members back as one stream
+        with gzip.open(self.archive_path, "ab", compresslevel=6) as f:
+            f.write("".join(json.dumps([m.role, m.text], ensure_ascii=False) + "\n"
+                            for m in out).encode("utf-8"))
+        self._archived += k
+        if self._finalizer is None and not self._keep:
+            # The archive lives exactly as long as the session's log
+            self._finalizer = weakref.finalize(self, _remove, self.archive_path)
+
+    def _load(self) -> list:
+        if not self._archived:
+            return []
+        try:
+            with gzip.open(self.archive_path, "rt", encoding="utf-8") as f:
+                return [Message(*json.loads(line)) for line in f]
+        except OSError as e:
+            # Restored on a replica that can't see the archive — show what we have
+            print(f"[Messages] archive unavailable: {e}")
+            return []
+
+
+def prune_archives(max_age: float, archive_dir: str = None) -> int:
+    """Delete archives not written to for max_age seconds; returns how many."""
+    d = archive_dir or ARCHIVE_DIR
+    try:
+        names = os.listdir(d)
+    except OSError:
+        return 0
+    cutoff, n = time.time() - max_age, 0
+    for name in names:
+        path = os.path.join(d, name)
+        try:
+            if name.endswith(".jsonl.gz") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                n += 1
+        except OSError:
+            pass
+    return n
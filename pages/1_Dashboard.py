@@ -1,8 +1,15 @@
 # pages/1_Dashboard.py — WizKlub CRM Dashboard
 # Accessed via the "📊 CRM Dashboard" button on the chat page
 
+import time
 import streamlit as st
-from scoring import score_label
+import assets
+import lead_store
+import lead_export
+import lead_table
+import llm_metrics
+import scoring
+import singleflight
 
 st.set_page_config(
     page_title="WizKlub CRM",
@@ -11,84 +18,45 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Outfit:wght@300;400;500;600;700&display=swap');
-html, body, [class*="css"] { font-family: 'Outfit', sans-serif !important; }
-#MainMenu, footer, header { visibility: hidden; }
-[data-testid="stSidebarNav"] { display: none; }
-section[data-testid="stSidebar"] { display: none; }
-.stApp { background: #f7f5f0; }
-.block-container { padding-top: 1.2rem !important; }
-
-.m-card { background:#fff; border:1px solid #e5e0d8; border-radius:14px;
-          padding:20px 16px; text-align:center; box-shadow:0 2px 8px rgba(0,0,0,0.04); }
-.m-num  { font-size:36px; font-weight:700; line-height:1; }
-.m-lbl  { font-size:10px; font-weight:600; text-transform:uppercase;
-          letter-spacing:1.2px; color:#9a9189; margin-top:6px; }
-
-.tbl { width:100%; border-collapse:collapse; font-size:13px; }
-.tbl th { text-align:left; padding:8px 12px; font-size:10px; font-weight:700;
-          text-transform:uppercase; letter-spacing:1px; color:#9a9189;
-          border-bottom:2px solid #e5e0d8; }
-.tbl td { padding:10px 12px; border-bottom:1px solid #f0ece6; vertical-align:middle; }
-.tbl tr:hover td { background:#faf8f4; }
-
-.badge { display:inline-block; padding:3px 10px; border-radius:50px;
-         font-size:11px; font-weight:600; }
-.hot    { background:rgba(239,68,68,0.10);  color:#dc2626; }
-.warm   { background:rgba(251,146,60,0.12); color:#ea6c0a; }
-.cool   { background:rgba(99,102,241,0.10); color:#4f46e5; }
-.parent { background:rgba(45,106,79,0.10);  color:#2d6a4f; }
-.school { background:rgba(231,111,81,0.10); color:#c0502d; }
-.demo-y { background:rgba(45,106,79,0.10);  color:#2d6a4f; }
-.demo-n { background:#f0ece6; color:#9a9189; }
-
-.sec-lbl { font-size:11px; font-weight:700; text-transform:uppercase;
-           letter-spacing:1.2px; color:#9a9189;
-           border-bottom:1px solid #e5e0d8; padding-bottom:8px; margin-bottom:14px; }
-.pipe-row { display:flex; justify-content:space-between; align-items:center;
-            padding:9px 0; border-bottom:1px solid #f5f2ee; font-size:13px; }
-.pipe-row:last-child { border:none; }
-
-.stButton > button {
-    background: #2d6a4f !important; color: white !important;
-    border: none !important; border-radius: 50px !important;
-    padding: 8px 20px !important; font-size: 13px !important;
-    font-weight: 600 !important; font-family: 'Outfit', sans-serif !important;
-}
-.stButton > button:hover { background: #235e43 !important; }
-</style>
-""", unsafe_allow_html=True)
-
-# ── Helper — must be defined before the table renders it ─────────────────────
-def _program(lead: dict) -> str:
-    if lead.get("type") == "School":
-        return "SmartTech for Schools"
-    goals = lead.get("goals", "")
-    age   = lead.get("child_age", "")
-    if "Coding" in goals:           return "SmartTech / YPDP"
-    if "Competitive" in goals:      return "HOTS Program"
-    if "thinking" in goals.lower(): return "HOTS Program"
-    if age == "5–7 years":          return "WizBlock Basics"
-    return "HOTS / SmartTech"
-
-
-# Init state guard
-if "all_leads" not in st.session_state:
-    st.session_state.all_leads  = []
-    st.session_state.demo_count = 0
-
-all_leads = st.session_state.all_leads
-total     = len(all_leads)
-hot       = sum(1 for l in all_leads if l["score"] >= 70)
-warm      = sum(1 for l in all_leads if 45 <= l["score"] < 70)
-cool      = sum(1 for l in all_leads if l["score"] < 45)
-demos     = st.session_state.get("demo_count", 0)
-parents   = sum(1 for l in all_leads if l["type"] == "Parent")
-schools   = sum(1 for l in all_leads if l["type"] == "School")
+assets.apply("dashboard")
+
+# ── Load from the shared lead store (all sessions, survives restarts) ────────
+PAGE_SIZES = [25, 50, 100]
+SORT_LABELS = {"Newest first": "newest", "Oldest first": "oldest",
+               "Highest score": "score_high", "Lowest score": "score_low"}
+
+# Scoring Breakdown panel — the points themselves come from scoring.WEIGHTS
+FIELD_LABELS = {"type": "Type", "child_age": "Child age", "school_size": "School size",
+                "budget": "Budget (₹)", "goals": "Goal"}
+BAND_ACTIONS = {"hot": "Call within 1hr", "warm": "Same-day follow-up", "cool": "Email nurture"}
+
+
+def _rule_text(rule: str) -> str:
+    # "=1000+" → 1000+, "~Coding|Competitive" → Coding/Competitive, "~500!1,500" → 500
+    if rule == "*":
+        return "other"
+    if rule == "":
+        return "none"
+    return rule[1:].split("!")[0].replace("|", "/")
+
+
+for k, v in {"lt_page": 0, "lt_size": PAGE_SIZES[0], "lt_sort": "Newest first"}.items():
+    if k not in st.session_state:
+        st.session_state[k] = v
+
+stats     = lead_store.summary()                       # O(1) — maintained on write
+daily     = lead_store.trend("day", since=time.time() - 7 * 86400)
+total     = stats["total"]
+hot       = stats["hot"]
+warm      = stats["warm"]
+cool      = stats["cool"]
+demos     = stats["demos"]
+parents   = stats["parents"]
+schools   = stats["schools"]
 conv_rate = round(demos / total * 100) if total else 0
-avg_score = round(sum(l["score"] for l in all_leads) / total) if total else 0
+avg_score = round(stats["score_sum"] / total) if total else 0
+llm       = llm_metrics.summary()                      # this process, since start
+shared    = singleflight.answers.stats()
 
 
 # ── Page header ───────────────────────────────────────────────────────────────
@@ -101,7 +69,7 @@ with hc:
             <div style="font-size:20px;font-weight:700;color:#1a1a2e;letter-spacing:-0.4px">
                 WizKlub CRM Dashboard</div>
             <div style="font-size:12px;color:#9a9189;margin-top:2px">
-                Session leads · auto-scored · real-time</div>
+                All leads · auto-scored · real-time</div>
         </div>
     </div>""", unsafe_allow_html=True)
 
@@ -137,7 +105,7 @@ left, right = st.columns([2.2, 1], gap="large")
 with left:
     st.markdown('<div class="sec-lbl">Captured Leads</div>', unsafe_allow_html=True)
 
-    if not all_leads:
+    if not total:
         st.markdown("""
         <div style="text-align:center;padding:50px;background:#faf8f4;
                     border-radius:14px;border:1px dashed #e5e0d8;color:#b0a89e;">
@@ -145,27 +113,19 @@ with left:
             <div style="font-size:14px">No leads yet — go chat with the bot first!</div>
         </div>""", unsafe_allow_html=True)
     else:
-        rows = ""
-        for l in reversed(all_leads):
-            sl     = score_label(l["score"])
-            t_cls  = "school" if l["type"] == "School" else "parent"
-            i_cls  = "demo-y" if l["wants_demo"] else "demo-n"
-            intent = "📅 Demo" if l["wants_demo"] else "📩 Info"
-            detail = l.get("child_age") or l.get("school_size") or "—"
-            prog   = _program(l)
-            rows  += f"""
-            <tr>
-              <td>
-                <strong>{l['name']}</strong><br>
-                <span style="font-size:11px;color:#9a9189">{l['email']}</span><br>
-                <span style="font-size:11px;color:#b0a89e">{l['phone']}</span>
-              </td>
-              <td><span class="badge {t_cls}">{l['type']}</span></td>
-              <td style="color:#6b6560;font-size:12px">{detail}</td>
-              <td style="font-size:12px;color:#6b6560">{prog}</td>
-              <td><span class="badge {sl['cls']}">{sl['text']} {l['score']}</span></td>
-              <td><span class="badge {i_cls}">{intent}</span></td>
-            </tr>"""
+        # Only the visible page is fetched and shipped, whatever the lead count
+        sc, zc = st.columns([2, 1])
+        sort = sc.selectbox("Sort", list(SORT_LABELS), key="lt_sort", label_visibility="collapsed",
+                            on_change=lambda: st.session_state.update(lt_page=0))
+        size = zc.selectbox("Rows", PAGE_SIZES, key="lt_size", label_visibility="collapsed",
+                            format_func=lambda n: f"{n} per page",
+                            on_change=lambda: st.session_state.update(lt_page=0))
+        pages = max(1, -(-total // size))
+        st.session_state.lt_page = min(st.session_state.lt_page, pages - 1)
+        pg = st.session_state.lt_page
+
+        page_leads = lead_store.page(SORT_LABELS[sort], size, pg * size)
+        rows = lead_table.rows_html(page_leads)
 
         st.markdown(f"""
         <div style="background:white;border:1px solid #e5e0d8;
@@ -178,6 +138,18 @@ with left:
           <tbody>{rows}</tbody>
         </table></div>""", unsafe_allow_html=True)
 
+        pc, mc, nc = st.columns([1, 2, 1])
+        if pc.button("← Prev", key="lt_prev", disabled=pg == 0):
+            st.session_state.lt_page = pg - 1
+            st.rerun()
+        mc.markdown(f"""
+        <div style="text-align:center;font-size:12px;color:#9a9189;padding-top:8px">
+            Page {pg + 1} of {pages} · leads {pg * size + 1}–{pg * size + len(page_leads)} of {total}
+        </div>""", unsafe_allow_html=True)
+        if nc.button("Next →", key="lt_next", disabled=pg >= pages - 1):
+            st.session_state.lt_page = pg + 1
+            st.rerun()
+
 with right:
     st.markdown('<div class="sec-lbl">Pipeline Summary</div>', unsafe_allow_html=True)
     st.markdown(f"""
@@ -199,20 +171,79 @@ with right:
 
     st.markdown("<br>", unsafe_allow_html=True)
 
+    st.markdown('<div class="sec-lbl">Last 7 Days</div>', unsafe_allow_html=True)
+    peak  = max([d["total"] for d in daily] + [1])
+    trend = "".join(f"""<div class="pipe-row"><span style="color:#6b6560">{time.strftime("%a %d %b", time.gmtime(d["bucket"]))}</span>
+        <span style="flex:1;margin:0 10px;height:6px;border-radius:3px;background:#f0ece6;">
+          <span style="display:block;height:6px;border-radius:3px;background:#2d6a4f;
+                       width:{round(d['total'] / peak * 100)}%"></span></span>
+        <strong>{d['total']}</strong>&nbsp;<span style="color:#dc2626;font-size:11px">🔥{d['hot']}</span></div>"""
+        for d in reversed(daily)) or '<div style="color:#b0a89e;font-size:12px">No leads this week yet.</div>'
+    st.markdown(f"""
+    <div style="background:white;border:1px solid #e5e0d8;border-radius:14px;padding:16px 18px;">
+      {trend}
+    </div>""", unsafe_allow_html=True)
+
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    st.markdown('<div class="sec-lbl">AI Usage</div>', unsafe_allow_html=True)
+    if llm["calls"]:
+        usage = "".join(f"""<div class="pipe-row"><span style="color:#6b6560">{name.title()}</span>
+        <span>{c['calls']} calls · p50 {c['p50_ms']} / p95 {c['p95_ms']} ms</span>
+        <strong style="color:{'#dc2626' if c['outcomes']['ok'] + c['outcomes']['irrelevant'] < c['calls'] else '#1a1a2e'}">
+          {c['calls'] - c['outcomes']['ok'] - c['outcomes']['irrelevant']} failed</strong></div>"""
+            for name, c in sorted(llm["callers"].items()))
+        usage += f"""<div class="pipe-row"><span style="color:#6b6560">All calls (p50 / p95)</span>
+        <strong>{llm['p50_ms']} / {llm['p95_ms']} ms</strong></div>
+      <div class="pipe-row"><span style="color:#6b6560">Answers shared in flight</span>
+        <strong>{shared['coalesced']} ({round(shared['coalescing_ratio'] * 100)}%)</strong></div>
+      <div class="pipe-row"><span style="color:#6b6560">Tokens</span><strong>{llm['total_tokens']:,}</strong></div>
+      <div class="pipe-row"><span style="color:#6b6560">Tokens per lead</span>
+        <strong style="color:#4f46e5">{llm['tokens_per_lead']:,}</strong></div>"""
+    else:
+        usage = '<div style="color:#b0a89e;font-size:12px">No AI calls since the server started.</div>'
+    st.markdown(f"""
+    <div style="background:white;border:1px solid #e5e0d8;border-radius:14px;padding:16px 18px;">
+      {usage}
+    </div>""", unsafe_allow_html=True)
+
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    exp = lead_export.exporter()
+    if exp is not None:
+        ex = exp.stats()
+        st.markdown('<div class="sec-lbl">CRM Export</div>', unsafe_allow_html=True)
+        sinks = "".join(f"""<div class="pipe-row"><span style="color:#6b6560">{name}</span>
+        <span>{ex['delivered'][name]} sent</span>
+        <strong style="color:{'#ea6c0a' if ex['spooled'][name] else '#1a1a2e'}">{ex['spooled'][name]} pending</strong></div>"""
+            for name in ex["delivered"])
+        st.markdown(f"""
+    <div style="background:white;border:1px solid #e5e0d8;border-radius:14px;padding:16px 18px;">
+      {sinks}
+      <div class="pipe-row"><span style="color:#6b6560">Queue (peak)</span>
+        <strong>{ex['queued']} / {ex['queue_size']} ({ex['queue_high']})</strong></div>
+      <div class="pipe-row"><span style="color:#6b6560">Oldest pending</span><strong>{ex['oldest_spooled_s']}s</strong></div>
+      <div class="pipe-row"><span style="color:#6b6560">Overflowed to spool</span><strong>{ex['overflow']}</strong></div>
+    </div>""", unsafe_allow_html=True)
+        st.markdown("<br>", unsafe_allow_html=True)
+
     st.markdown('<div class="sec-lbl">Scoring Breakdown</div>', unsafe_allow_html=True)
-    st.markdown("""
+    # Built from scoring's tables so the panel can't drift from calc_score
+    earns = "".join(f"<div>{FIELD_LABELS.get(f, f)} &nbsp;"
+                    + " &nbsp;|&nbsp; ".join(f"{_rule_text(r)} +{p}" for r, p in rules) + "</div>"
+                    for f, rules in scoring.WEIGHTS.items())
+    earns += (f"<div>Demo request &nbsp;+{scoring.DEMO_POINTS[True]} &nbsp;|&nbsp; "
+              f"no demo +{scoring.DEMO_POINTS[False]}</div>")
+    earns += "<div>" + " &nbsp;|&nbsp; ".join(
+        f"Valid {k} +{p}" for k, p in scoring.CONTACT_POINTS.items()) + "</div>"
+    tops = [scoring.MAX_SCORE] + [floor - 1 for floor, _, _ in scoring.BANDS[:-1]]
+    bands = "".join(f'<span class="badge {cls}">{text.split()[0]} {floor}-{top}</span> {BAND_ACTIONS.get(cls, "")}<br>'
+                    for (floor, text, cls), top in zip(scoring.BANDS, tops))
+    st.markdown(f"""
     <div style="background:white;border:1px solid #e5e0d8;border-radius:14px;
                 padding:16px 18px;font-size:12px;color:#6b6560;line-height:1.9;">
-      <div><strong style="color:#1a1a2e">What earns points:</strong></div>
-      <div>School type &nbsp;+20 &nbsp;|&nbsp; Parent &nbsp;+10</div>
-      <div>School size (1000+) &nbsp;+20</div>
-      <div>Budget ₹3000+ &nbsp;+15</div>
-      <div>Demo request &nbsp;+25</div>
-      <div>Sweet-spot age (8–13) &nbsp;+15</div>
-      <div>Coding/competitive goal &nbsp;+10</div>
-      <div>Valid email + phone &nbsp;+5 each</div>
+      <div><strong style="color:#1a1a2e">What earns points (max {scoring.MAX_SCORE}):</strong></div>
+      {earns}
       <br>
-      <span class="badge hot">🔥 70-100</span> Call within 1hr<br>
-      <span class="badge warm">🟠 45-69</span> Same-day follow-up<br>
-      <span class="badge cool">🔵 0-44</span> Email nurture
+      {bands}
     </div>""", unsafe_allow_html=True)
@@ -0,0 +1,17 @@
+# prefetch.py — Background generation of optional AI text
+# Runs LLM embellishments (e.g. the qualification insight) off the button-click
+# path. Futures are parked in st.session_state and collected on a later rerun.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from groq_client import get_key, run_with_key
+
+WORKERS = int(os.environ.get("WIZ_PREFETCH_WORKERS", "8"))
+
+# One pool for the whole process, shared by every Streamlit session
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="wiz-prefetch")
+
+
+def submit(fn, *args):
+    # Resolve the key here, on the session's thread, where get_key() can see it
+    return _pool.submit(run_with_key, get_key(), fn, *args)
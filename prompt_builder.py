@@ -0,0 +1,123 @@
+# prompt_builder.py — Token-budgeted prompts for answer_question
+#
+# Layout (order matters):
+#   1. system  STATIC_PREFIX       — byte-identical on every call, so Groq's
+#                                    prefix cache can reuse it across visitors
+#   2. system  knowledge + visitor — changes per question / per visitor
+#   3. history                     — newest turns that fit HISTORY_BUDGET;
+#                                    older ones collapse into a one-line recap
+#   4. user    the question
+#
+# Sizes are estimated locally (kb_index.estimate_tokens), so a long chat no
+# longer grows the prompt — it stays under PROMPT_BUDGET whatever happens.
+# The one exception is a question retrieval can't match, which gets the whole
+# knowledge base (see kb_index.retrieve) and no history.
+
+import os
+import kb_index
+from kb_index import estimate_tokens
+
+PROMPT_BUDGET  = int(os.environ.get("WIZ_PROMPT_BUDGET", "1400"))   # whole prompt
+HISTORY_BUDGET = int(os.environ.get("WIZ_HISTORY_BUDGET", "400"))   # turns + recap
+RECAP_BUDGET   = 80      # tokens for the "earlier in the conversation" line
+TURN_CAP       = 160     # longest single turn kept verbatim
+QUESTION_CAP   = 200     # longest visitor question sent
+CONTEXT_TURNS  = 2       # earlier visitor turns added to the retrieval query
+
+STATIC_PREFIX = """You are Wiz, a friendly assistant for WizKlub — a children's EdTech company in India.
+
+First, decide if this message is RELEVANT or IRRELEVANT to WizKlub or education.
+
+RELEVANT = anything about WizKlub, children's learning, programs, pricing, schedules,
+how classes work, school partnerships, subjects taught, STEM, coding, critical thinking, etc.
+
+IRRELEVANT = anything completely unrelated. Examples: "I'm hungry", "tell me a joke",
+"what's the weather", "who won the match", random greetings with no question, gibberish.
+
+If IRRELEVANT — respond with exactly this word and nothing else: IRRELEVANT
+
+If RELEVANT — answer using ONLY the verified information in the next message. Never invent facts.
+If the question isn't covered there, say "our team can clarify that for you."
+
+STRICT RULES when answering:
+1. Answer the question directly — 2 to 3 sentences max
+2. Be warm and personalise using what you know about this visitor
+3. ONLY mention booking a demo or next steps if the person explicitly asked about it
+4. Do NOT add "book a demo" or "shall I set one up?" at the end of every reply
+5. If they didn't ask about next steps, just answer the question and stop"""
+
+
+def _clip(text: str, cap: int) -> str:
+    """Trim text to roughly `cap` tokens on a word boundary."""
+    if estimate_tokens(text) <= cap:
+        return text
+    cut = text[: cap * 4].rsplit(" ", 1)[0]
+    return cut + " …"
+
+
+def context_block(lead: dict, knowledge: str) -> str:
+    name = lead.get("name", "")
+    return f"""=== VERIFIED WIZKLUB INFORMATION ===
+{knowledge}
+=== END ===
+
+What you know about this visitor so far:
+- Type: {lead.get('type') or 'not yet identified'}
+- Child age: {lead.get('child_age') or 'not yet asked'}
+- Goals: {lead.get('goals') or 'not yet asked'}
+- School size: {lead.get('school_size') or 'not yet asked'}
+- Name: {name or 'not yet given'}"""
+
+
+def _recap(turns: list, budget: int) -> str:
+    # Extractive, no LLM call: what the visitor asked, newest first
+    asked = [_clip(h.text, 30) for h in reversed(turns) if h.role == "user"]
+    line = "Earlier in the conversation the visitor asked: "
+    out = []
+    for q in asked:
+        if estimate_tokens(line + " | ".join(out + [q])) > budget:
+            break
+        out.append(q)
+    return line + " | ".join(out) if out else ""
+
+
+def compact_history(history: list, budget: int = HISTORY_BUDGET) -> list:
+    """Newest turns that fit `budget`, plus a recap of the ones that didn't."""
+    recap_budget = min(RECAP_BUDGET, budget)
+    kept, used = [], 0
+    for i in range(len(history) - 1, -1, -1):
+        h = history[i]
+        text = _clip(h.text, TURN_CAP)
+        cost = estimate_tokens(text) + 4          # per-message framing
+        if used + cost > budget - recap_budget:
+            recap = _recap(history[: i + 1], recap_budget)
+            if recap:
+                kept.append({"role": "system", "content": recap})
+            break
+        kept.append({"role": "assistant" if h.role == "bot" else "user", "content": text})
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def qa_messages(user_msg: str, lead: dict, history: list, knowledge: str = None,
+                budget: int = PROMPT_BUDGET) -> list:
+    # flow.py appends the visitor's message before asking, so don't send it twice
+    if history and history[-1].role == "user" and history[-1].text == user_msg:
+        history = history[:-1]
+    if knowledge is None:
+        earlier = [h.text for h in history if h.role == "user"][-CONTEXT_TURNS:]
+        knowledge = kb_index.retrieve(user_msg, context=" ".join(earlier))
+
+    question = _clip(user_msg, QUESTION_CAP)
+    head = [
+        {"role": "system", "content": STATIC_PREFIX},
+        {"role": "system", "content": context_block(lead, knowledge)},
+    ]
+    fixed = sum(estimate_tokens(m["content"]) + 4 for m in head) + estimate_tokens(question) + 4
+    room = max(0, min(HISTORY_BUDGET, budget - fixed))
+    return head + compact_history(history, room) + [{"role": "user", "content": question}]
+
+
+def prompt_tokens(msgs: list) -> int:
+    return sum(estimate_tokens(m["content"]) + 4 for m in msgs)
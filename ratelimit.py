@@ -0,0 +1,151 @@
+# ratelimit.py — Priority-aware token buckets for Groq's rate-limited tier
+# Two buckets, requests/minute and tokens/minute, refill continuously from
+# the configured limits and are corrected by the x-ratelimit-* headers Groq
+# sends back, so other processes sharing the key are accounted for too.
+#
+# Calls queue by priority: a mid-flow answer for a live visitor goes first,
+# then free-form answers, then the qualification insight, then the closing
+# line. Lower priorities must leave a reserve of both buckets untouched and
+# give up after a short wait, so optional work is shed while there is still
+# quota for visitors waiting on an answer — not after Groq starts sending 429s.
+# A shed call returns False; groq_client turns that into an empty reply,
+# which every caller already treats as "skip this message".
+# Offline jobs (insight_table.py) use the "offline" caller: last in line, but
+# never shed — they block until there is quota.
+
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+
+RPM_LIMIT = int(os.environ.get("GROQ_RPM", "30"))        # Groq free tier, llama-3.3-70b
+TPM_LIMIT = int(os.environ.get("GROQ_TPM", "12000"))
+
+PRIORITY = {"answer": 0, "freeform": 1, "insight": 2, "closing": 3, "offline": 4}
+# Share of each bucket a priority must leave for the ones above it
+RESERVE  = {0: 0.0, 1: 0.1, 2: 0.3, 3: 0.5, 4: 0.0}
+# Longest a call waits in the queue before it is shed (seconds)
+MAX_WAIT = {0: 15.0, 1: 10.0, 2: 3.0, 3: 0.0, 4: math.inf}
+
+
+class _Bucket:
+    __slots__ = ("capacity", "level", "rate", "stamp")
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.stamp = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def eta(self, need: float) -> float:
+        return max(0.0, need - self.level) / self.rate if self.rate else 60.0
+
+
+class Scheduler:
+    def __init__(self, rpm: int = RPM_LIMIT, tpm: int = TPM_LIMIT):
+        self._cond = threading.Condition()
+        self._requests = _Bucket(rpm)
+        self._tokens = _Bucket(tpm)
+        self._queue = []                  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._stats = {"admitted": {}, "shed": {}, "waited_s": 0.0, "header_updates": 0}
+
+    def _fits(self, prio: int, tokens: int) -> bool:
+        r, t = self._requests, self._tokens
+        reserve = RESERVE.get(prio, RESERVE[1])
+        # An oversized request may still run alone on a full bucket
+        need_t = min(tokens, t.capacity)
+        return (r.level - 1 >= r.capacity * reserve and
+                t.level - need_t >= t.capacity * reserve)
+
+    def _eta(self, prio: int, tokens: int) -> float:
+        reserve = RESERVE.get(prio, RESERVE[1])
+        return max(self._requests.eta(1 + self._requests.capacity * reserve),
+                   self._tokens.eta(min(tokens, self._tokens.capacity) + self._tokens.capacity * reserve))
+
+    def acquire(self, caller: str, tokens: int, max_wait: float = None) -> bool:
+        """Wait for quota in priority order; False if the call should be shed."""
+        prio = PRIORITY.get(caller, PRIORITY["freeform"])
+        wait = MAX_WAIT.get(prio, 0.0) if max_wait is None else max_wait
+        entry = (prio, next(self._seq))
+        t0 = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._requests.refill(now)
+                    self._tokens.refill(now)
+                    if self._queue[0] == entry and self._fits(prio, tokens):
+                        self._requests.level -= 1
+                        self._tokens.level -= min(tokens, self._tokens.capacity)
+                        self._bump("admitted", caller)
+                        self._stats["waited_s"] += now - t0
+                        return True
+                    left = t0 + wait - now
+                    if left <= 0:
+                        self._bump("shed", caller)
+                        return False
+                    self._cond.wait(min(left, max(0.05, self._eta(prio, tokens))))
+            finally:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def settle(self, estimated: int, actual: int):
+        """Refund (or charge) the difference once Groq reports real usage."""
+        if not actual:
+            return
+        with self._cond:
+            t = self._tokens
+            t.level = min(t.capacity, t.level + min(estimated, t.capacity) - actual)
+            self._cond.notify_all()
+
+    def observe(self, headers):
+        """Pull the buckets down to what Groq says is left for this key."""
+        with self._cond:
+            now = time.monotonic()
+            for bucket, kind in ((self._requests, "requests"), (self._tokens, "tokens")):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                try:
+                    remaining = float(remaining)
+                except ValueError:
+                    continue
+                bucket.refill(now)
+                # Groq's request limit is per day; only trust it when it is the tighter one
+                if remaining < bucket.level:
+                    bucket.level = remaining
+                    self._stats["header_updates"] += 1
+            self._cond.notify_all()
+
+    def _bump(self, kind: str, caller: str):
+        self._stats[kind][caller] = self._stats[kind].get(caller, 0) + 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            return {
+                "rpm_limit": int(self._requests.capacity),
+                "tpm_limit": int(self._tokens.capacity),
+                "requests_left": round(self._requests.level, 1),
+                "tokens_left": round(self._tokens.level),
+                "queued": len(self._queue),
+                "admitted": dict(self._stats["admitted"]),
+                "shed": dict(self._stats["shed"]),
+                "waited_s": round(self._stats["waited_s"], 2),
+                "header_updates": self._stats["header_updates"],
+            }
+
+
+groq = Scheduler()
@@ -0,0 +1,127 @@
+# relevance.py — Local pre-classifier for off-topic messages
+# Runs before answer_question's Groq call. Clearly off-topic input (jokes,
+# weather, bare greetings, gibberish) gets the polite deflection straight
+# away; anything on-topic or uncertain still goes to the model, which makes
+# the final RELEVANT/IRRELEVANT call as before.
+#
+# Features: on/off-topic keyword hits, a character-trigram naive Bayes score
+# (on-topic side trained on the knowledge base), and a gibberish check.
+# Everything here is English: text in another script (Hindi, Tamil, …) and
+# romanised words it has never seen (Hinglish) count as uncertain, not as
+# gibberish, and go to the model.
+# Tune THRESHOLD with:  python bench/relevance.py
+
+import math
+import os
+import re
+from collections import Counter
+from wizklub_context import WIZKLUB_KNOWLEDGE
+
+# Minimum P(off-topic) before we skip the LLM. High on purpose: a wrongly
+# deflected parent costs more than one extra API call.
+THRESHOLD = float(os.environ.get("WIZ_RELEVANCE_THRESHOLD", "0.85"))
+
+ON_TOPIC = {
+    "wizklub", "wiz", "class", "classes", "course", "program", "programme", "coding",
+    "code", "python", "robot", "robotics", "stem", "math", "maths", "science", "hots",
+    "smarttech", "ypdp", "wizblock", "fee", "fees", "price", "pricing", "cost", "pay",
+    "batch", "teacher", "mentor", "trainer", "school", "student", "students", "child",
+    "children", "kid", "kids", "son", "daughter", "age", "grade", "learn", "learning",
+    "exam", "olympiad", "ntse", "demo", "trial", "schedule", "timing", "weekend",
+    "online", "session", "certificate", "certification", "curriculum", "skill",
+    "skills", "thinking", "reasoning", "homework", "enrol", "enroll", "admission",
+    "syllabus", "byju", "byjus", "refund", "discount", "app", "ai", "progress",
+}
+OFF_TOPIC = {
+    "joke", "jokes", "funny", "weather", "rain", "hungry", "food", "pizza", "biryani",
+    "movie", "movies", "film", "song", "songs", "music", "match", "cricket", "football",
+    "ipl", "score", "politics", "election", "girlfriend", "boyfriend", "love", "date",
+    "bored", "lol", "haha", "hahaha", "lmao", "bye", "sing", "dance", "game", "stock",
+    "bitcoin", "crypto", "horoscope", "recipe", "cook", "sleep", "tired",
+}
+# Greetings and acknowledgements: off-topic on their own, but "ok so how do I
+# join" is a next-step question — they only count when nothing else is said
+SMALL_TALK = {
+    "hi", "hello", "hey", "hii", "yo", "sup", "thanks", "thank", "ok", "okay", "cool",
+    "nice", "bye", "lol", "haha", "hahaha", "lmao", "there", "so", "you", "great", "good",
+    "what's", "whats", "up",
+}
+QUESTION_WORDS = {"what", "what's", "whats", "how", "when", "where", "which", "who", "why"}
+
+# Off-topic seed text for the n-gram model (kept separate from the eval set)
+_OFF_SEED = """
+tell me a joke. what's the weather like today. i am so hungry right now.
+who won the match yesterday. play a song for me. what movie should i watch.
+how are you doing. good morning. what is your name. do you like pizza.
+what's the capital of france. i'm bored. sing something. lol that's funny.
+what time is it in london. recommend a restaurant nearby. how do i cook pasta.
+who is the prime minister. will it rain tomorrow. what's bitcoin price.
+are you a robot or a human. what's up bro. nothing much. see you later.
+tell me something interesting. do you have a girlfriend. i love you.
+"""
+
+
+def _grams(text: str, n: int = 3) -> list:
+    t = " " + re.sub(r"\s+", " ", text.lower()) + " "
+    return [t[i:i + n] for i in range(len(t) - n + 1)]
+
+
+class _NGramNB:
+    def __init__(self, on_text: str, off_text: str):
+        self.on, self.off = Counter(_grams(on_text)), Counter(_grams(off_text))
+        self.on_n, self.off_n = sum(self.on.values()), sum(self.off.values())
+        self.vocab = len(set(self.on) | set(self.off)) + 1
+
+    def llr(self, text: str) -> float:
+        """Mean log P(off)/P(on) over the trigrams either side has seen (0.0 if none).
+
+        An unseen trigram says nothing about the topic — only that the word is
+        new to us — so it doesn't count towards either side.
+        """
+        s, seen = 0.0, 0
+        for g in _grams(text):
+            a, b = self.off.get(g, 0), self.on.get(g, 0)
+            if not a and not b:
+                continue
+            seen += 1
+            s += math.log((a + 1) / (self.off_n + self.vocab)) - math.log((b + 1) / (self.on_n + self.vocab))
+        return s / seen if seen else 0.0
+
+
+_NB = _NGramNB(WIZKLUB_KNOWLEDGE, _OFF_SEED)
+
+
+def _foreign_script(text: str) -> bool:
+    return any(ch.isalpha() and not ch.isascii() for ch in text)
+
+
+def _gibberish(words: list) -> bool:
+    # Judged on word shape only: unpronounceable, not merely unfamiliar
+    alpha = [w for w in words if w.isalpha()]
+    if not alpha:
+        return True
+    bad = sum(1 for w in alpha if len(w) > 3 and (not re.search(r"[aeiouy]", w)
+                                                   or re.search(r"[^aeiouy]{5,}", w)))
+    return bad / len(alpha) > 0.5
+
+
+def p_off_topic(text: str) -> float:
+    """Probability-like score (0–1) that `text` has nothing to do with WizKlub."""
+    if _foreign_script(text):
+        return 0.0                       # not English — uncertain, let the model decide
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    on = sum(1 for w in words if w in ON_TOPIC)
+    if on:
+        return 0.0                       # any domain word → let the model decide
+    off = sum(1 for w in words if w in OFF_TOPIC)
+    chat = sum(1 for w in words if w in SMALL_TALK)
+    if words and chat == len(words):
+        off += chat + 1                  # nothing but small talk ("hi", "thanks bye")
+    logit = -1.0 + 1.6 * off + 2.5 * _NB.llr(text) + (3.0 if _gibberish(words) else 0.0)
+    if ("?" in text or QUESTION_WORDS & set(words)) and not off:
+        logit -= 0.8                     # an unfamiliar question is worth asking the model
+    return 1 / (1 + math.exp(-logit))
+
+
+def is_off_topic(text: str, threshold: float = THRESHOLD) -> bool:
+    return p_off_topic(text) >= threshold
@@ -1,34 +1,58 @@
 # scoring.py — Lead scoring (max 100 pts)
 # Bands: 70+ Hot, 45-69 Warm, 0-44 Cool
+# Weights live in WEIGHTS so sales can retune them in one place; calc_score
+# scores one lead, batch_scoring.score_batch scores columns of them.
 import re
 
+EMAIL_RE = re.compile(r"^[^\s@]+@[^\s@]+\.[^\s@]+$")
+PHONE_RE = re.compile(r"^[\d\s\+\-\(\)]{8,15}$")
+
+# Per field: ordered rules, first match wins. A rule is
+#   (match, points)  where match is
+#     "=value"            exact match
+#     "~a|b"              contains any of a, b
+#     "~a!b"              contains a but not b
+#     "*"                 any non-empty value
+#     ""                  empty / missing
+# Fields with no matching rule score 0.
+WEIGHTS = {
+    "type":        [("=School", 20), ("=Parent", 10)],
+    "child_age":   [("=8–10 years", 15), ("=11–13 years", 15), ("*", 8)],
+    "school_size": [("=1000+", 20), ("=500–1000", 15), ("=200–500", 10), ("=Under 200", 5)],
+    "budget":      [("~3,000", 15), ("~1,500", 12), ("~500!1,500", 8), ("~Under", 3)],
+    "goals":       [("~Coding|Competitive", 10), ("*", 5)],
+}
+DEMO_POINTS    = {True: 25, False: 5}
+CONTACT_POINTS = {"email": 5, "phone": 5}
+MAX_SCORE      = 100
+BANDS          = [(70, "🔥 Hot", "hot"), (45, "🟠 Warm", "warm"), (0, "🔵 Cool", "cool")]
+
+
+def _matches(rule: str, v: str) -> bool:
+    if rule == "*":  return bool(v)
+    if rule == "":   return not v
+    if rule[0] == "=": return v == rule[1:]
+    want, _, avoid = rule[1:].partition("!")
+    return any(k in v for k in want.split("|")) and not (avoid and avoid in v)
+
+
+def field_points(field: str, value) -> int:
+    v = value or ""
+    for rule, pts in WEIGHTS[field]:
+        if _matches(rule, v):
+            return pts
+    return 0
+
+
 def calc_score(lead: dict) -> int:
-    s = 0
-    if lead.get("type") == "School":           s += 20
-    elif lead.get("type") == "Parent":         s += 10
-    age = lead.get("child_age", "")
-    if age in ("8–10 years", "11–13 years"):   s += 15
-    elif age:                                  s += 8
-    size = lead.get("school_size", "")
-    if size == "1000+":                        s += 20
-    elif size == "500–1000":                   s += 15
-    elif size == "200–500":                    s += 10
-    elif size == "Under 200":                  s += 5
-    budget = lead.get("budget", "")
-    if "3,000" in budget:                      s += 15
-    elif "1,500" in budget:                    s += 12
-    elif "500" in budget and "1,500" not in budget: s += 8
-    elif "Under" in budget:                    s += 3
-    goals = lead.get("goals", "")
-    if any(k in goals for k in ("Coding", "Competitive")): s += 10
-    elif goals:                                s += 5
-    if lead.get("wants_demo"):                 s += 25
-    else:                                      s += 5
-    if re.match(r"^[^\s@]+@[^\s@]+\.[^\s@]+$", lead.get("email","")): s += 5
-    if re.match(r"^[\d\s\+\-\(\)]{8,15}$",     lead.get("phone","")): s += 5
-    return min(s, 100)
+    s = sum(field_points(f, lead.get(f, "")) for f in WEIGHTS)
+    s += DEMO_POINTS[bool(lead.get("wants_demo"))]
+    if EMAIL_RE.match(lead.get("email", "")): s += CONTACT_POINTS["email"]
+    if PHONE_RE.match(lead.get("phone", "")): s += CONTACT_POINTS["phone"]
+    return min(s, MAX_SCORE)
 
 def score_label(score: int) -> dict:
-    if score >= 70: return {"text": "🔥 Hot",  "cls": "hot"}
-    if score >= 45: return {"text": "🟠 Warm", "cls": "warm"}
-    return               {"text": "🔵 Cool", "cls": "cool"}
+    for floor, text, cls in BANDS:
+        if score >= floor:
+            return {"text": text, "cls": cls}
+    return {"text": BANDS[-1][1], "cls": BANDS[-1][2]}
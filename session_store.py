@@ -0,0 +1,76 @@
+# session_store.py — Conversation snapshots shared by every replica (SQLite, WAL)
+# flow.snapshot() reduces a visitor's conversation to a small JSON document
+# (current state, lead fields, closing draft, recent transcript). We keep the
+# latest one per session id, so a request that lands on any replica can pick
+# the conversation up with one primary-key read — no handler is re-run.
+# Point WIZ_SESSION_DB (and message_store's WIZ_CHAT_ARCHIVE) at storage the
+# replicas share. Sessions idle for WIZ_SESSION_TTL seconds are pruned.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import message_store
+
+DB_PATH = os.environ.get(
+    "WIZ_SESSION_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.db"))
+TTL = float(os.environ.get("WIZ_SESSION_TTL", str(7 * 86400)))
+PRUNE_EVERY = 3600         # seconds between prunes, per process
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    sid         TEXT PRIMARY KEY,
+    snapshot    TEXT NOT NULL,        -- flow.snapshot() as compact JSON
+    updated_at  REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_sessions_updated_at ON sessions(updated_at);
+"""
+
+_local = threading.local()
+_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def _conn() -> sqlite3.Connection:
+    c = getattr(_local, "conn", None)
+    if c is None or getattr(_local, "path", None) != DB_PATH:
+        c = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute("PRAGMA busy_timeout=30000")
+        c.executescript(_SCHEMA)
+        _local.conn, _local.path = c, DB_PATH
+    return c
+
+
+def save(sid: str, snap: dict):
+    global _last_prune
+    data = json.dumps(snap, ensure_ascii=False, separators=(",", ":"))
+    now = time.time()
+    _conn().execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (sid, data, now))
+    with _lock:
+        due = now - _last_prune >= PRUNE_EVERY
+        if due:
+            _last_prune = now
+    if due:
+        prune()
+
+
+def load(sid: str):
+    """The latest snapshot for sid, or None."""
+    row = _conn().execute("SELECT snapshot FROM sessions WHERE sid = ?", (sid,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def delete(sid: str):
+    _conn().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+
+def prune(max_age: float = None) -> int:
+    """Drop sessions (and their transcript archives) idle for max_age seconds."""
+    max_age = TTL if max_age is None else max_age
+    n = _conn().execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - max_age,)).rowcount
+    message_store.prune_archives(max_age)
+    return n
@@ -0,0 +1,97 @@
+# singleflight.py — Coalesce identical in-flight work across sessions
+# On a demo day dozens of visitors ask the same thing within seconds, each
+# from its own Streamlit session thread. The first caller for a key becomes
+# the leader and does the work; anyone arriving with the same key while it
+# is still running waits for the leader's result instead of repeating it.
+# The leader's exception is re-raised in every waiter, and a waiter that
+# outgrows its timeout gets TimeoutError while the leader carries on.
+# Nothing is kept after a flight lands — caching is answer_cache's job.
+#
+#   result = singleflight.calls.do(key, fn, *args, timeout=25)
+
+import threading
+
+
+class Flight:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class Group:
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._leaders = 0
+        self._followers = 0
+        self._timeouts = 0
+        self._errors = 0
+
+    def begin(self, key):
+        """(flight, is_leader). A leader must call land() exactly once."""
+        with self._lock:
+            f = self._flights.get(key)
+            if f is not None:
+                f.waiters += 1
+                self._followers += 1
+                return f, False
+            f = self._flights[key] = Flight()
+            self._leaders += 1
+            return f, True
+
+    def land(self, key, flight: Flight, result=None, error: BaseException = None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if error is not None:
+                self._errors += 1
+        flight.result, flight.error = result, error
+        flight.done.set()
+
+    def wait(self, flight: Flight, timeout: float = None):
+        if not flight.done.wait(timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise TimeoutError(f"coalesced {self.name or 'call'} still running after {timeout}s")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def do(self, key, fn, *args, timeout: float = None):
+        flight, leader = self.begin(key)
+        if not leader:
+            return self.wait(flight, timeout)
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self.land(key, flight, error=e)
+            raise
+        self.land(key, flight, result)
+        return result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._leaders + self._followers
+            return {
+                "leaders": self._leaders,
+                "coalesced": self._followers,
+                "timeouts": self._timeouts,
+                "errors": self._errors,
+                "in_flight": len(self._flights),
+                "coalescing_ratio": round(self._followers / total, 3) if total else 0.0,
+            }
+
+
+# Exact duplicate completions (same model/messages/params) — see groq_client._call
+calls = Group("completion")
+# Same question from the same kind of visitor — see groq_client.answer_question_stream
+answers = Group("answer")
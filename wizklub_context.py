@@ -1,7 +1,8 @@
 # wizklub_context.py
 # Real WizKlub knowledge — sourced from wizklub.com, their FAQ,
-# blog posts, and founder interviews. This is injected into every
-# AI prompt so the bot answers questions accurately, not generically.
+# blog posts, and founder interviews. kb_index splits and indexes it so
+# each AI prompt carries the relevant parts and the bot answers questions
+# accurately, not generically.
 
 WIZKLUB_KNOWLEDGE = """
 ABOUT WIZKLUB: